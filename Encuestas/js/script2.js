@@ -118,8 +118,15 @@ function showThankYou(motivo, extraMeta = {}){
 }
 
 // ===============================
+// Id generado en el kiosco: los reintentos del mismo envío no duplican filas en el servidor
+function newSubmissionId(){
+  if (window.crypto?.randomUUID) return crypto.randomUUID();
+  const dev = String(DEVICE_ID).replace(/[^A-Za-z0-9._:-]/g, "_").slice(0, 32);
+  return `${dev}-${Date.now().toString(36)}-${Math.random().toString(36).slice(2,10)}`;
+}
 async function enviarRespuesta(principal, motivo, extraMeta = {}){
   const payload = {
+    submission_id: newSubmissionId(),
     sede: SEDE,
     dispositivo_id: DEVICE_ID,
     tipo: APP_TIPO,
@@ -132,29 +139,76 @@ async function enviarRespuesta(principal, motivo, extraMeta = {}){
       ...extraMeta
     }
   };
+  let r = null;
   try{
-    const r = await fetch(`${API_URL}/api/respuestas`, { method:"POST", headers:{ "Content-Type":"application/json" }, body:JSON.stringify(payload) });
+    if (Date.now() < retryAt) throw 0; // el servidor pidió esperar: directo a la cola
+    r = await fetch(`${API_URL}/api/respuestas`, { method:"POST", headers:{ "Content-Type":"application/json" }, body:JSON.stringify(payload) });
     if (!r.ok) throw 0;
+    backoffReset();
   }catch{
     const q = JSON.parse(localStorage.getItem(QUEUE_KEY) || "[]"); q.push(payload);
     localStorage.setItem(QUEUE_KEY, JSON.stringify(q));
     pruneQueue(1000);
+    if (Date.now() >= retryAt && shouldBackoff(r)) backoff(r);
   }
 }
+// Backoff: tras 429/503 (con Retry-After) o sin respuesta no se envía nada hasta retryAt.
+// La espera se duplica en cada fallo (hasta BACKOFF_MAX_MS) y lleva jitter para que los
+// kioscos no reintenten todos a la vez; nunca es menor que el Retry-After del servidor.
+const BACKOFF_MIN_MS = 2000, BACKOFF_MAX_MS = 300000;
+let backoffMs = 0, retryAt = 0, retryTimer = null;
+function shouldBackoff(r){ return !r || r.status === 429 || r.status >= 500; }
+function retryAfterMs(r){
+  const v = r?.headers.get("Retry-After");
+  if (!v) return 0;
+  const s = Number(v);
+  return Number.isFinite(s) ? s*1000 : Math.max(0, (Date.parse(v) || 0) - Date.now());
+}
+function backoff(r){
+  backoffMs = Math.min(BACKOFF_MAX_MS, backoffMs ? backoffMs*2 : BACKOFF_MIN_MS);
+  const wait = Math.max(retryAfterMs(r), backoffMs/2) + Math.random()*backoffMs/2;
+  retryAt = Date.now() + wait;
+  clearTimeout(retryTimer);
+  retryTimer = setTimeout(flushQueue, wait);
+}
+function backoffReset(){ backoffMs = 0; retryAt = 0; }
+// Cola offline: se vacía por lotes (POST /api/respuestas/batch, una transacción por lote)
+const FLUSH_BATCH = 50;
+let flushing = false;
+// Items viejos sin submission_id se identifican por su contenido
+function queueKey(p){ return p?.submission_id || JSON.stringify(p); }
 async function flushQueue(){
+  if (flushing || Date.now() < retryAt) return;
   const q = JSON.parse(localStorage.getItem(QUEUE_KEY) || "[]");
   if (!q.length) return;
-  const rest=[];
-  for (const item of q){
-    try{
-      const r=await fetch(`${API_URL}/api/respuestas`, { method:"POST", headers:{ "Content-Type":"application/json" }, body:JSON.stringify(item) });
-      if (!r.ok) throw 0;
-    }catch{ rest.push(item); }
+  flushing = true;
+  const enviados = new Set();   // claves de los items que el servidor ya confirmó
+  try{
+    for (let i=0; i<q.length; i+=FLUSH_BATCH){
+      const chunk = q.slice(i, i+FLUSH_BATCH);
+      let r = null;
+      try{
+        r=await fetch(`${API_URL}/api/respuestas/batch`, { method:"POST", headers:{ "Content-Type":"application/json" }, body:JSON.stringify(chunk) });
+        if (!r.ok) throw 0;
+        backoffReset();
+        // Items rechazados por validación también se quitan: fallarían en cada reintento
+        chunk.forEach(p => enviados.add(queueKey(p)));
+      }catch{
+        if (shouldBackoff(r)) backoff(r);
+        break; // servidor caído o saturado: no insistir en este ciclo
+      }
+    }
+  }finally{
+    // Se quita lo confirmado por submission_id (no por posición): lo encolado o
+    // descartado mientras se enviaba no desplaza nada
+    const now = JSON.parse(localStorage.getItem(QUEUE_KEY) || "[]");
+    localStorage.setItem(QUEUE_KEY, JSON.stringify(now.filter(p => !enviados.has(queueKey(p)))));
+    flushing = false;
   }
-  localStorage.setItem(QUEUE_KEY, JSON.stringify(rest));
   pruneQueue(1000);
 }
 function pruneQueue(max=1000){
+  if (flushing) return; // flushQueue vuelve a podar al terminar
   const q = JSON.parse(localStorage.getItem(QUEUE_KEY) || "[]");
   if (q.length > max){
     localStorage.setItem(QUEUE_KEY, JSON.stringify(q.slice(q.length - max)));
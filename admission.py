@@ -0,0 +1,100 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+
+# ---------- Control de admisión ----------
+class Rejected(RuntimeError):
+    """Petición no admitida: `status` 429 (cola llena) o 503 (sin turno a tiempo); `retry_after` en s."""
+
+    def __init__(self, mensaje, status, retry_after):
+        super().__init__(mensaje)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Límite de concurrencia por proceso con cola de espera acotada:
+    - Hasta `max_active` peticiones a la vez; las siguientes esperan en orden de
+      llegada (las nuevas no se adelantan a la cola) hasta `max_wait` s.
+    - Con `max_queue` esperando, las que llegan se rechazan al instante (429); si el
+      turno no llega a tiempo, 503. Así una BD lenta no acapara los hilos del worker.
+    - Retry-After se estima con la duración media reciente (EWMA) y lo que hay por
+      delante, entre `retry_min` y `retry_max` s.
+    max_active <= 0 desactiva el límite.
+    """
+
+    def __init__(self, max_active=4, max_queue=8, max_wait=2.0, retry_min=1, retry_max=30):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._ewma = None   # duración media (s) de las peticiones admitidas
+        self._stats = {"admitted": 0, "enqueued": 0, "queued_peak": 0,
+                       "rejected_full": 0, "rejected_timeout": 0, "wait_seconds": 0.0}
+
+    def _retry_after(self):
+        # con _cond tomado
+        tandas = (self._active + self._queued) / self.max_active
+        return max(self.retry_min, min(self.retry_max, math.ceil((self._ewma or 0.1) * (tandas + 1))))
+
+    @contextmanager
+    def admit(self):
+        if self.max_active <= 0:
+            yield
+            return
+        t0 = time.monotonic()
+        with self._cond:
+            if self._active >= self.max_active or self._queued:
+                if self._queued >= self.max_queue:
+                    self._stats["rejected_full"] += 1
+                    raise Rejected("demasiadas peticiones en espera", 429, self._retry_after())
+                self._queued += 1
+                self._stats["enqueued"] += 1
+                self._stats["queued_peak"] = max(self._stats["queued_peak"], self._queued)
+                try:
+                    fin = t0 + self.max_wait
+                    while self._active >= self.max_active:
+                        restante = fin - time.monotonic()
+                        if restante <= 0:
+                            self._stats["rejected_timeout"] += 1
+                            self._stats["wait_seconds"] += time.monotonic() - t0
+                            raise Rejected(f"sin turno en {self.max_wait:g}s", 503, self._retry_after())
+                        self._cond.wait(restante)
+                except Rejected:
+                    if self._active < self.max_active:
+                        # El aviso que consumió quien se rinde pasa al siguiente
+                        self._cond.notify()
+                    raise
+                finally:
+                    self._queued -= 1
+            self._active += 1
+            self._stats["admitted"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - t0
+        t1 = time.monotonic()
+        try:
+            yield
+        finally:
+            duracion = time.monotonic() - t1
+            with self._cond:
+                self._active -= 1
+                self._ewma = duracion if self._ewma is None else self._ewma * 0.8 + duracion * 0.2
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._stats,
+                "active": self._active,
+                "queued": self._queued,
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+                "max_wait": self.max_wait,
+                "avg_seconds": round(self._ewma or 0.0, 4),
+            }
@@ -1,11 +1,40 @@
 import os
+import re
+import time
 import json
+import base64
+import csv
+import io
+import cProfile
+import pstats
+import uuid
 import sqlite3
 import tempfile
+import atexit
+import threading
+import functools
 import traceback
-from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlencode
+from datetime import date, datetime, timedelta, timezone
+from flask import (Flask, Response, request, jsonify, make_response, send_file, send_from_directory,
+                   stream_with_context, g, has_request_context)
 from flask_cors import CORS
+import click
+
+from db_pool import SQLitePool, PostgresPool, PoolTimeout, env_int, env_float
+from admission import AdmissionLimiter, Rejected
+from response_cache import DataVersion, SharedDataVersion, ResponseCache
+from live_feed import Broadcaster, FeedFull
+from write_behind import GroupCommitWriter, WriterClosed, WriterLease, reintentar, es_ocupado
+from metrics import Metrics
+from assets import AssetManifest, elegir_encoding, IMMUTABLE, REVALIDATE
+from dimensiones import Diccionario
+import particiones
+import snapshots
+from columnar import ColumnStore
+import columnar
+import turnos
 
 # ---------- Postgres opcional ----------
 try:
@@ -14,20 +43,36 @@ except Exception:
     psycopg2 = None
 
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
 def is_postgres():
     url = os.getenv("DATABASE_URL") or ""
     return url.startswith("postgres://") or url.startswith("postgresql://")
 
 
-def connect_sqlite():
+# Backend resuelto una vez al importar (cada worker): no se relee el entorno por consulta
+PG = is_postgres()
+
+
+def sqlite_path():
     env_db = os.getenv("SQLITE_PATH")
     if env_db:
-        db_path = env_db
-    elif os.getenv("RENDER") or os.getenv("KOYEB") or os.getenv("PORT"):
-        db_path = os.path.join(tempfile.gettempdir(), "encuesta.db")
-    else:
-        db_path = os.path.join(os.path.dirname(__file__), "encuesta.db")
-    con = sqlite3.connect(db_path, check_same_thread=False)
+        return env_db
+    if os.getenv("RENDER") or os.getenv("KOYEB") or os.getenv("PORT"):
+        return os.path.join(tempfile.gettempdir(), "encuesta.db")
+    return os.path.join(os.path.dirname(__file__), "encuesta.db")
+
+
+# Segundos que una conexión SQLite espera el lock de escritura antes de "database is locked"
+SQLITE_BUSY_TIMEOUT = env_float("SQLITE_BUSY_TIMEOUT", 5.0)
+
+
+def connect_sqlite():
+    con = sqlite3.connect(sqlite_path(), timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
     con.row_factory = sqlite3.Row
     try:
         con.execute("PRAGMA journal_mode=WAL;")
@@ -63,16 +108,188 @@ def connect_postgres():
 
 
 def get_db():
-    return connect_postgres() if is_postgres() else connect_sqlite()
+    """Conexión directa (sin pool). Solo para tareas puntuales como init_db."""
+    return connect_postgres() if PG else connect_sqlite()
+
+
+# ---------- Varios workers ----------
+# gunicorn -w N (o WEB_CONCURRENCY=N): cada worker es un proceso con su pool y sus cachés.
+# - SQLite admite un solo escritor: cada transacción de escritura toma el turno
+#   (WriterLease sobre <db>.writer.lock, espera hasta WRITER_LEASE_TIMEOUT s y luego
+#   503) y se reintenta con backoff si la BD sigue ocupada (checkpoint, CLI).
+# - DATA_VERSION vive en un archivo mapeado en memoria que comparten los workers del
+#   host (DATA_VERSION_PATH, por defecto <db>.version; 0 = solo del proceso): la caché
+#   de respuestas, la columnar y el feed SSE de cada worker ven lo que escriben los demás.
+WRITER_LEASE = None if PG else WriterLease(f"{sqlite_path()}.writer.lock",
+                                           timeout=env_float("WRITER_LEASE_TIMEOUT", 10.0))
+
+
+def turno_escritura():
+    """Turno de escritura entre workers (SQLite); en Postgres no hace falta."""
+    return WRITER_LEASE.hold() if WRITER_LEASE is not None else nullcontext()
+
+
+def crear_data_version():
+    path = os.getenv("DATA_VERSION_PATH") or (
+        os.path.join(tempfile.gettempdir(), "encuestas.version") if PG else f"{sqlite_path()}.version")
+    if fcntl is None or path == "0":
+        return DataVersion()
+    try:
+        return SharedDataVersion(path)
+    except OSError as e:
+        print("WARN: versión de datos compartida no disponible, se usa la del proceso:", e)
+        return DataVersion()
+
+
+# ---------- Métricas de BD ----------
+METRICS = Metrics(slow_query_ms=env_float("SLOW_QUERY_MS", 200.0))
+
+
+def _ruta():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return "-"
+
+
+@contextmanager
+def medir_db(op, sql=None, args=None):
+    """Cronometra una operación de BD; el bloque puede anotar m["rows"]."""
+    m = {"rows": None}
+    t0 = time.perf_counter()
+    try:
+        yield m
+    finally:
+        METRICS.observe_db(_ruta(), op, time.perf_counter() - t0, sql, args, m["rows"])
+
+
+def _connect_medido(connect):
+    def wrapper():
+        with medir_db("connect"):
+            return connect()
+    return wrapper
+
+
+# ---------- Pool ----------
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Pool por proceso (se recrea tras fork):
+    - SQLite: una conexión por hilo.
+    - Postgres: pool acotado DB_POOL_MIN..DB_POOL_MAX con espera DB_POOL_TIMEOUT.
+    """
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if PG:
+                _pool = PostgresPool(
+                    _connect_medido(connect_postgres),
+                    minconn=env_int("DB_POOL_MIN", 1),
+                    maxconn=env_int("DB_POOL_MAX", 5),
+                    timeout=env_float("DB_POOL_TIMEOUT", 10.0),
+                    healthcheck_idle=env_float("DB_POOL_HEALTHCHECK_IDLE", 30.0),
+                )
+            else:
+                _pool = SQLitePool(
+                    _connect_medido(connect_sqlite),
+                    healthcheck_idle=env_float("DB_POOL_HEALTHCHECK_IDLE", 60.0),
+                )
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def _is_connection_error(e):
+    if isinstance(e, (sqlite3.OperationalError, sqlite3.InterfaceError)):
+        return True
+    if psycopg2 and isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return True
+    return False
+
+
+@contextmanager
+def db_conn():
+    """
+    Presta una conexión del pool. Al salir se hace rollback de lo no confirmado;
+    si hubo error de conexión, la conexión se descarta (reciclado).
+    """
+    pool = get_pool()
+    with medir_db("checkout"):
+        con = pool.getconn()
+    broken = False
+    try:
+        yield con
+    except Exception as e:
+        broken = _is_connection_error(e)
+        raise
+    finally:
+        pool.putconn(con, broken=broken)
 
 
 def q(sql: str) -> str:
     """Placeholder adapter: SQLite usa ?, Postgres usa %s."""
-    return sql.replace("?", "%s") if is_postgres() else sql
+    return sql.replace("?", "%s") if PG else sql
+
+
+def fetch_all(sql, args=()):
+    """Ejecuta un SELECT con una conexión del pool y devuelve lista de dicts."""
+    with db_conn() as con, medir_db("query", sql, args) as m:
+        if PG:
+            with con.cursor() as cur:
+                cur.execute(q(sql), tuple(args))
+                cols = [c.name for c in cur.description]
+                rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+        else:
+            cur = con.execute(q(sql), list(args))
+            rows = [dict(r) for r in cur.fetchall()]
+        m["rows"] = len(rows)
+        return rows
+
+
+EXPORT_CHUNK = env_int("EXPORT_CHUNK", 1000)
+
+
+def iter_chunks(sql, args=(), size=None):
+    """
+    Genera bloques de filas (tuplas) sin materializar todo el resultado:
+    cursor de servidor (named cursor) en Postgres, fetchmany en SQLite.
+    """
+    size = size or EXPORT_CHUNK
+    # Solo cuenta el tiempo en la BD, no el que el consumidor tarda entre bloques
+    t_db, n = 0.0, 0
+    try:
+        with db_conn() as con:
+            if PG:
+                cur = con.cursor(name=f"export_{uuid.uuid4().hex}")
+                cur.itersize = size
+                t0 = time.perf_counter()
+                cur.execute(q(sql), tuple(args))
+                t_db += time.perf_counter() - t0
+            else:
+                t0 = time.perf_counter()
+                cur = con.execute(sql, list(args))
+                t_db += time.perf_counter() - t0
+            try:
+                while True:
+                    t0 = time.perf_counter()
+                    rows = cur.fetchmany(size)
+                    t_db += time.perf_counter() - t0
+                    if not rows:
+                        break
+                    n += len(rows)
+                    yield rows
+            finally:
+                cur.close()
+    finally:
+        METRICS.observe_db(_ruta(), "stream", t_db, sql, args, n)
 
 
 def table_has_column(con, table, column):
-    if is_postgres():
+    if PG:
         with con.cursor() as cur:
             cur.execute("""
                 SELECT 1
@@ -85,72 +302,827 @@ def table_has_column(con, table, column):
         return any(row[1] == column for row in cur.fetchall())
 
 
-def init_db():
-    con = get_db()
-    if is_postgres():
+# ---------- Campos extraídos de meta ----------
+def _meta_otro(meta):
+    """meta (dict o JSON) -> (empleado, comentario) de meta.otro; '' si no vienen."""
+    try:
+        if isinstance(meta, str):
+            meta = json.loads(meta or "{}")
+        otro = (meta or {}).get("otro") or {}
+        return str(otro.get("empleado") or "").strip(), str(otro.get("comentario") or "").strip()
+    except Exception:
+        return "", ""
+
+
+def backfill_meta(con, size=1000):
+    """Rellena empleado/comentario de filas previas a las columnas (no hace commit)."""
+    sel = "SELECT id, meta FROM respuestas WHERE empleado IS NULL ORDER BY id LIMIT " + str(size)
+    upd = q("UPDATE respuestas SET empleado = ?, comentario = ? WHERE id = ?")
+    total = 0
+    while True:
+        if PG:
+            with con.cursor() as cur:
+                cur.execute(sel)
+                rows = cur.fetchall()
+                cur.executemany(upd, [(*_meta_otro(meta), rid) for rid, meta in rows])
+        else:
+            rows = con.execute(sel).fetchall()
+            con.executemany(upd, [(*_meta_otro(meta), rid) for rid, meta in rows])
+        total += len(rows)
+        if len(rows) < size:
+            return total
+
+
+# Búsqueda de texto: FTS5 (tabla externa sobre la vista respuestas, mantenida por
+# triggers en respuestas_datos) en SQLite; columna tsvector mantenida por trigger + GIN
+# en Postgres. Pesos PG: A=empleado, B=comentario, C=calificación y motivo.
+_FTS_TEXTO_NEW = ("(SELECT valor FROM dim_calificacion WHERE id = new.id_calificacion), "
+                  "(SELECT valor FROM dim_motivo WHERE id = new.id_motivo), new.empleado, new.comentario")
+_FTS_TEXTO_OLD = _FTS_TEXTO_NEW.replace("new.", "old.")
+
+
+def _fts_triggers_sqlite(tabla, prefijo):
+    """Triggers que mantienen respuestas_fts desde una tabla de datos (la caliente o un mes sellado)."""
+    return (
+        f"""CREATE TRIGGER IF NOT EXISTS {prefijo}_ai AFTER INSERT ON {tabla} BEGIN
+            INSERT INTO respuestas_fts(rowid, calificacion, motivo, empleado, comentario)
+            VALUES (new.id, {_FTS_TEXTO_NEW});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {prefijo}_ad AFTER DELETE ON {tabla} BEGIN
+            INSERT INTO respuestas_fts(respuestas_fts, rowid, calificacion, motivo, empleado, comentario)
+            VALUES ('delete', old.id, {_FTS_TEXTO_OLD});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {prefijo}_au
+        AFTER UPDATE OF id_calificacion, id_motivo, empleado, comentario ON {tabla} BEGIN
+            INSERT INTO respuestas_fts(respuestas_fts, rowid, calificacion, motivo, empleado, comentario)
+            VALUES ('delete', old.id, {_FTS_TEXTO_OLD});
+            INSERT INTO respuestas_fts(rowid, calificacion, motivo, empleado, comentario)
+            VALUES (new.id, {_FTS_TEXTO_NEW});
+        END""",
+    )
+
+
+FTS_SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE respuestas_fts USING fts5(
+        calificacion, motivo, empleado, comentario,
+        content='respuestas', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    *_fts_triggers_sqlite("respuestas_datos", "respuestas_fts"),
+)
+FTS_PG_DDL = (
+    """CREATE OR REPLACE FUNCTION respuestas_fts_doc() RETURNS trigger AS $$
+    BEGIN
+        NEW.fts := setweight(to_tsvector('simple', coalesce(NEW.empleado, '')), 'A') ||
+                   setweight(to_tsvector('simple', coalesce(NEW.comentario, '')), 'B') ||
+                   setweight(to_tsvector('simple',
+                       coalesce((SELECT valor FROM dim_calificacion WHERE id = NEW.id_calificacion), '') || ' ' ||
+                       coalesce((SELECT valor FROM dim_motivo WHERE id = NEW.id_motivo), '')), 'C');
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS respuestas_fts_doc ON respuestas_datos",
+    """CREATE TRIGGER respuestas_fts_doc
+    BEFORE INSERT OR UPDATE OF id_calificacion, id_motivo, empleado, comentario ON respuestas_datos
+    FOR EACH ROW EXECUTE FUNCTION respuestas_fts_doc()""",
+)
+_fts_ok = False   # SQLite compilado sin FTS5 -> q/comentario con LIKE
+
+
+def init_fts_sqlite(con):
+    """Crea respuestas_fts y sus triggers; la primera vez indexa las filas existentes."""
+    global _fts_ok
+    existe = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'respuestas_fts'").fetchone()
+    try:
+        if not existe:
+            con.execute(FTS_SQLITE_DDL[0])
+        for ddl in FTS_SQLITE_DDL[1:]:
+            con.execute(ddl)
+        if not existe:
+            con.execute("INSERT INTO respuestas_fts(respuestas_fts) VALUES ('rebuild')")
+        _fts_ok = True
+    except sqlite3.OperationalError as e:
+        print("WARN: FTS5 no disponible, búsqueda con LIKE:", e)
+        _fts_ok = False
+
+
+# ---------- Dimensiones (claves enteras) ----------
+# respuestas_datos guarda enteros en lugar de repetir sede, dispositivo, calificación,
+# motivo y tipo en cada fila; la vista `respuestas` devuelve las mismas columnas de
+# texto que antes (lecturas y JSON sin cambios) más las claves id_*.
+# columna de texto -> (tabla de dimensión, columna entera en respuestas_datos)
+DIMENSIONES = {
+    "sede": ("dim_sede", "id_sede"),
+    "dispositivo_id": ("dim_dispositivo", "id_dispositivo"),
+    "calificacion": ("dim_calificacion", "id_calificacion"),
+    "motivo": ("dim_motivo", "id_motivo"),
+    "tipo": ("dim_tipo", "id_tipo"),
+}
+DIM_POR_ID = {id_col: (tabla, col) for col, (tabla, id_col) in DIMENSIONES.items()}
+DICCIONARIO = Diccionario()
+
+
+def _ejecutar(con, sql, args=()):
+    """Ejecuta en cualquiera de los dos motores; devuelve las filas si las hay."""
+    if PG:
+        with con.cursor() as cur:
+            cur.execute(q(sql), tuple(args) or None)
+            return cur.fetchall() if cur.description else []
+    return con.execute(sql, list(args)).fetchall()
+
+
+def _existe_tabla(con, nombre):
+    if PG:
+        sql = "SELECT 1 FROM information_schema.tables WHERE table_name = ? AND table_type = 'BASE TABLE'"
+    else:
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    return bool(_ejecutar(con, sql, (nombre,)))
+
+
+def _ddl_respuestas_datos(tabla="respuestas_datos", pk=None, particionada=False):
+    """
+    Tabla de datos. pk distinto para los meses sellados de SQLite (los ids vienen de
+    la tabla caliente); particionada=True es la tabla padre de Postgres, con created_at
+    en collation "C" (orden binario, como los límites de las particiones).
+    """
+    if pk is None:
+        pk = "id SERIAL PRIMARY KEY" if PG else "id INTEGER PRIMARY KEY AUTOINCREMENT"
+    fts = ", fts tsvector" if PG else ""
+    collate = ' COLLATE "C"' if particionada else ""
+    fin = ",\n            PRIMARY KEY (id, created_at)\n        ) PARTITION BY RANGE (created_at)" if particionada else "\n        )"
+    return f"""
+        CREATE TABLE {tabla} (
+            {pk},
+            created_at TEXT{collate} NOT NULL,
+            dia TEXT,
+            id_sede INTEGER,
+            id_dispositivo INTEGER,
+            id_calificacion INTEGER NOT NULL,
+            id_motivo INTEGER NOT NULL,
+            meta TEXT,
+            id_tipo INTEGER,
+            submission_id TEXT,
+            empleado TEXT,
+            comentario TEXT{fts}{fin}
+    """
+
+
+def _ddl_vista_respuestas(fuente="respuestas_datos"):
+    texto = ", ".join(f"{tabla}.valor AS {col}" for col, (tabla, _) in DIMENSIONES.items())
+    ids = ", ".join(f"d.{id_col}" for _, id_col in DIMENSIONES.values())
+    joins = "".join(f" LEFT JOIN {tabla} ON {tabla}.id = d.{id_col}" for tabla, id_col in DIMENSIONES.values())
+    fts = ", d.fts" if PG else ""
+    return f"""
+        CREATE VIEW respuestas AS
+        SELECT d.id, d.created_at, d.dia, d.meta, d.submission_id, d.empleado, d.comentario,
+               {texto}, {ids}{fts}
+        FROM {fuente} d{joins}
+    """
+
+
+def migrar_dimensiones(con):
+    """
+    Tabla respuestas con texto -> dimensiones + respuestas_datos + vista respuestas.
+    Copia conservando ids y el contador de la secuencia, en una transacción (hace commit).
+    """
+    pg = PG
+    if pg:
+        con.autocommit = False
+        seq = _ejecutar(con, "SELECT last_value FROM " + _ejecutar(
+            con, "SELECT pg_get_serial_sequence('respuestas', 'id')")[0][0])[0][0]
+    else:
+        con.commit()
+        con.execute("BEGIN IMMEDIATE")
+        r = con.execute("SELECT seq FROM sqlite_sequence WHERE name = 'respuestas'").fetchone()
+        seq = r[0] if r else 0
+    pk = "id SERIAL PRIMARY KEY" if pg else "id INTEGER PRIMARY KEY"
+    for col, (tabla, _) in DIMENSIONES.items():
+        _ejecutar(con, f"CREATE TABLE IF NOT EXISTS {tabla} ({pk}, valor TEXT NOT NULL UNIQUE)")
+        _ejecutar(con, f"""
+            INSERT INTO {tabla} (valor) SELECT DISTINCT {col} FROM respuestas
+            WHERE {col} IS NOT NULL ORDER BY {col} ON CONFLICT (valor) DO NOTHING
+        """)
+    _ejecutar(con, _ddl_respuestas_datos())
+    if pg:
+        for ddl in FTS_PG_DDL:
+            _ejecutar(con, ddl)
+    comunes = ("id", "created_at", "dia", "meta", "submission_id", "empleado", "comentario")
+    ids = [id_col for _, id_col in DIMENSIONES.values()]
+    joins = "".join(f" LEFT JOIN {tabla} ON {tabla}.valor = r.{col}" for col, (tabla, _) in DIMENSIONES.items())
+    _ejecutar(con, f"""
+        INSERT INTO respuestas_datos ({', '.join(comunes + tuple(ids))})
+        SELECT {', '.join('r.' + c for c in comunes)}, {', '.join(t + '.id' for t, _ in DIMENSIONES.values())}
+        FROM respuestas r{joins}
+    """)
+    if pg:
+        _ejecutar(con, "SELECT setval(pg_get_serial_sequence('respuestas_datos', 'id'), "
+                       "GREATEST(?, (SELECT coalesce(max(id), 1) FROM respuestas_datos)))", (seq,))
+    else:
+        con.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'respuestas_datos'", (seq,))
+    _ejecutar(con, "DROP TABLE respuestas")
+    _ejecutar(con, _ddl_vista_respuestas())
+    # El rollup con texto se descarta; init_db lo recrea con claves y lo reconstruye
+    _ejecutar(con, "DROP TABLE IF EXISTS resumen_diario")
+    con.commit()
+    if pg:
         con.autocommit = True
+
+
+def cargar_diccionario(con):
+    sql = " UNION ALL ".join(f"SELECT '{col}', id, valor FROM {tabla}" for col, (tabla, _) in DIMENSIONES.items())
+    ids = {col: {} for col in DIMENSIONES}
+    for col, i, v in _ejecutar(con, sql):
+        ids[col][v] = i
+    for col, d in ids.items():
+        DICCIONARIO.agregar(col, d)
+
+
+def ids_dimension(con, col, valores):
+    """
+    {valor: id} para la columna de texto `col`. Lo que el diccionario no conoce se
+    crea o busca en la transacción de `con` y no se cachea (podría deshacerse).
+    """
+    ids, faltan = DICCIONARIO.buscar(col, valores)
+    if faltan:
+        tabla = DIMENSIONES[col][0]
+        faltan = sorted(faltan)
+        ins = q(f"INSERT INTO {tabla} (valor) VALUES (?) ON CONFLICT (valor) DO NOTHING")
+        if PG:
+            with con.cursor() as cur:
+                cur.executemany(ins, [(v,) for v in faltan])
+        else:
+            con.executemany(ins, [(v,) for v in faltan])
+        sql = f"SELECT valor, id FROM {tabla} WHERE valor IN ({', '.join('?' for _ in faltan)})"
+        ids.update(_ejecutar(con, sql, faltan))
+    return ids
+
+
+def asegurar_dimensiones(rows):
+    """
+    Da de alta en su propia transacción los valores que el diccionario aún no conoce
+    (un dispositivo o motivo nuevo) y los cachea tras el commit. En régimen normal
+    no toca la BD: insert_respuestas resuelve todo desde el diccionario.
+    """
+    faltan = {}
+    for col in DIMENSIONES:
+        f = DICCIONARIO.buscar(col, {r[col] for r in rows})[1]
+        if f:
+            faltan[col] = f
+    if not faltan:
+        return
+
+    def alta():
+        with db_conn() as con, turno_escritura():
+            nuevos = {col: ids_dimension(con, col, f) for col, f in faltan.items()}
+            con.commit()
+        return nuevos
+    for col, ids in reintentar(alta).items():
+        DICCIONARIO.agregar(col, ids)
+
+
+def filas_datos(con, rows):
+    """Filas validadas (texto) -> tuplas en el orden de DATOS_COLS."""
+    ids = {col: ids_dimension(con, col, {r[col] for r in rows}) for col in DIMENSIONES}
+    return [tuple(ids[c][r[c]] if c in ids else r[c] for c in INSERT_COLS) for r in rows]
+
+
+def traducir_dimensiones(sql, columnas):
+    """
+    `sql` agrupa por claves id_* (enteros: más baratos de agrupar que el texto).
+    Devuelve un SELECT con las mismas `columnas` en el mismo orden, cada id_*
+    sustituida por el texto de su dimensión (mismo nombre que antes: tipo, motivo...).
+    """
+    sel, joins = [], []
+    for i, c in enumerate(columnas):
+        if c in DIM_POR_ID:
+            tabla, col = DIM_POR_ID[c]
+            sel.append(f"d{i}.valor AS {col}")
+            joins.append(f" LEFT JOIN {tabla} d{i} ON d{i}.id = x.{c}")
+        else:
+            sel.append(f"x.{c}")
+    return f"SELECT {', '.join(sel)} FROM ({sql}) x{''.join(joins)}"
+
+
+# ---------- Rollup diario ----------
+# Claves de dimensión; 0 en lugar de NULL para que el ON CONFLICT agrupe
+ROLLUP_KEY = ("dia", "id_tipo", "id_sede", "id_calificacion", "id_motivo")
+ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS resumen_diario (
+        dia TEXT NOT NULL,
+        id_tipo INTEGER NOT NULL,
+        id_sede INTEGER NOT NULL,
+        id_calificacion INTEGER NOT NULL,
+        id_motivo INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (dia, id_tipo, id_sede, id_calificacion, id_motivo)
+    )
+"""
+
+
+def rollup_add(con, filas):
+    """
+    Suma filas recién insertadas (tuplas en el orden de DATOS_COLS) al rollup,
+    en la misma transacción que el INSERT.
+    """
+    if not filas:
+        return
+    pos = [DATOS_COLS.index(c) for c in ROLLUP_KEY]
+    conteo = {}
+    for f in filas:
+        k = tuple(f[i] or 0 for i in pos)
+        conteo[k] = conteo.get(k, 0) + 1
+    params = [k + (n,) for k, n in conteo.items()]
+    cols = ", ".join(ROLLUP_KEY)
+    upsert = f"ON CONFLICT ({cols}) DO UPDATE SET n = resumen_diario.n + excluded.n"
+    if PG:
+        from psycopg2.extras import execute_values
         with con.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS respuestas (
-                    id SERIAL PRIMARY KEY,
-                    created_at TEXT NOT NULL,
-                    sede TEXT,
-                    dispositivo_id TEXT,
-                    calificacion TEXT NOT NULL,
-                    motivo TEXT NOT NULL,
-                    meta TEXT,
-                    tipo TEXT
-                )
-            """)
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_created_at ON respuestas(created_at)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_tipo       ON respuestas(tipo)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_calif      ON respuestas(calificacion)")
-            if not table_has_column(con, "respuestas", "tipo"):
-                cur.execute("ALTER TABLE respuestas ADD COLUMN tipo TEXT")
-                cur.execute("""
-                    UPDATE respuestas
-                    SET tipo = CASE
-                        WHEN lower(coalesce(dispositivo_id,'')) LIKE '%transporte%' THEN 'transporte'
-                        WHEN lower(coalesce(dispositivo_id,'')) LIKE '%comedor%'    THEN 'comedor'
-                        ELSE 'desconocido'
-                    END
-                    WHERE tipo IS NULL OR tipo = ''
-                """)
-        con.close()
+            execute_values(cur, f"INSERT INTO resumen_diario ({cols}, n) VALUES %s {upsert}", params)
     else:
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS respuestas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                created_at TEXT NOT NULL,
-                sede TEXT,
-                dispositivo_id TEXT,
-                calificacion TEXT NOT NULL,
-                motivo TEXT NOT NULL,
-                meta TEXT,
-                tipo TEXT
-            )
+        con.executemany(f"INSERT INTO resumen_diario ({cols}, n) VALUES (?, ?, ?, ?, ?, ?) {upsert}", params)
+
+
+def rebuild_rollup(con, fuente="respuestas_todas"):
+    """Recalcula resumen_diario desde los datos (no hace commit)."""
+    sql_del = "DELETE FROM resumen_diario"
+    sql_ins = f"""
+        INSERT INTO resumen_diario (dia, id_tipo, id_sede, id_calificacion, id_motivo, n)
+        SELECT dia, coalesce(id_tipo,0), coalesce(id_sede,0), id_calificacion, id_motivo, COUNT(*)
+        FROM {fuente}
+        GROUP BY dia, coalesce(id_tipo,0), coalesce(id_sede,0), id_calificacion, id_motivo
+    """
+    if PG:
+        with con.cursor() as cur:
+            cur.execute(sql_del)
+            cur.execute(sql_ins)
+    else:
+        con.execute(sql_del)
+        con.execute(sql_ins)
+
+
+def _rollup_vacio(con, fuente="respuestas_todas"):
+    sql = f"SELECT (SELECT 1 FROM resumen_diario LIMIT 1), (SELECT 1 FROM {fuente} LIMIT 1)"
+    if PG:
+        with con.cursor() as cur:
+            cur.execute(sql)
+            r = cur.fetchone()
+    else:
+        r = con.execute(sql).fetchone()
+    return r[0] is None and r[1] is not None
+
+
+# ---------- Particiones mensuales ----------
+# Postgres: respuestas_datos es una tabla particionada por rango de created_at (un mes
+# por partición más una DEFAULT); el planificador descarta las particiones fuera del
+# rango de fechas. Como un UNIQUE debe incluir la clave de partición, la unicidad
+# global de submission_id la da la tabla `envios`.
+# SQLite: respuestas_datos es la tabla "caliente" donde se escribe (meses abiertos);
+# el mantenimiento mueve cada mes cerrado a respuestas_datos_YYYY_MM. La vista
+# respuestas_todas los une con UNION ALL: SQLite empuja los filtros de fecha a cada
+# rama (una búsqueda en el índice de cada mes que no aplica) y resuelve ORDER BY ...
+# LIMIT mezclando las ramas ya ordenadas.
+# En ambos motores, el catálogo `particiones` registra cada mes (abierta, cerrada,
+# archivada) y, una vez archivado, el archivo NDJSON gzip con sus filas.
+# Los submission_id de los meses archivados quedan en `envios_archivados` (con el id
+# original): un kiosco que reenvía un envío ya archivado recibe "duplicado" igual.
+PARTICIONES_DDL = """
+    CREATE TABLE IF NOT EXISTS particiones (
+        mes TEXT PRIMARY KEY,
+        tabla TEXT NOT NULL,
+        estado TEXT NOT NULL,
+        filas INTEGER,
+        archivo TEXT,
+        bytes INTEGER,
+        sha256 TEXT,
+        actualizada TEXT NOT NULL
+    )
+"""
+ENVIOS_ARCHIVADOS_DDL = """
+    CREATE TABLE IF NOT EXISTS envios_archivados (
+        submission_id TEXT PRIMARY KEY,
+        id INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        tipo TEXT,
+        mes TEXT NOT NULL
+    )
+"""
+
+
+def _columnas_datos():
+    return ", ".join(("id",) + DATOS_COLS)
+
+
+def _registrar_particion(con, mes, estado, **campos):
+    cols = ("mes", "tabla", "estado", "actualizada") + tuple(campos)
+    valores = (mes, particiones.tabla(mes), estado, now_iso()) + tuple(campos.values())
+    sets = ", ".join(f"{c} = excluded.{c}" for c in cols[2:])
+    _ejecutar(con, f"INSERT INTO particiones ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+                   f"ON CONFLICT (mes) DO UPDATE SET {sets}", valores)
+
+
+def _recrear_vistas_sqlite(con):
+    """respuestas_todas = tabla caliente + meses sellados; respuestas = la anterior con dimensiones."""
+    tablas = ["respuestas_datos"] + [t for (t,) in _ejecutar(
+        con, "SELECT tabla FROM particiones WHERE estado = 'cerrada' ORDER BY mes DESC")]
+    cols = _columnas_datos()
+    con.execute("DROP VIEW IF EXISTS respuestas")
+    con.execute("DROP VIEW IF EXISTS respuestas_todas")
+    con.execute("CREATE VIEW respuestas_todas AS " + " UNION ALL ".join(f"SELECT {cols} FROM {t}" for t in tablas))
+    con.execute(_ddl_vista_respuestas("respuestas_todas"))
+
+
+def contar_respuestas(where, args):
+    """
+    COUNT(*) del filtro sobre respuestas_todas. En SQLite, contar a través de la vista
+    UNION ALL pasa cada fila por la vista; se suma el COUNT de cada tabla.
+    """
+    if not PG:
+        tablas = ["respuestas_datos"] + [r["tabla"] for r in fetch_all(
+            "SELECT tabla FROM particiones WHERE estado = 'cerrada'")]
+        sql = "SELECT " + " + ".join(f"(SELECT COUNT(*) FROM {t} WHERE 1=1{where})" for t in tablas) + " AS n"
+        try:
+            return fetch_all(sql, list(args) * len(tablas))[0]["n"]
+        except sqlite3.OperationalError:
+            pass   # un mes se archivó entre las dos lecturas
+    return fetch_all(f"SELECT COUNT(*) AS n FROM respuestas_todas WHERE 1=1{where}", args)[0]["n"]
+
+
+def crear_particion_pg(con, mes, estado="abierta"):
+    """Partición del mes (si no existe) y su fila en el catálogo."""
+    _ejecutar(con, f"""
+        CREATE TABLE IF NOT EXISTS {particiones.tabla(mes)} PARTITION OF respuestas_datos
+        FOR VALUES FROM ('{particiones.inicio(mes)}') TO ('{particiones.inicio(particiones.sumar(mes, 1))}')
+    """)
+    _ejecutar(con, "INSERT INTO particiones (mes, tabla, estado, actualizada) VALUES (?, ?, ?, ?) "
+                   "ON CONFLICT (mes) DO NOTHING", (mes, particiones.tabla(mes), estado, now_iso()))
+
+
+def _particionar_pg(con):
+    """respuestas_datos (tabla normal) -> tabla particionada por mes, en una transacción."""
+    if _ejecutar(con, "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'respuestas_datos'::regclass"):
+        return
+    actual = particiones.mes_de(now_iso())
+    con.autocommit = False
+    try:
+        _ejecutar(con, "LOCK TABLE respuestas_datos IN ACCESS EXCLUSIVE MODE")
+        seq = _ejecutar(con, "SELECT pg_get_serial_sequence('respuestas_datos', 'id')")[0][0]
+        _ejecutar(con, "DROP VIEW IF EXISTS respuestas")
+        _ejecutar(con, "ALTER TABLE respuestas_datos RENAME TO respuestas_datos_plana")
+        _ejecutar(con, f"ALTER SEQUENCE {seq} OWNED BY NONE")
+        _ejecutar(con, _ddl_respuestas_datos(pk=f"id INTEGER NOT NULL DEFAULT nextval('{seq}')", particionada=True))
+        _ejecutar(con, f"ALTER SEQUENCE {seq} OWNED BY respuestas_datos.id")
+        _ejecutar(con, "CREATE TABLE respuestas_datos_default PARTITION OF respuestas_datos DEFAULT")
+        meses = {m for (m,) in _ejecutar(con, "SELECT DISTINCT substr(created_at,1,7) FROM respuestas_datos_plana")}
+        for mes in sorted(meses | {actual, particiones.sumar(actual, 1)}):
+            crear_particion_pg(con, mes, "abierta" if mes >= actual else "cerrada")
+        cols = _columnas_datos() + ", fts"
+        _ejecutar(con, f"INSERT INTO respuestas_datos ({cols}) SELECT {cols} FROM respuestas_datos_plana")
+        _ejecutar(con, "CREATE TABLE IF NOT EXISTS envios (submission_id TEXT PRIMARY KEY)")
+        _ejecutar(con, "INSERT INTO envios (submission_id) SELECT submission_id FROM respuestas_datos_plana "
+                       "WHERE submission_id IS NOT NULL ON CONFLICT DO NOTHING")
+        _ejecutar(con, "DROP TABLE respuestas_datos_plana")
+        for ddl in _ddl_indices("respuestas_datos", "respuestas", submission_unico=False):
+            _ejecutar(con, ddl)
+        for ddl in FTS_PG_DDL:
+            _ejecutar(con, ddl)
+        _ejecutar(con, "CREATE VIEW respuestas_todas AS SELECT * FROM respuestas_datos")
+        _ejecutar(con, _ddl_vista_respuestas("respuestas_todas"))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.autocommit = True
+
+
+def sellar_mes_sqlite(con, mes):
+    """
+    Mueve las filas del mes de la tabla caliente a su tabla mensual, un día por
+    transacción (el lock de escritura se suelta entre días). Cada fila está siempre
+    en una sola de las dos tablas; interrumpido, la siguiente pasada continúa.
+    """
+    tabla = particiones.tabla(mes)
+    desde, hasta = particiones.inicio(mes), particiones.inicio(particiones.sumar(mes, 1))
+    con.commit()
+    with turno_escritura():
+        con.execute("BEGIN IMMEDIATE")
+        if not _existe_tabla(con, tabla):
+            con.execute(_ddl_respuestas_datos(tabla, pk="id INTEGER PRIMARY KEY"))
+            for ddl in _ddl_indices(tabla, tabla) + (list(_fts_triggers_sqlite(tabla, tabla + "_fts")) if _fts_ok else []):
+                con.execute(ddl)
+            _registrar_particion(con, mes, "cerrada")
+            _recrear_vistas_sqlite(con)
+        con.commit()
+    cols = _columnas_datos()
+    dias = [d for (d,) in con.execute(
+        "SELECT DISTINCT dia FROM respuestas_datos WHERE dia >= ? AND dia < ? ORDER BY dia", (desde, hasta))]
+    for dia in dias:
+        # Un turno por día: las escrituras de los kioscos pasan entre medias
+        with turno_escritura():
+            con.execute("BEGIN IMMEDIATE")
+            # Borrar antes de insertar: el trigger de borrado saca la fila de respuestas_fts
+            # y el de inserción de la tabla mensual la vuelve a indexar con el mismo rowid
+            con.execute(f"CREATE TEMP TABLE mover AS SELECT {cols} FROM respuestas_datos WHERE dia = ?", (dia,))
+            con.execute("DELETE FROM respuestas_datos WHERE dia = ?", (dia,))
+            con.execute(f"INSERT INTO {tabla} ({cols}) SELECT {cols} FROM temp.mover")
+            con.execute("DROP TABLE temp.mover")
+            con.commit()
+    filas = con.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    with turno_escritura():
+        _registrar_particion(con, mes, "cerrada", filas=filas)
+        con.commit()
+    return filas
+
+
+def archivar_mes(con, mes, directorio):
+    """
+    Escribe las filas del mes (forma pública, como el export NDJSON) en
+    <directorio>/respuestas-YYYY-MM.ndjson.gz y solo entonces las quita de la base:
+    partición y filas del rollup. Sus submission_id pasan a `envios_archivados` (en
+    Postgres siguen además en `envios`), para que los reenvíos sigan siendo duplicados.
+    """
+    tabla = particiones.tabla(mes)
+    desde, hasta = particiones.inicio(mes), particiones.inicio(particiones.sumar(mes, 1))
+    path = os.path.abspath(os.path.join(directorio, f"respuestas-{mes}.ndjson.gz"))
+    sql = f"SELECT {', '.join(RESPUESTA_COLS)} FROM respuestas WHERE created_at >= ? AND created_at < ? ORDER BY id"
+    if PG:
+        con.autocommit = False
+        cur = con.cursor(name=f"archivo_{uuid.uuid4().hex}")
+        cur.execute(q(sql), (desde, hasta))
+    else:
+        cur = con.execute(sql, (desde, hasta))
+
+    def filas():
+        while True:
+            bloque = cur.fetchmany(EXPORT_CHUNK)
+            if not bloque:
+                return
+            for r in bloque:
+                yield dict(zip(RESPUESTA_COLS, r))
+
+    try:
+        n, tam, sha = particiones.escribir_archivo(path, filas())
+    finally:
+        cur.close()
+    if PG:
+        con.commit()
+    with turno_escritura():
+        if not PG:
+            con.execute("BEGIN IMMEDIATE")
+        try:
+            esperadas = _ejecutar(con, f"SELECT COUNT(*) FROM {tabla}")[0][0]
+            if esperadas != n:
+                raise RuntimeError(f"archivo de {mes} con {n} filas, la partición tiene {esperadas}")
+            _ejecutar(con, "INSERT INTO envios_archivados (submission_id, id, created_at, tipo, mes) "
+                           "SELECT submission_id, id, created_at, tipo, ? FROM respuestas "
+                           "WHERE created_at >= ? AND created_at < ? AND submission_id IS NOT NULL "
+                           "ON CONFLICT (submission_id) DO NOTHING", (mes, desde, hasta))
+            _registrar_particion(con, mes, "archivada", filas=n, archivo=path, bytes=tam, sha256=sha)
+            _ejecutar(con, "DELETE FROM resumen_diario WHERE dia >= ? AND dia < ?", (desde, hasta))
+            if PG:
+                _ejecutar(con, f"ALTER TABLE respuestas_datos DETACH PARTITION {tabla}")
+            else:
+                _recrear_vistas_sqlite(con)
+                con.execute(f"DELETE FROM {tabla}")   # triggers: fuera de respuestas_fts
+            _ejecutar(con, f"DROP TABLE {tabla}")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            if PG:
+                con.autocommit = True
+    return n
+
+
+def _m_particiones(con):
+    _ejecutar(con, PARTICIONES_DDL)
+    if PG:
+        _particionar_pg(con)
+    else:
+        _recrear_vistas_sqlite(con)
+
+
+def _m_envios_archivados(con):
+    # Los meses archivados antes de esta migración no guardaron sus submission_id
+    _ejecutar(con, ENVIOS_ARCHIVADOS_DDL)
+
+
+# ---------- Esquema versionado ----------
+# Migraciones en orden; schema_version registra las aplicadas. Un worker que arranca
+# contra una base al día hace una sola lectura de versión (más el diccionario).
+# Todas son idempotentes (IF NOT EXISTS, comprobaciones previas): una base anterior
+# a schema_version las ejecuta una vez desde la 1, y si un proceso muere entre una
+# migración y su registro, repetirla no hace daño.
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        aplicada TEXT NOT NULL
+    )
+"""
+# Claves de advisory lock de Postgres (lock_entre_procesos)
+LOCK_IDS = {"migrate": 7301, "particiones": 7302, "reportes": 7303}
+
+
+def _m_respuestas_texto(con):
+    """Tabla respuestas con texto (bases previas a las dimensiones): columnas y backfills."""
+    if _existe_tabla(con, "respuestas_datos"):
+        return
+    pk = "id SERIAL PRIMARY KEY" if PG else "id INTEGER PRIMARY KEY AUTOINCREMENT"
+    _ejecutar(con, f"""
+        CREATE TABLE IF NOT EXISTS respuestas (
+            {pk},
+            created_at TEXT NOT NULL,
+            sede TEXT,
+            dispositivo_id TEXT,
+            calificacion TEXT NOT NULL,
+            motivo TEXT NOT NULL,
+            meta TEXT,
+            tipo TEXT,
+            submission_id TEXT,
+            dia TEXT,
+            empleado TEXT,
+            comentario TEXT
+        )
+    """)
+    if not table_has_column(con, "respuestas", "tipo"):
+        _ejecutar(con, "ALTER TABLE respuestas ADD COLUMN tipo TEXT")
+        _ejecutar(con, """
+            UPDATE respuestas
+            SET tipo = CASE
+                WHEN lower(coalesce(dispositivo_id,'')) LIKE '%transporte%' THEN 'transporte'
+                WHEN lower(coalesce(dispositivo_id,'')) LIKE '%comedor%'    THEN 'comedor'
+                ELSE 'desconocido'
+            END
+            WHERE tipo IS NULL OR tipo = ''
         """)
-        if not table_has_column(con, "respuestas", "tipo"):
-            con.execute("ALTER TABLE respuestas ADD COLUMN tipo TEXT")
-            con.execute("""
-                UPDATE respuestas
-                SET tipo = CASE
-                    WHEN lower(coalesce(dispositivo_id,'')) LIKE '%transporte%' THEN 'transporte'
-                    WHEN lower(coalesce(dispositivo_id,'')) LIKE '%comedor%'    THEN 'comedor'
-                    ELSE 'desconocido'
-                END
-                WHERE tipo IS NULL OR tipo = ''
-            """)
-        con.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_created_at ON respuestas(created_at)")
-        con.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_tipo       ON respuestas(tipo)")
-        con.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_calif      ON respuestas(calificacion)")
+    for col in ("submission_id", "dia", "empleado", "comentario"):
+        if not table_has_column(con, "respuestas", col):
+            _ejecutar(con, f"ALTER TABLE respuestas ADD COLUMN {col} TEXT")
+    _ejecutar(con, "UPDATE respuestas SET dia = substr(created_at,1,10) WHERE dia IS NULL")
+    backfill_meta(con)
+
+
+def _m_dimensiones(con):
+    if _existe_tabla(con, "respuestas_datos"):
+        return
+    migrar_dimensiones(con)
+    if not PG:
+        con.execute("VACUUM")   # devuelve al disco las páginas de la tabla de texto
+
+
+def _ddl_indices(tabla, nombre, submission_unico=True):
+    """Índices de una tabla de datos; `nombre` forma los nombres (idx_<nombre>_...)."""
+    empleado = "lower(empleado) text_pattern_ops" if PG else "empleado COLLATE NOCASE"
+    submission = (f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{nombre}_submission" if submission_unico
+                  else f"CREATE INDEX IF NOT EXISTS idx_{nombre}_submission")
+    ddl = [
+        f"CREATE INDEX IF NOT EXISTS idx_{nombre}_created_id ON {tabla}(created_at, id)",
+        f"CREATE INDEX IF NOT EXISTS idx_{nombre}_tipo       ON {tabla}(id_tipo)",
+        f"CREATE INDEX IF NOT EXISTS idx_{nombre}_calif      ON {tabla}(id_calificacion)",
+        f"{submission} ON {tabla}(submission_id)",
+        f"CREATE INDEX IF NOT EXISTS idx_{nombre}_dia ON {tabla}(dia, id_tipo, id_calificacion)",
+        f"CREATE INDEX IF NOT EXISTS idx_{nombre}_empleado ON {tabla}({empleado})",
+    ]
+    if PG:
+        ddl.append(f"CREATE INDEX IF NOT EXISTS idx_{nombre}_fts ON {tabla} USING GIN (fts)")
+    return ddl
+
+
+def _m_indices(con):
+    for ddl in _ddl_indices("respuestas_datos", "respuestas"):
+        _ejecutar(con, ddl)
+
+
+def _m_fts(con):
+    # En Postgres la columna tsvector y su trigger los crea migrar_dimensiones
+    if not PG:
+        init_fts_sqlite(con)
+
+
+def _m_rollup(con):
+    _ejecutar(con, ROLLUP_DDL)
+    # Anterior a las particiones: todos los datos están aún en respuestas_datos
+    if _rollup_vacio(con, "respuestas_datos"):
+        rebuild_rollup(con, "respuestas_datos")
+
+
+def _m_indice_created(con):
+    # (created_at, id) cubre lo que cubría (created_at): una sola entrada por escritura
+    tablas = [("respuestas_datos", "respuestas")]
+    if not PG:
+        tablas += [(t, t) for (t,) in _ejecutar(con, "SELECT tabla FROM particiones WHERE estado = 'cerrada'")]
+    for tabla, nombre in tablas:
+        _ejecutar(con, f"CREATE INDEX IF NOT EXISTS idx_{nombre}_created_id ON {tabla}(created_at, id)")
+        _ejecutar(con, f"DROP INDEX IF EXISTS idx_{nombre}_created_at")
+
+
+# (versión, nombre, función). Solo se añaden al final; nunca se renumeran.
+MIGRACIONES = (
+    (1, "respuestas_texto", _m_respuestas_texto),
+    (2, "dimensiones", _m_dimensiones),
+    (3, "indices", _m_indices),
+    (4, "fts", _m_fts),
+    (5, "rollup_diario", _m_rollup),
+    (6, "particiones", _m_particiones),
+    (7, "envios_archivados", _m_envios_archivados),
+    (8, "indice_created_id", _m_indice_created),
+)
+ESQUEMA_VERSION = MIGRACIONES[-1][0]
+_TABLA_INEXISTENTE = (sqlite3.OperationalError,) + ((psycopg2.ProgrammingError,) if psycopg2 else ())
+
+
+def estado_esquema(con):
+    """(versión aplicada, hay tabla FTS5) en una sola consulta; versión 0 sin schema_version."""
+    sql = "SELECT max(version) FROM schema_version" if PG else \
+        "SELECT max(version), EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'respuestas_fts') FROM schema_version"
+    try:
+        r = _ejecutar(con, sql)[0]
+    except _TABLA_INEXISTENTE:
+        return 0, False
+    return r[0] or 0, not PG and bool(r[1])
+
+
+@contextmanager
+def lock_entre_procesos(con, clave, esperar=True):
+    """
+    Lock con nombre entre workers: advisory lock en Postgres, flock de <db>.<clave>.lock
+    en SQLite. Entrega True si se obtuvo (con esperar=False puede ser False).
+    """
+    if PG:
+        lock_id = LOCK_IDS[clave]
+        if esperar:
+            _ejecutar(con, "SELECT pg_advisory_lock(?)", (lock_id,))
+        elif not _ejecutar(con, "SELECT pg_try_advisory_lock(?)", (lock_id,))[0][0]:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _ejecutar(con, "SELECT pg_advisory_unlock(?)", (lock_id,))
+    elif fcntl is None:
+        yield True
+    else:
+        with open(f"{sqlite_path()}.{clave}.lock", "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def aplicar_migraciones(con):
+    """Aplica las migraciones pendientes en orden (llamar con el lock "migrate" tomado)."""
+    _ejecutar(con, SCHEMA_VERSION_DDL)
+    if not PG:
         con.commit()
-        con.close()
+    # Otro worker pudo migrar mientras se esperaba el lock
+    hechas = {v for (v,) in _ejecutar(con, "SELECT version FROM schema_version")}
+    for version, nombre, migrar in MIGRACIONES:
+        if version in hechas:
+            continue
+        t0 = time.perf_counter()
+        migrar(con)
+        _ejecutar(con, "INSERT INTO schema_version (version, nombre, aplicada) VALUES (?, ?, ?)",
+                  (version, nombre, now_iso()))
+        if not PG:
+            con.commit()
+        print(f"Migración {version} ({nombre}) aplicada en {time.perf_counter() - t0:.2f}s")
+
+
+def init_db():
+    """
+    Arranque: lee la versión del esquema con una conexión del pool y, solo si hay
+    migraciones pendientes, abre una conexión directa y las aplica bajo el lock.
+    """
+    global _fts_ok
+    with db_conn() as con:
+        version, fts = estado_esquema(con)
+    if version < ESQUEMA_VERSION:
+        con = get_db()
+        try:
+            if PG:
+                con.autocommit = True
+            with lock_entre_procesos(con, "migrate"):
+                aplicar_migraciones(con)
+            version, fts = estado_esquema(con)
+        finally:
+            con.close()
+    elif version > ESQUEMA_VERSION:
+        print(f"WARN: esquema en versión {version}, este código conoce hasta {ESQUEMA_VERSION}")
+    if not PG:
+        _fts_ok = fts
+    with db_conn() as con:
+        cargar_diccionario(con)
 
 
 # ---------- Flask & estáticos ----------
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=["X-Total-Count", "X-Next-Cursor", "X-High-Water", "X-More"])
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENC_DIR  = os.path.join(BASE_DIR, "Encuestas")
@@ -164,6 +1136,52 @@ def root():
     return jsonify({"status": "ok", "service": "Encuestas_Reportes_v1.0"}), 200
 
 
+@app.errorhandler(PoolTimeout)
+def pool_timeout(e):
+    return jsonify(error="base de datos saturada", detalle=str(e)), 503, {"Retry-After": "2"}
+
+
+# ---------- Métricas HTTP y profiling ----------
+# ?_profile=1 devuelve el cProfile de la petición en lugar del cuerpo. Solo con
+# PROFILE_ENABLED=1; si además hay PROFILE_TOKEN se exige en X-Profile-Token.
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") in ("1", "true", "yes")
+
+
+def _profile_pedido():
+    if not PROFILE_ENABLED or request.args.get("_profile") != "1":
+        return False
+    token = os.getenv("PROFILE_TOKEN")
+    return not token or request.headers.get("X-Profile-Token") == token
+
+
+@app.before_request
+def _inicio_peticion():
+    g.t0 = time.perf_counter()
+    if _profile_pedido():
+        g.prof = cProfile.Profile()
+        g.prof.enable()
+
+
+@app.after_request
+def _fin_peticion(resp):
+    """Latencia y bytes por ruta (en streaming: hasta enviar cabeceras, sin bytes)."""
+    prof = g.pop("prof", None)
+    if prof is not None:
+        prof.disable()
+    t0 = g.pop("t0", None)
+    ruta = request.url_rule.rule if request.url_rule is not None else "sin_ruta"
+    if t0 is not None:
+        METRICS.requests.observe(time.perf_counter() - t0, ruta, request.method, str(resp.status_code))
+    if not resp.is_streamed:
+        METRICS.response_bytes.inc(ruta, request.method, value=resp.calculate_content_length() or 0)
+    if prof is None:
+        return resp
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).strip_dirs().sort_stats("cumulative").print_stats(40)
+    return Response(out.getvalue(), mimetype="text/plain",
+                    headers={"X-Profile-Status": str(resp.status_code), "Cache-Control": "no-store"})
+
+
 @app.route("/api/health", methods=["GET"])
 def health():
     return {"status": "ok"}
@@ -181,6 +1199,49 @@ def echo():
 ALLOWED_TIPOS = {"comedor", "transporte"}
 
 
+# ---------- Caché de lecturas ----------
+DATA_VERSION = crear_data_version()
+RESPONSE_CACHE = ResponseCache(
+    max_entries=env_int("CACHE_MAX_ENTRIES", 256),
+    max_bytes=env_int("CACHE_MAX_BYTES", 8 * 1024 * 1024),
+    ttl=env_float("CACHE_TTL", 30.0),
+)
+CACHED_HEADERS = ("X-Total-Count", "X-Next-Cursor", "X-High-Water", "X-More")
+
+
+def cached_get(view):
+    """
+    Caché de respuestas GET por ruta + query normalizada, invalidada cuando
+    DATA_VERSION cambia (cada INSERT). Sirve ETag fuerte (hash del cuerpo) y
+    responde 304 a If-None-Match sin consultar la BD si la entrada sigue vigente.
+    """
+    @functools.wraps(view)
+    def wrapper(*a, **kw):
+        if g.get("prof") is not None:
+            return view(*a, **kw)   # ?_profile=1 mide el trabajo real
+        key = request.path + "?" + urlencode(sorted(request.args.items(multi=True)))
+        version = DATA_VERSION.current()
+        entry = RESPONSE_CACHE.get(key, version)
+        if entry is None:
+            resp = make_response(view(*a, **kw))
+            if resp.status_code != 200 or resp.is_streamed:
+                return resp
+            body = resp.get_data()
+            headers = {h: resp.headers[h] for h in CACHED_HEADERS if h in resp.headers}
+            entry = RESPONSE_CACHE.put(key, version, body, resp.status_code, headers)
+            if entry is None:
+                # Demasiado grande para la caché: solo ETag
+                resp.set_etag(ResponseCache.etag_for(body))
+                resp.headers["Cache-Control"] = "no-cache"
+                return resp.make_conditional(request)
+        _, _, etag, body, status, headers = entry
+        resp = app.response_class(body, status=status, headers=headers, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp.make_conditional(request)
+    return wrapper
+
+
 def normalize_tipo(tipo_raw, dispositivo_id=""):
     t = (tipo_raw or "").strip().lower()
     if t in ALLOWED_TIPOS:
@@ -194,127 +1255,1569 @@ def normalize_tipo(tipo_raw, dispositivo_id=""):
 
 
 # ---------- API ----------
-@app.route("/api/respuestas", methods=["POST"])
-def crear_respuesta():
-    data = request.get_json(force=True) or {}
+CALIFICACIONES = ("Excelente", "Bueno", "Regular", "Malo")
+INSERT_COLS = ("created_at", "dia", "sede", "dispositivo_id", "calificacion", "motivo", "meta", "tipo", "submission_id",
+               "empleado", "comentario")
+# Columnas de respuestas_datos en el mismo orden (texto de dimensión -> clave id_*)
+DATOS_COLS = tuple(DIMENSIONES[c][1] if c in DIMENSIONES else c for c in INSERT_COLS)
+BATCH_MAX = env_int("BATCH_MAX", 500)
+SUBMISSION_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+
+def validar_respuesta(data, ts_iso):
+    """Valida un payload de encuesta. Devuelve (fila, None) o (None, error)."""
+    if not isinstance(data, dict):
+        return None, "item invalido"
+    # Campos de texto: un número u objeto es un error del item (400), no un 500 del lote
+    for campo, error in (("calificacion", "calificacion invalida"), ("motivo", "motivo invalido"),
+                         ("sede", "sede invalida"), ("dispositivo_id", "dispositivo_id invalido"),
+                         ("tipo", "tipo invalido")):
+        if data.get(campo) is not None and not isinstance(data[campo], str):
+            return None, error
     calificacion = (data.get("calificacion") or "").strip()
     motivo       = (data.get("motivo") or "").strip()
     sede         = (data.get("sede") or "").strip()
     disp         = (data.get("dispositivo_id") or "").strip()
     meta         = data.get("meta") or {}
+    sid          = data.get("submission_id") or None
 
-    if calificacion not in ("Excelente", "Bueno", "Regular", "Malo"):
-        return jsonify(error="calificacion invalida"), 400
+    if calificacion not in CALIFICACIONES:
+        return None, "calificacion invalida"
     if not motivo:
-        return jsonify(error="motivo requerido"), 400
+        return None, "motivo requerido"
+    if sid is not None and not (isinstance(sid, str) and SUBMISSION_ID_RE.match(sid)):
+        return None, "submission_id invalido"
+    empleado, comentario = _meta_otro(meta)
 
-    tipo = normalize_tipo(data.get("tipo"), disp)
-    ts_iso = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    return {
+        "created_at": ts_iso,
+        "dia": ts_iso[:10],
+        "sede": sede,
+        "dispositivo_id": disp,
+        "calificacion": calificacion,
+        "motivo": motivo,
+        "meta": json.dumps(meta),
+        "tipo": normalize_tipo(data.get("tipo"), disp),
+        "submission_id": sid,
+        "empleado": empleado,
+        "comentario": comentario,
+    }, None
 
-    con = get_db()
-    if is_postgres():
-        con.autocommit = True
-        with con.cursor() as cur:
-            cur.execute(q("""
-                INSERT INTO respuestas (created_at, sede, dispositivo_id, calificacion, motivo, meta, tipo)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                RETURNING id
-            """), (ts_iso, sede, disp, calificacion, motivo, json.dumps(meta), tipo))
-            rid = cur.fetchone()[0]
-        con.close()
-    else:
-        cur = con.execute(q("""
-            INSERT INTO respuestas (created_at, sede, dispositivo_id, calificacion, motivo, meta, tipo)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """), (ts_iso, sede, disp, calificacion, motivo, json.dumps(meta), tipo))
-        con.commit()
-        rid = cur.lastrowid
-        con.close()
 
-    return jsonify(id=rid, created_at=ts_iso, tipo=tipo), 201
+def now_iso():
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
-@app.route("/api/respuestas", methods=["GET"])
-def listar_respuestas():
-    tipo  = (request.args.get("tipo") or "").strip().lower() or None
-    desde = (request.args.get("desde") or "").strip() or None
-    hasta = (request.args.get("hasta") or "").strip() or None
+def _existentes_por_submission(con, sids):
+    """
+    {submission_id: (id, created_at, tipo)} de los ids ya guardados (índice único),
+    incluidos los de meses archivados.
+    """
+    if not sids:
+        return {}
+    marks = ", ".join("?" for _ in sids)
+    sql = (f"SELECT id, submission_id, created_at, tipo FROM respuestas WHERE submission_id IN ({marks}) "
+           f"UNION ALL SELECT id, submission_id, created_at, tipo FROM envios_archivados WHERE submission_id IN ({marks})")
+    if PG:
+        with con.cursor() as cur:
+            cur.execute(q(sql), tuple(sids) * 2)
+            rows = cur.fetchall()
+    else:
+        rows = con.execute(sql, list(sids) * 2).fetchall()
+    return {r[1]: (r[0], r[2], r[3]) for r in rows}
 
-    sql = "SELECT * FROM respuestas WHERE 1=1"
-    args = []
-    if tipo in ALLOWED_TIPOS:
-        sql += " AND tipo = ?"; args.append(tipo)
-    if desde:
-        sql += " AND substr(created_at,1,10) >= ?"; args.append(desde)
-    if hasta:
-        sql += " AND substr(created_at,1,10) <= ?"; args.append(hasta)
-    sql += " ORDER BY created_at DESC"
 
-    con = get_db()
-    if is_postgres():
+def insert_respuestas(con, rows):
+    """
+    Inserta filas en la transacción actual de `con` (sin commit).
+    Idempotente por submission_id: una fila repetida no se escribe y devuelve el id original
+    (id None si ya no se encuentra, p. ej. archivada sin conservar su submission_id).
+    Devuelve, en orden, dicts {id, created_at, tipo, duplicado}.
+    - Postgres: reserva los submission_id en `envios` (ON CONFLICT DO NOTHING) y
+      escribe las filas no repetidas con un solo INSERT multi-fila (execute_values).
+    - SQLite: BEGIN IMMEDIATE (lock de escritura), descarta los submission_id existentes
+      y hace executemany; con AUTOINCREMENT los ids del lote son consecutivos.
+    Se escribe en respuestas_datos con las claves de dimensión del diccionario.
+    """
+    # Dentro del lote, la primera aparición de cada submission_id es la que se escribe
+    primera, nuevas = {}, []
+    for i, r in enumerate(rows):
+        sid = r["submission_id"]
+        if sid is None or sid not in primera:
+            if sid is not None:
+                primera[sid] = i
+            nuevas.append(i)
+
+    out = [None] * len(rows)
+    cols = ", ".join(DATOS_COLS)
+    if PG:
+        from psycopg2.extras import execute_values
         with con.cursor() as cur:
-            cur.execute(q(sql), tuple(args))
-            cols = [c.name for c in cur.description]
-            rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-        con.close()
+            if primera:
+                # Un envío concurrente con el mismo submission_id espera aquí a que el otro confirme
+                libres = {sid for (sid,) in execute_values(
+                    cur, "INSERT INTO envios (submission_id) VALUES %s ON CONFLICT DO NOTHING RETURNING submission_id",
+                    [(sid,) for sid in primera], page_size=len(primera), fetch=True,
+                )}
+                nuevas = [i for i in nuevas if rows[i]["submission_id"] is None or rows[i]["submission_id"] in libres]
+            datos = dict(zip(nuevas, filas_datos(con, [rows[i] for i in nuevas])))
+            res = execute_values(
+                cur, f"INSERT INTO respuestas_datos ({cols}) VALUES %s RETURNING id",
+                [datos[i] for i in nuevas], page_size=max(len(nuevas), 1), fetch=True,
+            ) if nuevas else []
+        for i, (rid,) in zip(nuevas, res):
+            r = rows[i]
+            out[i] = {"id": rid, "created_at": r["created_at"], "tipo": r["tipo"], "duplicado": False}
     else:
-        cur = con.execute(q(sql), args)
-        rows = [dict(r) for r in cur.fetchall()]
-        con.close()
-    return jsonify(rows)
+        if not con.in_transaction:
+            con.execute("BEGIN IMMEDIATE")
+        previas = _existentes_por_submission(con, list(primera))
+        nuevas = [i for i in nuevas if rows[i]["submission_id"] not in previas]
+        datos = dict(zip(nuevas, filas_datos(con, [rows[i] for i in nuevas])))
+        if nuevas:
+            marks = ", ".join("?" for _ in DATOS_COLS)
+            con.executemany(
+                f"INSERT INTO respuestas_datos ({cols}) VALUES ({marks})",
+                [datos[i] for i in nuevas],
+            )
+            last = con.execute("SELECT last_insert_rowid()").fetchone()[0]
+            for i, rid in zip(nuevas, range(last - len(nuevas) + 1, last + 1)):
+                r = rows[i]
+                out[i] = {"id": rid, "created_at": r["created_at"], "tipo": r["tipo"], "duplicado": False}
 
+    rollup_add(con, [datos[i] for i, o in enumerate(out) if o is not None])
 
-@app.route("/api/resumen", methods=["GET"])
-def resumen():
-    tipo = request.args.get("tipo", "").strip().lower() or None
-    desde = request.args.get("desde", "").strip() or None
-    hasta = request.args.get("hasta", "").strip() or None
-
-    sql = """
-    SELECT substr(created_at,1,10) AS dia,
-           tipo,
-           calificacion,
-           COUNT(*) AS n
-    FROM respuestas
-    WHERE 1=1
-    """
-    args = []
+    # Repetidos: dentro del lote o ya guardados antes
+    pendientes = {rows[i]["submission_id"] for i, o in enumerate(out) if o is None}
+    previas = _existentes_por_submission(con, sorted(pendientes))
+    for i, o in enumerate(out):
+        if o is None:
+            sid = rows[i]["submission_id"]
+            if sid in previas:
+                rid, created_at, tipo = previas[sid]
+            elif out[primera[sid]] is not None:
+                # Repetido dentro del mismo lote: apunta a la primera aparición
+                first = out[primera[sid]]
+                rid, created_at, tipo = first["id"], first["created_at"], first["tipo"]
+            else:
+                # Postgres: reservado en `envios` pero sin fila ni entrada en
+                # envios_archivados. Ya se guardó alguna vez; se responde duplicado sin id
+                # (un 500 haría que el kiosco reintentara el lote para siempre)
+                rid, created_at, tipo = None, None, None
+            out[i] = {"id": rid, "created_at": created_at, "tipo": tipo, "duplicado": True}
+    return out
+
+
+# ---------- Group commit opcional (SQLite) ----------
+# GROUP_COMMIT=1: las escrituras pasan por un único hilo que confirma por lotes
+# (hasta GROUP_COMMIT_MAX_BATCH filas; GROUP_COMMIT_MAX_DELAY s de espera extra).
+# En Postgres no aplica.
+_writer = None
+_writer_pid = None
+
+
+def get_writer():
+    global _writer, _writer_pid
+    if PG or os.getenv("GROUP_COMMIT", "0") not in ("1", "true", "yes"):
+        return None
+    if _writer is not None and _writer_pid == os.getpid():
+        return _writer
+    with _pool_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = GroupCommitWriter(
+                connect_sqlite, insert_respuestas,
+                max_batch=env_int("GROUP_COMMIT_MAX_BATCH", 200),
+                max_delay=env_float("GROUP_COMMIT_MAX_DELAY", 0.0),
+                max_pending=env_int("GROUP_COMMIT_MAX_PENDING", 5000),
+                lease=WRITER_LEASE,
+                al_confirmar=confirmar_escritura,
+            )
+            _writer_pid = os.getpid()
+            atexit.register(_writer.close)
+    return _writer
+
+
+def _escribir_directo(rows):
+    with db_conn() as con, turno_escritura(), medir_db("write"):
+        res = insert_respuestas(con, rows)
+        con.commit()
+    return res
+
+
+def confirmar_escritura(rows, res):
+    """Tras el commit: caché columnar, versión de datos y /api/stream (sin duplicados)."""
+    if all(r["duplicado"] for r in res):
+        return
+    columnar_agregar(rows, res)
+    DATA_VERSION.bump()
+    publicar(rows, res)
+
+
+def escribir_respuestas(rows):
+    """
+    insert_respuestas + commit, directo con el pool o por la cola de group commit,
+    y confirmar_escritura de lo nuevo. Con group commit eso corre en el hilo escritor
+    tras el commit, así que también ocurre para envíos cuyo 503 ya salió.
+    Sin turno de escritura a tiempo, con la BD ocupada tras los reintentos o con la
+    cola llena responde 503 vía PoolTimeout.
+    """
+    try:
+        asegurar_dimensiones(rows)
+        writer = get_writer()
+        if writer is None:
+            res = reintentar(functools.partial(_escribir_directo, rows))
+            confirmar_escritura(rows, res)
+            return res
+        with medir_db("write"):
+            return writer.write(rows, timeout=env_float("GROUP_COMMIT_TIMEOUT", 10.0))
+    except (TimeoutError, WriterClosed) as e:
+        raise PoolTimeout(str(e) or "cola de escritura sin respuesta")
+    except sqlite3.OperationalError as e:
+        if es_ocupado(e):
+            raise PoolTimeout(str(e))
+        raise
+
+
+# ---------- Control de admisión (ingesta) ----------
+# En el cambio de turno todos los kioscos envían a la vez. Cada worker atiende hasta
+# INGESTA_MAX_ACTIVAS escrituras simultáneas (por debajo de DB_POOL_MAX, para que las
+# lecturas sigan teniendo conexión); hasta INGESTA_MAX_COLA más esperan como mucho
+# INGESTA_MAX_ESPERA s. El resto recibe 429 (cola llena) o 503 (sin turno) con
+# Retry-After, y el kiosco lo deja en su cola local y reintenta con backoff.
+# Quien espera ocupa un hilo de gthread: ACTIVAS + COLA debe quedar por debajo de
+# --threads para que las lecturas no hagan fila detrás de la ráfaga.
+# 0 en INGESTA_MAX_ACTIVAS desactiva el límite.
+INGESTA = AdmissionLimiter(
+    max_active=env_int("INGESTA_MAX_ACTIVAS", 4),
+    max_queue=env_int("INGESTA_MAX_COLA", 8),
+    max_wait=env_float("INGESTA_MAX_ESPERA", 2.0),
+)
+
+
+def con_admision(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with INGESTA.admit():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+@app.errorhandler(Rejected)
+def ingesta_rechazada(e):
+    return jsonify(error="servidor saturado", detalle=str(e)), e.status, {"Retry-After": str(e.retry_after)}
+
+
+@app.route("/api/respuestas", methods=["POST"])
+@con_admision
+def crear_respuesta():
+    data = request.get_json(force=True) or {}
+    if isinstance(data, dict) and not data.get("submission_id") and request.headers.get("Idempotency-Key"):
+        data["submission_id"] = request.headers["Idempotency-Key"].strip()
+    row, err = validar_respuesta(data, now_iso())
+    if err:
+        return jsonify(error=err), 400
+
+    res = escribir_respuestas([row])[0]
+    if res["duplicado"]:
+        # Reintento de un envío ya guardado: se responde el id original sin escribir
+        return jsonify(id=res["id"], created_at=res["created_at"], tipo=res["tipo"], duplicado=True), 200
+    return jsonify(id=res["id"], created_at=res["created_at"], tipo=res["tipo"]), 201
+
+
+@app.route("/api/respuestas/batch", methods=["POST"])
+@con_admision
+def crear_respuestas_batch():
+    """
+    Ingesta por lotes (colas offline de los kioscos).
+    Body: lista de payloads (o {"items": [...]}) con las mismas reglas que POST /api/respuestas.
+    Las filas válidas se escriben en una sola transacción; cada item devuelve su id o su error.
+    Los items con submission_id ya guardado devuelven el id original con "duplicado": true.
+    """
+    data = request.get_json(force=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify(error="se esperaba una lista de respuestas"), 400
+    if len(items) > BATCH_MAX:
+        return jsonify(error=f"maximo {BATCH_MAX} items por lote"), 413
+
+    ts_iso = now_iso()
+    resultados = [None] * len(items)
+    validas = []   # [(indice, fila)]
+    for i, item in enumerate(items):
+        row, err = validar_respuesta(item, ts_iso)
+        if err:
+            resultados[i] = {"index": i, "error": err}
+        else:
+            validas.append((i, row))
+
+    duplicados = 0
+    if validas:
+        res = escribir_respuestas([row for _, row in validas])
+        for (i, _), r in zip(validas, res):
+            resultados[i] = {"index": i, **r}
+            duplicados += r["duplicado"]
+
+    return jsonify(
+        items=resultados,
+        insertados=len(validas) - duplicados,
+        duplicados=duplicados,
+        errores=len(items) - len(validas),
+    ), 200
+
+
+class ParamError(ValueError):
+    """Parámetro de consulta inválido (se responde 400)."""
+
+
+@app.errorhandler(ParamError)
+def param_error(e):
+    return jsonify(error=str(e)), 400
+
+
+# Columnas públicas de una respuesta (forma del JSON de GET /api/respuestas)
+RESPUESTA_COLS = ("id", "created_at", "sede", "dispositivo_id", "calificacion", "motivo", "meta", "tipo")
+LIST_MAX_LIMIT = env_int("LIST_MAX_LIMIT", 1000)
+
+
+def _instante(valor):
+    """ISO 8601 con hora -> 'YYYY-MM-DDTHH:MM:SSZ' (UTC), mismo formato que created_at."""
+    try:
+        dt = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    except ValueError:
+        raise ParamError(f"fecha invalida: {valor}")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.replace(microsecond=0).isoformat() + "Z"
+
+
+def _dia(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ParamError(f"fecha invalida: {valor}")
+
+
+def filtros_respuestas(args, por_dia=False):
+    """
+    Filtros comunes (tipo, desde, hasta) -> (fragmento SQL ' AND ...', params).
+    desde/hasta aceptan 'YYYY-MM-DD' (día UTC) o un instante ISO con hora.
+    Los días se traducen a rangos semiabiertos sobre la columna cruda (usan índice):
+        desde=D -> created_at >= 'D'    hasta=D -> created_at < 'D+1'
+    Con por_dia=True los días se filtran sobre la columna `dia` (índice para GROUP BY dia).
+    Incluye además los filtros de texto de filtros_texto().
+    """
+    tipo  = (args.get("tipo") or "").strip().lower() or None
+    desde = (args.get("desde") or "").strip() or None
+    hasta = (args.get("hasta") or "").strip() or None
+
+    sql, params = "", []
+    if tipo in ALLOWED_TIPOS:
+        sql += " AND id_tipo = (SELECT id FROM dim_tipo WHERE valor = ?)"; params.append(tipo)
+    if desde:
+        if len(desde) > 10:
+            sql += " AND created_at >= ?"; params.append(_instante(desde))
+        elif por_dia:
+            sql += " AND dia >= ?"; params.append(_dia(desde).isoformat())
+        else:
+            sql += " AND created_at >= ?"; params.append(_dia(desde).isoformat())
+    if hasta:
+        if len(hasta) > 10:
+            sql += " AND created_at <= ?"; params.append(_instante(hasta))
+        elif por_dia:
+            sql += " AND dia <= ?"; params.append(_dia(hasta).isoformat())
+        else:
+            sql += " AND created_at < ?"; params.append((_dia(hasta) + timedelta(days=1)).isoformat())
+    tsql, tparams = filtros_texto(args)
+    return sql + tsql, params + tparams
+
+
+TEXTO_PARAMS = ("sede", "dispositivo", "empleado", "q", "comentario")
+
+
+def _like(valor):
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _palabras(valor):
+    return re.findall(r"\w+", valor.lower())[:10]
+
+
+def _fts(valor, columna=None):
+    """Texto libre -> (SQL, params) de búsqueda por palabras (prefijos, todas requeridas)."""
+    palabras = _palabras(valor)
+    if not palabras:
+        return "", []
+    if PG:
+        peso = {"comentario": "B", "empleado": "A"}.get(columna, "")
+        return " AND fts @@ to_tsquery('simple', ?)", [" & ".join(f"{p}:*{peso}" for p in palabras)]
+    if _fts_ok:
+        pref = f"{columna} : " if columna else ""
+        match = " AND ".join(f'{pref}"{p}"*' for p in palabras)
+        return " AND id IN (SELECT rowid FROM respuestas_fts WHERE respuestas_fts MATCH ?)", [match]
+    cols = (columna,) if columna else ("calificacion", "motivo", "empleado", "comentario")
+    partes = [f"{DIMENSIONES[c][1]} IN (SELECT id FROM {DIMENSIONES[c][0]} WHERE lower(valor) LIKE ? ESCAPE '\\')"
+              if c in DIMENSIONES else f"lower({c}) LIKE ? ESCAPE '\\'" for c in cols]
+    sql, params = "", []
+    for p in palabras:
+        sql += f" AND ({' OR '.join(partes)})"
+        params += [f"%{_like(p)}%"] * len(partes)
+    return sql, params
+
+
+def filtros_texto(args):
+    """
+    Filtros evaluados en el servidor sobre columnas (antes safeMeta()+indexOf en reportes.js):
+    - sede, dispositivo: subcadena, sin distinguir mayúsculas (se busca en la tabla de
+      dimensión, de pocas filas, y se filtra por clave).
+    - empleado: prefijo (índice sobre la columna empleado).
+    - q: texto completo sobre calificación, motivo, empleado y comentario; cada palabra
+      se busca como prefijo y todas deben aparecer.
+    - comentario: igual que q, solo en el comentario.
+    """
+    sql, params = "", []
+    for param, col in (("sede", "sede"), ("dispositivo", "dispositivo_id")):
+        v = (args.get(param) or "").strip().lower()
+        if v:
+            tabla, id_col = DIMENSIONES[col]
+            sql += f" AND {id_col} IN (SELECT id FROM {tabla} WHERE lower(valor) LIKE ? ESCAPE '\\')"
+            params.append(f"%{_like(v)}%")
+    emp = (args.get("empleado") or "").strip()
+    if emp:
+        if PG:
+            sql += " AND lower(empleado) LIKE ? ESCAPE '\\'"; params.append(_like(emp.lower()) + "%")
+        else:
+            sql += " AND empleado LIKE ? ESCAPE '\\'"; params.append(_like(emp) + "%")
+    for param, col in (("q", None), ("comentario", "comentario")):
+        v = (args.get(param) or "").strip()
+        if v:
+            fsql, fparams = _fts(v, col)
+            sql += fsql; params += fparams
+    return sql, params
+
+
+def tiene_filtros_texto(args):
+    return any((args.get(k) or "").strip() for k in TEXTO_PARAMS)
+
+
+def encode_cursor(created_at, rid):
+    raw = json.dumps([created_at, rid], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        created_at, rid = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(created_at, str) or not isinstance(rid, int):
+            raise ValueError
+        return created_at, rid
+    except Exception:
+        raise ParamError("cursor invalido")
+
+
+def _campos(args):
+    raw = (args.get("fields") or "").strip()
+    if not raw:
+        return list(RESPUESTA_COLS)
+    campos = [c.strip() for c in raw.split(",") if c.strip()]
+    invalidos = [c for c in campos if c not in RESPUESTA_COLS]
+    if invalidos:
+        raise ParamError("campos invalidos: " + ", ".join(invalidos))
+    return campos
+
+
+DELTA_MAX_ROWS = env_int("DELTA_MAX_ROWS", 1000)
+DELTA_SAFETY_SECONDS = env_int("DELTA_SAFETY_SECONDS", 5)
+
+
+def high_water(rows, since):
+    """
+    Id máximo que el cliente puede dar por visto. Las filas de los últimos
+    DELTA_SAFETY_SECONDS no lo adelantan: en Postgres un id menor puede
+    confirmarse después de uno mayor. Esas filas se reenvían y el cliente
+    deduplica por id.
+    """
+    corte = (datetime.utcnow() - timedelta(seconds=DELTA_SAFETY_SECONDS)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return max([r["id"] for r in rows if r["created_at"] <= corte] + [since])
+
+
+@app.route("/api/respuestas", methods=["GET"])
+@cached_get
+def listar_respuestas():
+    """
+    Lista respuestas (más recientes primero).
+    - fields=a,b,...: proyección de columnas (por defecto todas las públicas).
+    - limit=N: paginación por keyset sobre (created_at, id); la siguiente página
+      se pide con cursor=<X-Next-Cursor>. X-Total-Count trae el total del filtro
+      (se omite con count=0). Sin limit se devuelve todo el rango, como antes.
+    - since=<id>: solo filas con id > since (orden por id ascendente, máximo
+      DELTA_MAX_ROWS; X-More: 1 si quedaron más). X-High-Water es el since de la
+      siguiente petición.
+    """
+    where, args = filtros_respuestas(request.args)
+    campos = _campos(request.args)
+
+    since = request.args.get("since")
+    if since is not None:
+        try:
+            since = max(0, int(since))
+        except ValueError:
+            raise ParamError("since invalido")
+        select_cols = list(dict.fromkeys(campos + ["created_at", "id"]))
+        rows = fetch_all(
+            f"SELECT {', '.join(select_cols)} FROM respuestas WHERE 1=1{where} AND id > ? "
+            f"ORDER BY id LIMIT {DELTA_MAX_ROWS + 1}",
+            args + [since],
+        )
+        headers = {}
+        if len(rows) > DELTA_MAX_ROWS:
+            rows = rows[:DELTA_MAX_ROWS]
+            headers["X-More"] = "1"
+        headers["X-High-Water"] = str(high_water(rows, since))
+        if len(select_cols) != len(campos):
+            rows = [{c: r[c] for c in campos} for r in rows]
+        return jsonify(rows), 200, headers
+
+    limit = request.args.get("limit")
+    if limit is None:
+        sql = f"SELECT {', '.join(campos)} FROM respuestas WHERE 1=1{where} ORDER BY created_at DESC, id DESC"
+        rows = fetch_all(sql, args)
+        headers = {}
+        if "id" in campos and "created_at" in campos:
+            headers["X-High-Water"] = str(high_water(rows, 0))
+        return jsonify(rows), 200, headers
+
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ParamError("limit invalido")
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+
+    headers = {}
+    if request.args.get("count", "1") != "0":
+        headers["X-Total-Count"] = str(contar_respuestas(where, args))
+
+    page_where, page_args = where, list(args)
+    cursor = (request.args.get("cursor") or "").strip()
+    if cursor:
+        page_where += " AND (created_at, id) < (?, ?)"
+        page_args.extend(decode_cursor(cursor))
+
+    # created_at e id siempre se leen: forman el cursor de la siguiente página
+    select_cols = list(dict.fromkeys(campos + ["created_at", "id"]))
+    rows = fetch_all(
+        f"SELECT {', '.join(select_cols)} FROM respuestas WHERE 1=1{page_where} "
+        f"ORDER BY created_at DESC, id DESC LIMIT {limit + 1}",
+        page_args,
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    if len(select_cols) != len(campos):
+        rows = [{c: r[c] for c in campos} for r in rows]
+    return jsonify(rows), 200, headers
+
+
+EXPORT_CSV_COLS = ("id", "created_at", "calificacion", "motivo", "dispositivo_id", "sede", "tipo",
+                   "meta_empleado", "meta_comentario")
+
+
+@app.route("/api/respuestas/export", methods=["GET"])
+def exportar_respuestas():
+    """
+    Exportación en streaming: format=csv (por defecto) o ndjson, mismos filtros que /api/respuestas.
+    Las filas se leen por bloques y se envían conforme se generan: memoria constante.
+    """
+    fmt_ = (request.args.get("format") or "csv").strip().lower()
+    if fmt_ not in ("csv", "ndjson"):
+        raise ParamError("format debe ser csv o ndjson")
+    where, args = filtros_respuestas(request.args)
+    sql = f"SELECT {', '.join(RESPUESTA_COLS)} FROM respuestas WHERE 1=1{where} ORDER BY created_at DESC, id DESC"
+    sql_csv = f"""
+        SELECT id, created_at, calificacion, motivo, coalesce(dispositivo_id,''), coalesce(sede,''),
+               coalesce(tipo,''), coalesce(empleado,''), coalesce(comentario,'')
+        FROM respuestas WHERE 1=1{where} ORDER BY created_at DESC, id DESC
+    """
+
+    def gen_csv():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(EXPORT_CSV_COLS)
+        for rows in iter_chunks(sql_csv, args):
+            w.writerows(rows)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+        if buf.tell():
+            yield buf.getvalue()
+
+    def gen_ndjson():
+        for rows in iter_chunks(sql, args):
+            yield "".join(json.dumps(dict(zip(RESPUESTA_COLS, r)), ensure_ascii=False) + "\n" for r in rows)
+
+    if fmt_ == "csv":
+        body, mimetype, filename = gen_csv(), "text/csv", "reporte_encuesta.csv"
+    else:
+        body, mimetype, filename = gen_ndjson(), "application/x-ndjson", "reporte_encuesta.ndjson"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ---------- Feed en vivo (SSE) ----------
+# Cada stream ocupa un hilo de gthread hasta SSE_MAX_SECONDS. Por defecto el tope deja
+# libres los hilos de la ingesta (INGESTA_MAX_ACTIVAS + INGESTA_MAX_COLA) y una cuarta
+# parte para lecturas; WEB_THREADS debe ser el --threads de gunicorn (render.yaml usa
+# la misma variable).
+WEB_THREADS = env_int("WEB_THREADS", 16)
+SSE_MAX_DEFAULT = max(1, WEB_THREADS - max(INGESTA.max_active, 0) - INGESTA.max_queue - WEB_THREADS // 4)
+LIVE_FEED = Broadcaster(
+    max_subscribers=env_int("SSE_MAX_SUBSCRIBERS", SSE_MAX_DEFAULT),
+    buffer=env_int("SSE_BUFFER", 256),
+)
+SSE_HEARTBEAT = env_float("SSE_HEARTBEAT", 15.0)
+SSE_MAX_SECONDS = env_float("SSE_MAX_SECONDS", 300.0)
+SSE_RETRY_MS = env_int("SSE_RETRY_MS", 3000)
+# Con varios workers, cada SSE_POLL_SECONDS (0 = solo lo propio) un hilo por worker
+# mira DATA_VERSION y, si cambió y hay suscriptores, difunde desde la BD las filas con
+# id mayor que la última leída: las que escribieron los otros workers.
+SSE_POLL_SECONDS = env_float("SSE_POLL_SECONDS", 0.5)
+_seguimiento = None
+_seguimiento_lock = threading.Lock()
+
+
+def _seguir_workers():
+    ultimo, version = None, None
+    while True:
+        time.sleep(SSE_POLL_SECONDS)
+        try:
+            if not LIVE_FEED.suscriptores():
+                ultimo = None   # al volver a haber suscriptores se parte de lo último
+                continue
+            if ultimo is None:
+                filas = fetch_all("SELECT id FROM respuestas_todas ORDER BY id DESC LIMIT 1")
+                ultimo, version = (filas[0]["id"] if filas else 0), DATA_VERSION.current()
+                continue
+            actual = DATA_VERSION.current()
+            if actual == version:
+                continue
+            # En SQLite los ids se confirman en orden (un escritor a la vez); en Postgres
+            # una fila con id menor que confirma tarde no se difunde aquí (sí al reconectar)
+            filas = fetch_all(
+                f"SELECT {', '.join(RESPUESTA_COLS)} FROM respuestas WHERE id > ? "
+                f"ORDER BY id LIMIT {DELTA_MAX_ROWS}", [ultimo])
+            LIVE_FEED.publish(filas)
+            if filas:
+                ultimo = filas[-1]["id"]
+            if len(filas) < DELTA_MAX_ROWS:
+                version = actual
+        except Exception as e:
+            print("WARN: seguimiento SSE de otros workers falló:", e)
+
+
+def seguir_workers():
+    """Arranca (una vez por proceso) el hilo que sigue las escrituras de los demás workers."""
+    global _seguimiento
+    if SSE_POLL_SECONDS <= 0 or (_seguimiento is not None and _seguimiento.is_alive()):
+        return
+    with _seguimiento_lock:
+        if _seguimiento is None or not _seguimiento.is_alive():
+            _seguimiento = threading.Thread(target=_seguir_workers, name="sse-workers", daemon=True)
+            _seguimiento.start()
+
+
+def publicar(rows, res):
+    """Difunde a /api/stream las filas recién confirmadas (los duplicados no)."""
+    LIVE_FEED.publish([
+        {"id": r["id"], **{c: row[c] for c in RESPUESTA_COLS if c != "id"}}
+        for row, r in zip(rows, res) if not r["duplicado"]
+    ])
+
+
+def sse_event(row):
+    return f"id: {row['id']}\nevent: respuesta\ndata: {json.dumps(row, separators=(',', ':'))}\n\n"
+
+
+@app.route("/api/stream", methods=["GET"])
+def stream_respuestas():
+    """
+    Respuestas nuevas en vivo (text/event-stream), evento `respuesta` con la misma
+    forma que GET /api/respuestas. Lo que escribe este worker sale de memoria; lo de
+    los demás workers, de la BD cada SSE_POLL_SECONDS.
+    - tipo=comedor|transporte: solo ese tipo.
+    - Last-Event-ID (o last_id=<id> en la primera conexión): reenvía desde la BD las
+      filas con id mayor (máximo DELTA_MAX_ROWS; si hay más se cierra y el cliente reconecta).
+    - Comentario `: ping` cada SSE_HEARTBEAT s; la conexión se cierra tras SSE_MAX_SECONDS
+      o si el cliente no consume su buffer (EventSource reconecta solo).
+    """
+    tipo = (request.args.get("tipo") or "").strip().lower() or None
+    if tipo is not None and tipo not in ALLOWED_TIPOS:
+        raise ParamError("tipo invalido")
+    last = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    if last is not None:
+        try:
+            last = max(0, int(last))
+        except ValueError:
+            raise ParamError("last_id invalido")
+
+    try:
+        sub = LIVE_FEED.subscribe()
+    except FeedFull as e:
+        return jsonify(error=str(e)), 503, {"Retry-After": "5"}
+    seguir_workers()
+
+    # Suscrito antes de leer la BD: lo que se escriba entre medias queda en el buffer
+    pendientes = []
+    if last is not None:
+        where, args = ("", []) if tipo is None else (" AND tipo = ?", [tipo])
+        try:
+            pendientes = fetch_all(
+                f"SELECT {', '.join(RESPUESTA_COLS)} FROM respuestas WHERE id > ?{where} "
+                f"ORDER BY id LIMIT {DELTA_MAX_ROWS}",
+                [last] + args,
+            )
+        except Exception:
+            LIVE_FEED.unsubscribe(sub)
+            raise
+
+    def gen():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            enviados = set()
+            for r in pendientes:
+                enviados.add(r["id"])
+                yield sse_event(r)
+            if len(pendientes) >= DELTA_MAX_ROWS:
+                return
+            fin = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < fin:
+                eventos = sub.wait(SSE_HEARTBEAT)
+                if eventos is None:
+                    return
+                if not eventos:
+                    yield ": ping\n\n"
+                    continue
+                for r in eventos:
+                    if r["id"] not in enviados and (tipo is None or r["tipo"] == tipo):
+                        yield sse_event(r)
+        finally:
+            LIVE_FEED.unsubscribe(sub)
+
+    return Response(gen(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ---------- Caché columnar (opcional) ----------
+# COLUMNAR_CACHE=1 (requiere numpy: requirements-columnar.txt): cada proceso guarda las respuestas en columnas
+# (columnar.py) y resumen, agregados y kpis filtran y cuentan en memoria. Se carga al
+# arrancar en segundo plano, crece con cada escritura del proceso y recoge lo que
+# escribieron otros procesos cuando cambia DATA_VERSION (o cada COLUMNAR_SYNC_SECONDS).
+# Se usa SQL mientras carga, si supera COLUMNAR_MAX_MB o con filtros de texto libre
+# (empleado, q, comentario).
+COLUMNAR_ENABLED = os.getenv("COLUMNAR_CACHE", "0") in ("1", "true", "yes")
+COLUMNAR = ColumnStore(max_bytes=env_int("COLUMNAR_MAX_MB", 64) * 1024 * 1024)
+COLUMNAR_SYNC_SECONDS = env_float("COLUMNAR_SYNC_SECONDS", 1.0)
+COLUMNAR_CHUNK = 50_000
+_columnar_sync_lock = threading.Lock()
+# Columnas de dimensión en la matriz de columnar.COLUMNAS
+_COLUMNAR_DIMS = ((2, "sede"), (3, "dispositivo_id"), (4, "motivo"), (5, "tipo"), (6, "calificacion"))
+TURNO_MINUTOS = {
+    k: columnar.minutos_en(functools.partial(lambda d, m: turnos.is_minute_in_shift(m, d), d))
+    for k, d in turnos.SHIFT_DEFS.items()
+} if columnar.np is not None else {}
+
+
+def _sql_columnar():
+    epoch = ("CAST(EXTRACT(EPOCH FROM CAST(created_at AS timestamptz)) AS BIGINT)" if PG
+             else "CAST(strftime('%s', created_at) AS INTEGER)")
+    return (f"SELECT id, {epoch}, coalesce(id_sede,0), coalesce(id_dispositivo,0), coalesce(id_motivo,0), "
+            "coalesce(id_tipo,0), id_calificacion FROM respuestas_todas WHERE id > ? ORDER BY id")
+
+
+def _epoch(iso):
+    return int(turnos.parse_utc(iso).timestamp())
+
+
+def _corte_epoch():
+    return int(time.time()) - DELTA_SAFETY_SECONDS
+
+
+def _matriz_columnar(rows):
+    """Filas de _sql_columnar() -> matriz de columnar.COLUMNAS (calificación como índice)."""
+    np = columnar.np
+    m = np.array([tuple(r) for r in rows], dtype=np.int64)
+    for j, col in _COLUMNAR_DIMS:
+        if not set(np.unique(m[:, j]).tolist()) - {0} <= DICCIONARIO.valores(col).keys():
+            # Valores dados de alta por otro proceso
+            with db_conn() as con:
+                cargar_diccionario(con)
+            break
+    valores = DICCIONARIO.valores("calificacion")
+    lut = np.full(max(valores, default=0) + 1, len(CALIFICACIONES), dtype=np.int64)
+    for i, v in valores.items():
+        if v in CALIFICACIONES:
+            lut[i] = CALIFICACIONES.index(v)
+    m[:, 6] = lut[np.minimum(m[:, 6], len(lut) - 1)]
+    return m
+
+
+def cargar_columnar():
+    """Carga completa (hilo en segundo plano al arrancar o al cambiar la generación)."""
+    COLUMNAR.iniciar_carga()
+    COLUMNAR.generacion, COLUMNAR.version = DATA_VERSION.generacion(), DATA_VERSION.current()
+    try:
+        for rows in iter_chunks(_sql_columnar(), (0,), size=COLUMNAR_CHUNK):
+            COLUMNAR.agregar(_matriz_columnar(rows), corte=_corte_epoch())
+        COLUMNAR.sincronizado = time.monotonic()
+        COLUMNAR.terminar_carga()
+    except Exception as e:
+        print("WARN: caché columnar no disponible:", e)
+        COLUMNAR.fallar("error", repr(e))
+
+
+def columnar_agregar(rows, res):
+    """Suma al instante las filas recién confirmadas por este proceso."""
+    if not COLUMNAR_ENABLED or COLUMNAR.estado not in ("cargando", "lista"):
+        return
+    nuevas = [(row, r) for row, r in zip(rows, res) if not r["duplicado"]]
+    if not nuevas:
+        return
+    ids = {col: DICCIONARIO.buscar(col, {row[col] for row, _ in nuevas})[0] for _, col in _COLUMNAR_DIMS[:4]}
+    COLUMNAR.agregar(columnar.np.array([
+        (r["id"], _epoch(row["created_at"]), *(ids[col].get(row[col]) or 0 for _, col in _COLUMNAR_DIMS[:4]),
+         CALIFICACIONES.index(row["calificacion"]))
+        for row, r in nuevas
+    ], dtype=columnar.np.int64))
+
+
+def columnar_snapshot():
+    """
+    Snapshot al día de la caché columnar, o None si hay que ir a SQL. Sincroniza si
+    DATA_VERSION cambió (escrituras de cualquier worker) o pasó COLUMNAR_SYNC_SECONDS;
+    si cambió la generación (filas archivadas) se recarga entera en segundo plano.
+    """
+    if not COLUMNAR_ENABLED or COLUMNAR.estado != "lista":
+        return None
+    if COLUMNAR.generacion != DATA_VERSION.generacion():
+        if _columnar_sync_lock.acquire(blocking=False):
+            try:
+                if COLUMNAR.estado == "lista":
+                    COLUMNAR.iniciar_carga()
+                    threading.Thread(target=cargar_columnar, name="columnar-carga", daemon=True).start()
+            finally:
+                _columnar_sync_lock.release()
+        return None
+    version = DATA_VERSION.current()
+    if (COLUMNAR.version != version or time.monotonic() - COLUMNAR.sincronizado >= COLUMNAR_SYNC_SECONDS) \
+            and _columnar_sync_lock.acquire(blocking=False):
+        try:
+            for rows in iter_chunks(_sql_columnar(), (COLUMNAR.hw,), size=COLUMNAR_CHUNK):
+                COLUMNAR.agregar(_matriz_columnar(rows), corte=_corte_epoch())
+            COLUMNAR.version, COLUMNAR.sincronizado = version, time.monotonic()
+        finally:
+            _columnar_sync_lock.release()
+    return COLUMNAR.snapshot()
+
+
+def filtro_columnar(a):
+    """
+    Los filtros de filtros_respuestas (mismo dict de parámetros) como argumentos de
+    columnar.mascara; None si hay filtros que solo resuelve SQL.
+    """
+    if any((a.get(k) or "").strip() for k in ("empleado", "q", "comentario")):
+        return None
+    f = {}
+    tipo = (a.get("tipo") or "").strip().lower()
     if tipo in ALLOWED_TIPOS:
-        sql += " AND tipo = ?"; args.append(tipo)
+        f["tipos"] = [i for i, v in DICCIONARIO.valores("tipo").items() if v == tipo]
+    desde = (a.get("desde") or "").strip()
+    hasta = (a.get("hasta") or "").strip()
     if desde:
-        sql += " AND substr(created_at,1,10) >= ?"; args.append(desde)
+        f["desde"] = _epoch(_instante(desde) if len(desde) > 10 else _dia(desde).isoformat())
     if hasta:
-        sql += " AND substr(created_at,1,10) <= ?"; args.append(hasta)
-    sql += " GROUP BY dia, tipo, calificacion ORDER BY dia"
+        f["hasta"] = _epoch(_instante(hasta)) if len(hasta) > 10 else \
+            _epoch((_dia(hasta) + timedelta(days=1)).isoformat()) - 1
+    for param, col, clave in (("sede", "sede", "sedes"), ("dispositivo", "dispositivo_id", "dispositivos")):
+        v = (a.get(param) or "").strip().lower()
+        if v:
+            f[clave] = [i for i, valor in DICCIONARIO.valores(col).items() if v in valor.lower()]
+    return f
+
+
+def consulta_columnar(a):
+    """(snapshot, filas filtradas) si la caché columnar puede responder; None -> SQL."""
+    f = filtro_columnar(a) if COLUMNAR_ENABLED else None
+    if f is None:
+        return None
+    snap = columnar_snapshot()
+    if snap is None:
+        return None
+    m = columnar.mascara(snap, **f)
+    return {k: v[m] for k, v in snap.items() if k != "id"}
+
+
+def _calif(codigo):
+    return CALIFICACIONES[codigo] if codigo < len(CALIFICACIONES) else None
+
+
+def _conteo_columnar(cal):
+    cnt = columnar.np.bincount(cal.astype(columnar.np.intp), minlength=len(CALIFICACIONES) + 1)
+    return {**{c: int(cnt[i]) for i, c in enumerate(CALIFICACIONES)}, "n": int(cnt.sum())}
+
+
+def _fecha(dias):
+    return (date(1970, 1, 1) + timedelta(days=dias)).isoformat()
+
+
+def agregar_local_columnar(col, tz, turno=None):
+    """agregar_local() sobre la caché columnar: misma forma de resultado, sin SQL."""
+    dia, minuto = columnar.hora_local(col["epoch"], tz)
+    cal, tipo = col["calificacion"], col["tipo"]
+    if turno:
+        sel = TURNO_MINUTOS[turno][minuto]
+        dia, minuto, cal, tipo = dia[sel], minuto[sel], cal[sel], tipo[sel]
+    por_dia, por_tipo = {}, {}
+    for d, c, n in columnar.contar(dia, cal):
+        _sumar(por_dia.setdefault(_fecha(d), _conteo()), _calif(c), n)
+    tipos = DICCIONARIO.valores("tipo")
+    for t, c, n in columnar.contar(tipo, cal):
+        _sumar(por_tipo.setdefault(tipos.get(t) or "desconocido", _conteo()), _calif(c), n)
+    return {
+        "total": _conteo_columnar(cal),
+        "dias": [{"dia": d, **por_dia[d]} for d in sorted(por_dia)],
+        "turnos": {k: _conteo_columnar(cal[tabla[minuto]]) for k, tabla in TURNO_MINUTOS.items()},
+        "tipos": por_tipo,
+    }
+
+
+def grupos_columnar(col, tz=None, turno=None):
+    """(tipo, calificacion, motivo, n) para calcular_kpis desde la caché columnar."""
+    cal, tipo, motivo = col["calificacion"], col["tipo"], col["motivo"]
+    if turno:
+        _, minuto = columnar.hora_local(col["epoch"], tz)
+        sel = TURNO_MINUTOS[turno][minuto]
+        cal, tipo, motivo = cal[sel], tipo[sel], motivo[sel]
+    tipos, motivos = DICCIONARIO.valores("tipo"), DICCIONARIO.valores("motivo")
+    return [(tipos.get(t), _calif(c), motivos.get(mo), n) for t, c, mo, n in columnar.contar(tipo, cal, motivo)]
+
+
+def resumen_columnar(col):
+    """Filas de /api/resumen (por día UTC); None si hay calificaciones fuera de CALIFICACIONES."""
+    cal = col["calificacion"]
+    if (cal == len(CALIFICACIONES)).any():
+        return None
+    tipos = DICCIONARIO.valores("tipo")
+    filas = [{"dia": _fecha(d), "tipo": tipos.get(t), "calificacion": CALIFICACIONES[c], "n": n}
+             for d, t, c, n in columnar.contar(col["epoch"] // 86400, col["tipo"], cal)]
+    # Mismo orden que ORDER BY dia, tipo, calificacion (NULL primero, como SQLite)
+    filas.sort(key=lambda r: (r["dia"], r["tipo"] is not None, r["tipo"] or "", r["calificacion"]))
+    return filas
+
+
+@app.route("/api/resumen", methods=["GET"])
+@cached_get
+def resumen():
+    """
+    Conteos por día (UTC), tipo y calificación. Se leen del rollup resumen_diario
+    (costo proporcional a los días, no a las filas). Con desde/hasta con hora
+    se agrega desde las filas crudas, porque el rollup no tiene resolución sub-diaria.
+    """
+    where, args = filtros_respuestas(request.args, por_dia=True)
+    if "created_at" in where or tiene_filtros_texto(request.args):
+        col = consulta_columnar(request.args)
+        filas = resumen_columnar(col) if col is not None else None
+        if filas is not None:
+            return jsonify(filas)
+        return jsonify(fetch_all(sql_resumen(where, crudas=True), args))
+    return jsonify(fetch_all(sql_resumen(where), args))
+
+
+def sql_resumen(where, crudas=False):
+    """SQL de /api/resumen: del rollup resumen_diario o, con crudas=True, de las filas."""
+    tabla, n = ("respuestas_todas", "COUNT(*)") if crudas else ("resumen_diario", "SUM(n)")
+    return traducir_dimensiones(f"""
+        SELECT dia,
+               id_tipo,
+               id_calificacion,
+               {n} AS n
+        FROM {tabla}
+        WHERE 1=1{where}
+        GROUP BY dia, id_tipo, id_calificacion
+        """, ("dia", "id_tipo", "id_calificacion", "n")) + " ORDER BY dia, tipo, calificacion"
+
+
+def _conteo():
+    return {**{c: 0 for c in CALIFICACIONES}, "n": 0}
+
+
+def _sumar(bucket, calificacion, n):
+    if calificacion in bucket:
+        bucket[calificacion] += n
+    bucket["n"] += n
+
+
+def filtros_locales(args, tz):
+    """Como filtros_respuestas, pero desde/hasta 'YYYY-MM-DD' son días LOCALES en `tz`."""
+    return filtros_respuestas(args_locales(args, tz))
+
+
+def args_locales(args, tz):
+    """Parámetros con desde/hasta locales traducidos a instantes UTC inclusivos."""
+    a = {k: args.get(k) for k in ("tipo",) + TEXTO_PARAMS}
+    desde = (args.get("desde") or "").strip()
+    hasta = (args.get("hasta") or "").strip()
+    try:
+        if desde:
+            a["desde"] = desde if len(desde) > 10 else \
+                turnos.local_day_range_utc(desde, tz)[0].strftime("%Y-%m-%dT%H:%M:%SZ")
+        if hasta:
+            # fin del día local, inclusivo a resolución de segundos
+            a["hasta"] = hasta if len(hasta) > 10 else \
+                (turnos.local_day_range_utc(hasta, tz)[1] - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    except ValueError:
+        raise ParamError("fecha invalida")
+    return a
+
+
+def agregar_local(where, args, tz, turno=None):
+    """
+    Agrega por día local y turno. SQL reduce a buckets por minuto UTC
+    (substr(created_at,1,16)); cada minuto se convierte una sola vez a hora local.
+    """
+    def_turno = turnos.SHIFT_DEFS.get(turno) if turno else None
+    total = _conteo()
+    por_dia, por_tipo = {}, {}
+    por_turno = {k: _conteo() for k in turnos.SHIFT_DEFS}
+    local = {}   # minuto UTC -> (día local, minuto del día local)
+
+    sql = traducir_dimensiones(f"""
+        SELECT substr(created_at,1,16) AS m, id_tipo, id_calificacion, COUNT(*) AS n
+        FROM respuestas_todas
+        WHERE 1=1{where}
+        GROUP BY substr(created_at,1,16), id_tipo, id_calificacion
+    """, ("m", "id_tipo", "id_calificacion", "n"))
+    for rows in iter_chunks(sql, args):
+        for m, tipo, calificacion, n in rows:
+            loc = local.get(m)
+            if loc is None:
+                lt = turnos.parse_utc(m).astimezone(tz)
+                loc = local[m] = (lt.date().isoformat(), lt.hour * 60 + lt.minute)
+            dia, minuto = loc
+            if def_turno and not turnos.is_minute_in_shift(minuto, def_turno):
+                continue
+            _sumar(total, calificacion, n)
+            _sumar(por_dia.setdefault(dia, _conteo()), calificacion, n)
+            _sumar(por_tipo.setdefault(tipo or "desconocido", _conteo()), calificacion, n)
+            for k, d in turnos.SHIFT_DEFS.items():
+                if turnos.is_minute_in_shift(minuto, d):
+                    _sumar(por_turno[k], calificacion, n)
+
+    return {
+        "total": total,
+        "dias": [{"dia": d, **por_dia[d]} for d in sorted(por_dia)],
+        "turnos": por_turno,
+        "tipos": por_tipo,
+    }
+
+
+@app.route("/api/agregados", methods=["GET"])
+@cached_get
+def agregados():
+    """
+    Agregados por día LOCAL y turno (lo que antes calculaba reportes.js con todas las filas).
+    Parámetros: tipo, desde/hasta (días locales en tz), tz (default America/Mexico_City),
+    turno (T1, T2, T3, MIXTO, 4X3).
+    """
+    tz_name = (request.args.get("tz") or turnos.TIME_ZONE).strip()
+    try:
+        tz = turnos.zona(tz_name)
+    except ValueError as e:
+        raise ParamError(str(e))
+    turno = (request.args.get("turno") or "").strip().upper() or None
+    if turno and turno not in turnos.SHIFT_DEFS:
+        raise ParamError("turno invalido")
+    a = args_locales(request.args, tz)
+    col = consulta_columnar(a)
+    if col is not None:
+        return jsonify(tz=tz_name, turno=turno, **agregar_local_columnar(col, tz, turno))
+    where, args = filtros_respuestas(a)
+    return jsonify(tz=tz_name, turno=turno, **agregar_local(where, args, tz, turno))
+
+
+NEGATIVAS = ("Regular", "Malo")
+
+
+def calcular_kpis(grupos, top_n=5):
+    """KPIs del dashboard a partir de conteos (tipo, calificacion, motivo, n)."""
+    total = _conteo()
+    motivos, negativos, por_tipo = {}, {}, {}
+    for tipo, calificacion, motivo, n in grupos:
+        n = int(n)
+        _sumar(total, calificacion, n)
+        m = motivo or "—"
+        motivos[m] = motivos.get(m, 0) + n
+        if calificacion in NEGATIVAS:
+            negativos[m] = negativos.get(m, 0) + n
+        t = por_tipo.setdefault(tipo or "desconocido", {"pos": 0, "neg": 0, "n": 0})
+        t["n"] += n
+        if calificacion in NEGATIVAS:
+            t["neg"] += n
+        elif calificacion in CALIFICACIONES:
+            t["pos"] += n
+
+    pos = total["Excelente"] + total["Bueno"]
+    neg = total["Regular"] + total["Malo"]
+    base = (pos + neg) or 1
+    # Empates por nombre de motivo: el mismo resultado venga de SQL, del rollup o de la columnar
+    top = min(motivos.items(), key=lambda kv: (-kv[1], kv[0]), default=None)
+    return {
+        "total": total,
+        "pct_satisfechos": round(pos * 100 / base),
+        "pct_no_satisfechos": round(neg * 100 / base),
+        "top_motivo": {"motivo": top[0], "n": top[1]} if top else None,
+        "tipos": por_tipo,
+        "top_motivos_negativos": [
+            {"motivo": m, "n": n}
+            for m, n in sorted(negativos.items(), key=lambda kv: (-kv[1], kv[0]))[:top_n]
+        ],
+    }
 
+
+@app.route("/api/kpis", methods=["GET"])
+@cached_get
+def kpis():
+    """
+    KPIs del dashboard en una sola consulta agregada: % satisfacción, motivo más
+    frecuente, comparativa por tipo y top motivos negativos.
+    Mismos filtros que /api/respuestas; opcionales tz (desde/hasta como días locales)
+    y turno (requiere hora local, se agrupa por minuto).
+    """
+    tz_name = (request.args.get("tz") or "").strip()
+    turno = (request.args.get("turno") or "").strip().upper() or None
+    if turno and turno not in turnos.SHIFT_DEFS:
+        raise ParamError("turno invalido")
+    tz = None
+    if tz_name or turno:
+        try:
+            tz = turnos.zona(tz_name)
+        except ValueError as e:
+            raise ParamError(str(e))
+        a = args_locales(request.args, tz)
+        where, args = filtros_respuestas(a)
+    else:
+        a = request.args
+        where, args = filtros_respuestas(a, por_dia=True)
+
+    col = consulta_columnar(a)
+    if col is not None:
+        res = calcular_kpis(grupos_columnar(col, tz, turno))
+    elif turno:
+        def_turno = turnos.SHIFT_DEFS[turno]
+        sql = traducir_dimensiones(f"""
+            SELECT substr(created_at,1,16) AS m, id_tipo, id_calificacion, id_motivo, COUNT(*) AS n
+            FROM respuestas_todas WHERE 1=1{where}
+            GROUP BY substr(created_at,1,16), id_tipo, id_calificacion, id_motivo
+        """, ("m", "id_tipo", "id_calificacion", "id_motivo", "n"))
+        local = {}
+
+        def grupos():
+            for rows in iter_chunks(sql, args):
+                for m, tipo, calificacion, motivo, n in rows:
+                    minuto = local.get(m)
+                    if minuto is None:
+                        lt = turnos.parse_utc(m).astimezone(tz)
+                        minuto = local[m] = lt.hour * 60 + lt.minute
+                    if turnos.is_minute_in_shift(minuto, def_turno):
+                        yield tipo, calificacion, motivo, n
+        res = calcular_kpis(grupos())
+    elif "created_at" in where or tiene_filtros_texto(request.args):
+        sql = traducir_dimensiones(f"""
+            SELECT id_tipo, id_calificacion, id_motivo, COUNT(*) AS n
+            FROM respuestas_todas WHERE 1=1{where}
+            GROUP BY id_tipo, id_calificacion, id_motivo
+        """, ("id_tipo", "id_calificacion", "id_motivo", "n"))
+        res = calcular_kpis((r["tipo"], r["calificacion"], r["motivo"], r["n"]) for r in fetch_all(sql, args))
+    else:
+        # Solo tipo y días UTC: basta el rollup
+        sql = traducir_dimensiones(f"""
+            SELECT id_tipo, id_calificacion, id_motivo, SUM(n) AS n
+            FROM resumen_diario WHERE 1=1{where}
+            GROUP BY id_tipo, id_calificacion, id_motivo
+        """, ("id_tipo", "id_calificacion", "id_motivo", "n"))
+        res = calcular_kpis((r["tipo"], r["calificacion"], r["motivo"], r["n"]) for r in fetch_all(sql, args))
+    return jsonify(turno=turno, **res)
+
+
+@app.cli.command("rebuild-rollup")
+def rebuild_rollup_cmd():
+    """Recalcula resumen_diario desde respuestas: flask --app app rebuild-rollup"""
+    with db_conn() as con:
+        rebuild_rollup(con)
+        con.commit()
+    print("resumen_diario reconstruido")
+
+
+# ---------- Mantenimiento de particiones y archivo ----------
+# Cada PARTICIONES_INTERVALO s (default 0 = solo a mano: flask --app app particiones) un único
+# worker (lock "particiones", sin esperar) hace una pasada:
+# - Postgres: crea las particiones del mes actual y el siguiente; marca cerradas las anteriores.
+# - SQLite: sella los meses cerrados; en la tabla caliente quedan PARTICION_MESES_ABIERTOS.
+# - Con RETENCION_MESES > 0 (meses que se conservan contando el actual), archiva los
+#   meses más antiguos en ARCHIVO_DIR; se consultan en /api/archivo/<mes>.
+PARTICIONES_INTERVALO = env_float("PARTICIONES_INTERVALO", 0.0)
+PARTICION_MESES_ABIERTOS = max(1, env_int("PARTICION_MESES_ABIERTOS", 1))
+RETENCION_MESES = env_int("RETENCION_MESES", 0)
+ARCHIVO_DIR = os.getenv("ARCHIVO_DIR") or os.path.join(
+    tempfile.gettempdir() if PG else os.path.dirname(os.path.abspath(sqlite_path())), "archivo")
+
+
+def mantener_particiones():
+    """Una pasada de mantenimiento. None si otro proceso la está haciendo."""
+    actual = particiones.mes_de(now_iso())
+    hecho = {"selladas": {}, "archivadas": {}}
     con = get_db()
-    if is_postgres():
-        with con.cursor() as cur:
-            cur.execute(q(sql), tuple(args))
-            cols = [c.name for c in cur.description]
-            rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    try:
+        if PG:
+            con.autocommit = True
+        with lock_entre_procesos(con, "particiones", esperar=False) as obtenido:
+            if not obtenido:
+                return None
+            if PG:
+                for mes in (actual, particiones.sumar(actual, 1)):
+                    crear_particion_pg(con, mes)
+                _ejecutar(con, "UPDATE particiones SET estado = 'cerrada', actualizada = ? "
+                               "WHERE estado = 'abierta' AND mes < ?", (now_iso(), actual))
+            else:
+                abiertos = particiones.sumar(actual, 1 - PARTICION_MESES_ABIERTOS)
+                while True:
+                    dia = con.execute("SELECT min(dia) FROM respuestas_datos").fetchone()[0]
+                    mes = particiones.mes_de(dia) if dia else None
+                    if mes is None or mes >= abiertos or mes in hecho["selladas"]:
+                        break
+                    hecho["selladas"][mes] = sellar_mes_sqlite(con, mes)
+            if RETENCION_MESES > 0:
+                limite = particiones.sumar(actual, 1 - max(RETENCION_MESES, PARTICION_MESES_ABIERTOS))
+                viejos = [m for (m,) in _ejecutar(
+                    con, "SELECT mes FROM particiones WHERE estado = 'cerrada' AND mes < ? ORDER BY mes", (limite,))]
+                for mes in viejos:
+                    hecho["archivadas"][mes] = archivar_mes(con, mes, ARCHIVO_DIR)
+    finally:
         con.close()
+    if hecho["archivadas"]:
+        # Filas fuera de la base: nueva generación; todos los workers invalidan su
+        # caché de lecturas y recargan la columnar
+        DATA_VERSION.bump(reinicio=True)
+    return hecho
+
+
+def _hilo_particiones():
+    time.sleep(min(60.0, PARTICIONES_INTERVALO))
+    while True:
+        try:
+            hecho = mantener_particiones()
+            if hecho and (hecho["selladas"] or hecho["archivadas"]):
+                print("Particiones:", hecho)
+        except Exception as e:
+            print("WARN: mantenimiento de particiones falló:", e)
+        time.sleep(PARTICIONES_INTERVALO)
+
+
+@app.cli.command("particiones")
+def particiones_cmd():
+    """Una pasada de mantenimiento de particiones y archivo: flask --app app particiones"""
+    print(mantener_particiones() or "otro proceso está haciendo el mantenimiento")
+
+
+@app.route("/api/particiones", methods=["GET"])
+def listar_particiones():
+    """Catálogo de meses (abierta, cerrada, archivada) y configuración de retención."""
+    filas = fetch_all("SELECT mes, tabla, estado, filas, bytes, sha256, actualizada FROM particiones ORDER BY mes")
+    for f in filas:
+        if f["estado"] == "archivada":
+            f["url"] = f"/api/archivo/{f['mes']}"
+    return jsonify(
+        particiones=filas,
+        meses_abiertos=None if PG else PARTICION_MESES_ABIERTOS,
+        retencion_meses=RETENCION_MESES,
+        intervalo=PARTICIONES_INTERVALO,
+    ), 200
+
+
+def _csv_archivo(filas):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(EXPORT_CSV_COLS)
+    for i, r in enumerate(filas, 1):
+        w.writerow((r["id"], r["created_at"], r["calificacion"], r["motivo"], r["dispositivo_id"] or "",
+                    r["sede"] or "", r["tipo"] or "", *_meta_otro(r["meta"])))
+        if i % EXPORT_CHUNK == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue()
+
+
+@app.route("/api/archivo/<mes>", methods=["GET"])
+def leer_archivo(mes):
+    """
+    Consulta bajo demanda de un mes archivado (orden por id): format=ndjson (por
+    defecto, misma forma que el export) o csv; filtro opcional tipo. El NDJSON sin
+    filtro se envía tal cual, comprimido, si el cliente acepta gzip.
+    """
+    if not particiones.MES_RE.match(mes):
+        raise ParamError("mes invalido (YYYY-MM)")
+    fmt_ = (request.args.get("format") or "ndjson").strip().lower()
+    if fmt_ not in ("csv", "ndjson"):
+        raise ParamError("format debe ser csv o ndjson")
+    tipo = (request.args.get("tipo") or "").strip().lower()
+    tipo = tipo if tipo in ALLOWED_TIPOS else None
+    fila = fetch_all("SELECT archivo, sha256 FROM particiones WHERE mes = ? AND estado = 'archivada'", [mes])
+    if not fila or not os.path.isfile(fila[0]["archivo"]):
+        return jsonify(error="mes no archivado"), 404
+    path = fila[0]["archivo"]
+    disposition = {"Content-Disposition": f'attachment; filename="respuestas-{mes}.{fmt_}"'}
+
+    if fmt_ == "ndjson" and tipo is None and \
+            elegir_encoding(request.headers.get("Accept-Encoding"), {"gzip": None}) == "gzip":
+        resp = send_file(path, mimetype="application/x-ndjson", etag=fila[0]["sha256"], conditional=True)
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Accept-Encoding"
+        resp.headers.update(disposition)
+        return resp
+
+    filas = (r for r in particiones.leer_archivo(path) if tipo is None or r["tipo"] == tipo)
+    if fmt_ == "csv":
+        body, mimetype = _csv_archivo(filas), "text/csv"
     else:
-        cur = con.execute(q(sql), args)
-        rows = [dict(r) for r in cur.fetchall()]
+        body = (json.dumps(r, ensure_ascii=False) + "\n" for r in filas)
+        mimetype = "application/x-ndjson"
+    return Response(stream_with_context(body), mimetype=mimetype, headers=disposition)
+
+
+# ---------- Snapshots de reportes ----------
+# Reportes semanales (semana ISO) y mensuales por alcance (todos, comedor, transporte),
+# con desglose por sede, precalculados en REPORTES_DIR como JSON, CSV y PDF. created_at
+# lo pone el servidor, así que un periodo cerrado ya no cambia: se genera una vez, cuando
+# cierra, y después se sirve desde disco. Cada REPORTES_INTERVALO s (default 0 = solo a
+# mano: flask --app app reportes) un único worker (lock "reportes", sin esperar) genera los que
+# falten de las últimas REPORTES_SEMANAS semanas y REPORTES_MESES meses.
+REPORTES_INTERVALO = env_float("REPORTES_INTERVALO", 0.0)
+REPORTES_SEMANAS = env_int("REPORTES_SEMANAS", 4)
+REPORTES_MESES = env_int("REPORTES_MESES", 3)
+REPORTES_TZ = os.getenv("REPORTES_TZ") or turnos.TIME_ZONE
+REPORTES_DIR = os.getenv("REPORTES_DIR") or os.path.join(
+    tempfile.gettempdir() if PG else os.path.dirname(os.path.abspath(sqlite_path())), "snapshots")
+SNAPSHOTS = snapshots.Snapshots(REPORTES_DIR)
+
+
+def datos_reportes(pid, tz_name=REPORTES_TZ):
+    """
+    Datos de los reportes de un periodo (días locales en tz_name) para cada alcance,
+    con una sola lectura agrupada por minuto UTC, tipo, sede, calificación y motivo.
+    """
+    tz = turnos.zona(tz_name)
+    clase, desde, hasta = snapshots.periodo(pid)
+    where, args = filtros_respuestas(args_locales({"desde": desde.isoformat(), "hasta": hasta.isoformat()}, tz))
+    sql = traducir_dimensiones(f"""
+        SELECT substr(created_at,1,16) AS m, id_tipo, id_sede, id_calificacion, id_motivo, COUNT(*) AS n
+        FROM respuestas_todas WHERE 1=1{where}
+        GROUP BY substr(created_at,1,16), id_tipo, id_sede, id_calificacion, id_motivo
+    """, ("m", "id_tipo", "id_sede", "id_calificacion", "id_motivo", "n"))
+
+    def nuevo():
+        return {"total": _conteo(), "dias": {}, "turnos": {k: _conteo() for k in turnos.SHIFT_DEFS},
+                "tipos": {}, "sedes": {}, "detalle": {}, "grupos": {}}
+    acum = {}
+    local = {}   # minuto UTC -> (día local, turnos que lo incluyen)
+    for rows in iter_chunks(sql, args):
+        for m, tipo, sede, calificacion, motivo, n in rows:
+            loc = local.get(m)
+            if loc is None:
+                lt = turnos.parse_utc(m).astimezone(tz)
+                minuto = lt.hour * 60 + lt.minute
+                loc = local[m] = (lt.date().isoformat(),
+                                  [k for k, d in turnos.SHIFT_DEFS.items() if turnos.is_minute_in_shift(minuto, d)])
+            dia, en_turnos = loc
+            tipo, sede = tipo or "desconocido", sede or "—"
+            for alcance in ("todos", tipo):
+                r = acum.get(alcance) or acum.setdefault(alcance, nuevo())
+                _sumar(r["total"], calificacion, n)
+                _sumar(r["dias"].setdefault(dia, _conteo()), calificacion, n)
+                _sumar(r["tipos"].setdefault(tipo, _conteo()), calificacion, n)
+                _sumar(r["sedes"].setdefault(sede, _conteo()), calificacion, n)
+                _sumar(r["detalle"].setdefault((dia, tipo, sede), _conteo()), calificacion, n)
+                for k in en_turnos:
+                    _sumar(r["turnos"][k], calificacion, n)
+                clave = (tipo, calificacion, motivo)
+                r["grupos"][clave] = r["grupos"].get(clave, 0) + n
+
+    dias = [(desde + timedelta(days=i)).isoformat() for i in range((hasta - desde).days + 1)]
+    out = {}
+    for alcance in snapshots.ALCANCES:
+        r = acum.get(alcance) or nuevo()
+        out[alcance] = {
+            "periodo": pid, "clase": clase, "alcance": alcance, "tz": tz_name,
+            "desde": desde.isoformat(), "hasta": hasta.isoformat(),
+            "total": r["total"],
+            "dias": [{"dia": d, **r["dias"].get(d, _conteo())} for d in dias],
+            "turnos": r["turnos"],
+            "tipos": r["tipos"],
+            "sedes": r["sedes"],
+            "kpis": calcular_kpis((t, c, m, n) for (t, c, m), n in sorted(r["grupos"].items(), key=str)),
+            "detalle": [{"dia": d, "tipo": t, "sede": s, **c} for (d, t, s), c in sorted(r["detalle"].items())],
+        }
+    return out
+
+
+def generar_reportes(periodos=None, forzar=False):
+    """
+    Genera los snapshots que falten de los periodos cerrados (o de `periodos`; con
+    forzar=True se regeneran aunque existan). Los periodos sin cerrar y los que tocan
+    un mes archivado se saltan. Devuelve los generados; None si otro proceso está en ello.
+    """
+    tz = turnos.zona(REPORTES_TZ)
+    hoy = datetime.now(tz).date()
+    periodos = periodos or snapshots.cerrados(hoy, REPORTES_SEMANAS, REPORTES_MESES)
+    hechos = []
+    con = get_db()
+    try:
+        if PG:
+            con.autocommit = True
+        with lock_entre_procesos(con, "reportes", esperar=False) as obtenido:
+            if not obtenido:
+                return None
+            archivados = {m for (m,) in _ejecutar(con, "SELECT mes FROM particiones WHERE estado = 'archivada'")}
+            for pid in periodos:
+                clase, desde, hasta = snapshots.periodo(pid)
+                meses = {particiones.mes_de(turnos.local_day_range_utc(d.isoformat(), tz)[i].isoformat())
+                         for d, i in ((desde, 0), (hasta, 1))}
+                if hasta >= hoy or meses & archivados:
+                    continue
+                if not forzar and all(SNAPSHOTS.buscar(pid, a) for a in snapshots.ALCANCES):
+                    continue
+                for alcance, datos in datos_reportes(pid).items():
+                    SNAPSHOTS.guardar({
+                        "periodo": pid, "clase": clase, "alcance": alcance, "tz": REPORTES_TZ,
+                        "desde": datos["desde"], "hasta": datos["hasta"],
+                        "total": datos["total"]["n"], "generado": now_iso(),
+                    }, datos)
+                hechos.append(pid)
+    finally:
         con.close()
-    return jsonify(rows)
+    return hechos
+
+
+def _hilo_reportes():
+    time.sleep(min(60.0, REPORTES_INTERVALO))
+    while True:
+        try:
+            hechos = generar_reportes()
+            if hechos:
+                print("Reportes generados:", hechos)
+        except Exception as e:
+            print("WARN: generación de reportes falló:", e)
+        time.sleep(REPORTES_INTERVALO)
+
+
+@app.cli.command("reportes")
+@click.argument("periodos", nargs=-1)
+def reportes_cmd(periodos):
+    """
+    Genera los reportes que falten: flask --app app reportes
+
+    Con periodos (2026-W41, 2026-09, ...) los regenera aunque ya existan.
+    """
+    for pid in periodos:
+        try:
+            snapshots.periodo(pid)
+        except ValueError as e:
+            raise click.BadParameter(f"{pid}: {e}")
+    hechos = generar_reportes(list(periodos) or None, forzar=bool(periodos))
+    print("otro proceso está generando los reportes" if hechos is None else f"generados: {hechos or 'ninguno'}")
+
+
+@app.route("/api/reportes/snapshots", methods=["GET"])
+def listar_snapshots():
+    """Catálogo de reportes precalculados; filtros opcionales clase (semana|mes), alcance y periodo."""
+    filtros = {k: (request.args.get(k) or "").strip() for k in ("clase", "alcance", "periodo")}
+    lista = [
+        {**e, "urls": {ext: f"/api/reportes/snapshots/{a['nombre']}" for ext, a in e["archivos"].items()}}
+        for e in SNAPSHOTS.indice() if all(not v or e[k] == v for k, v in filtros.items())
+    ]
+    resp = jsonify(snapshots=lista, tz=REPORTES_TZ, intervalo=REPORTES_INTERVALO)
+    resp.headers["Cache-Control"] = REVALIDATE
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+
+@app.route("/api/reportes/snapshots/<nombre>", methods=["GET"])
+def leer_snapshot(nombre):
+    """Archivo de un snapshot tal cual está en disco; el nombre lleva la huella, así que es inmutable."""
+    path = SNAPSHOTS.ruta(nombre)
+    if path is None:
+        return jsonify(error="snapshot no encontrado"), 404
+    base, huella, ext = nombre.rsplit(".", 2)
+    resp = send_file(path, mimetype=snapshots.FORMATOS[ext], etag=huella, conditional=True,
+                     as_attachment=ext == "csv", download_name=f"reporte-{base}.{ext}")
+    resp.headers["Cache-Control"] = IMMUTABLE
+    return resp
+
+
+# ---------- Assets (manifest construido al arrancar) ----------
+# Mapa resuelto Encuestas -> reportes, huellas de contenido y variantes br/gzip en memoria.
+# ASSET_MANIFEST=0 (desarrollo) sirve directo del disco sin caché larga.
+ASSET_DIRS = {
+    "assets": [ENC_ASSETS, REP_ASSETS],
+    "css": [ENC_CSS, REP_CSS],
+    "js": [ENC_JS, REP_JS],
+}
+PAGES = {
+    "comedor": os.path.join(ENC_DIR, "index_Comedor.html"),
+    "transporte": os.path.join(ENC_DIR, "index_Transporte.html"),
+    "reportes": os.path.join(REP_DIR, "reportes.html"),
+}
+ASSETS = AssetManifest(ASSET_DIRS, PAGES.values()) if os.getenv("ASSET_MANIFEST", "1") != "0" else None
+
+
+def send_asset(asset, inmutable):
+    """Variante según Accept-Encoding, ETag por variante y 304 sin cuerpo."""
+    enc = elegir_encoding(request.headers.get("Accept-Encoding"), asset.variants)
+    etag = asset.etag(enc)
+    headers = {"Cache-Control": IMMUTABLE if inmutable else REVALIDATE, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304, headers=headers)
+    else:
+        resp = Response(asset.variants[enc], mimetype=asset.mimetype, headers=headers)
+        if enc != "identity":
+            resp.headers["Content-Encoding"] = enc
+    resp.set_etag(etag)
+    return resp
+
+
+def _page(nombre):
+    path = PAGES[nombre]
+    if ASSETS is None or path not in ASSETS.pages:
+        return send_from_directory(os.path.dirname(path), os.path.basename(path))
+    # El HTML cambia de huellas en cada despliegue: siempre se revalida
+    return send_asset(ASSETS.pages[path], inmutable=False)
 
 
 # ---------- Páginas ----------
 @app.route("/comedor")
 def page_comedor():
-    return send_from_directory(os.path.join(BASE_DIR, "Encuestas"), "index_Comedor.html")
+    return _page("comedor")
 
 
 @app.route("/transporte")
 def page_transporte():
-    return send_from_directory(os.path.join(BASE_DIR, "Encuestas"), "index_Transporte.html")
+    return _page("transporte")
 
 
 @app.route("/reportes")
 def page_reportes():
-    return send_from_directory(os.path.join(BASE_DIR, "reportes"), "reportes.html")
+    return _page("reportes")
 
 
 # ---------- Assets con fallback (Encuestas -> reportes) ----------
@@ -326,50 +2829,161 @@ def _multi_send(candidates, filename):
     return jsonify({"error": "archivo no encontrado", "path": filename}), 404
 
 
+def _static(prefix, filename):
+    if ASSETS is None:
+        return _multi_send(ASSET_DIRS[prefix], filename)
+    hit = ASSETS.lookup(f"{prefix}/{filename}")
+    if hit is None:
+        return jsonify({"error": "archivo no encontrado", "path": filename}), 404
+    return send_asset(*hit)
+
+
 @app.route("/assets/<path:filename>")
 def static_assets(filename):
-    return _multi_send([os.path.join(ENC_DIR, "assets"), os.path.join(REP_DIR, "assets")], filename)
+    return _static("assets", filename)
 
 
 @app.route("/css/<path:filename>")
 def static_css(filename):
-    return _multi_send([os.path.join(ENC_DIR, "css"), os.path.join(REP_DIR, "css")], filename)
+    return _static("css", filename)
 
 
 @app.route("/js/<path:filename>")
 def static_js(filename):
-    return _multi_send([os.path.join(ENC_DIR, "js"), os.path.join(REP_DIR, "js")], filename)
+    return _static("js", filename)
+
+
+@app.route("/api/debug/assets")
+def assets_info():
+    if ASSETS is None:
+        return jsonify(enabled=False), 200
+    return jsonify(**ASSETS.stats(), urls={k: a.fingerprinted for k, a in ASSETS.assets.items()}), 200
 
 
 @app.route("/api/debug/dbinfo")
 def dbinfo():
     info = {
-        "engine": "Postgres" if is_postgres() else "SQLite",
+        "engine": "Postgres" if PG else "SQLite",
         "has_DATABASE_URL": bool(os.getenv("DATABASE_URL")),
         "render": bool(os.getenv("RENDER")),
     }
     # Si es SQLite, muestra la ruta del archivo
-    if not is_postgres():
-        env_db = os.getenv("SQLITE_PATH")
-        if env_db:
-            info["sqlite_path"] = env_db
-        elif os.getenv("RENDER") or os.getenv("KOYEB") or os.getenv("PORT"):
-            import tempfile as _tmp, os as _os
-            info["sqlite_path"] = _os.path.join(_tmp.gettempdir(), "encuesta.db")
-        else:
-            import os as _os
-            info["sqlite_path"] = _os.path.join(_os.path.dirname(__file__), "encuesta.db")
+    if not PG:
+        info["sqlite_path"] = sqlite_path()
+    info["pid"] = os.getpid()
+    info["data_version"] = DATA_VERSION.current()
+    info["pool"] = get_pool().stats()
+    info["dimensiones"] = DICCIONARIO.stats()
     return jsonify(info), 200
 
 
+@app.route("/api/debug/dbpool")
+def dbpool():
+    return jsonify(get_pool().stats()), 200
+
+
+@app.route("/api/debug/cache")
+def cache_info():
+    return jsonify(version=DATA_VERSION.current(), **RESPONSE_CACHE.stats()), 200
+
+
+@app.route("/api/debug/columnar")
+def columnar_info():
+    return jsonify(enabled=COLUMNAR_ENABLED, numpy=columnar.np is not None, **COLUMNAR.stats()), 200
+
+
+@app.route("/api/debug/writer")
+def writer_info():
+    writer = get_writer()
+    return jsonify(**(writer.stats() if writer else {"enabled": False}),
+                   lease=WRITER_LEASE.stats() if WRITER_LEASE is not None else None), 200
+
+
+@app.route("/api/debug/ingesta")
+def ingesta_info():
+    return jsonify(**INGESTA.stats()), 200
+
+
+@app.route("/api/metrics")
+def metrics():
+    """Métricas del proceso en formato texto de Prometheus."""
+    return Response(METRICS.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Stats acumulados desde el arranque del proceso: se exportan como counter con sufijo
+# _total (rate() y los reinicios los entiende Prometheus); el resto es gauge.
+CONTADORES = {
+    "db_pool": {"created", "checkouts", "waits", "timeouts", "recycled", "healthcheck_failed"},
+    "response_cache": {"hits", "misses", "stale", "evictions", "skipped"},
+    "sse": {"published", "duplicates", "subscribed", "dropped", "rejected"},
+    "dimensiones": {"hits", "misses"},
+    "ingesta": {"admitted", "enqueued", "rejected_full", "rejected_timeout", "wait_seconds"},
+    "group_commit": {"submitted", "rows", "batches", "commits", "errors", "fallbacks"},
+    "writer_lease": {"acquired", "contended", "timeouts", "wait_seconds"},
+}
+
+
+def _gauges(prefijo, stats):
+    contadores = CONTADORES.get(prefijo, ())
+    out = []
+    for k, v in stats.items():
+        if not isinstance(v, (int, float)) or isinstance(v, bool):
+            continue
+        if k in contadores:
+            out.append((f"{prefijo}_{k}_total", f"{prefijo} {k}", v, "counter"))
+        else:
+            out.append((f"{prefijo}_{k}", f"{prefijo} {k}", v))
+    return out
+
+
+@METRICS.gauges
+def _gauges_proceso():
+    out = _gauges("db_pool", get_pool().stats())
+    out += _gauges("response_cache", RESPONSE_CACHE.stats())
+    out += _gauges("sse", LIVE_FEED.stats())
+    out += _gauges("dimensiones", DICCIONARIO.stats())
+    out += _gauges("ingesta", INGESTA.stats())
+    if COLUMNAR_ENABLED:
+        out += _gauges("columnar", COLUMNAR.stats())
+    writer = get_writer()
+    if writer is not None:
+        out += _gauges("group_commit", writer.stats())
+    if WRITER_LEASE is not None:
+        out += _gauges("writer_lease", WRITER_LEASE.stats())
+    return out
+
+
+@app.route("/api/debug/slow-queries")
+def slow_queries():
+    return jsonify(threshold_ms=METRICS.slow_log.threshold_ms, queries=METRICS.slow_log.entries()), 200
+
+
+@app.route("/api/debug/stream")
+def stream_info():
+    return jsonify(LIVE_FEED.stats()), 200
+
+
 # ---------- Boot ----------
 try:
     init_db()
-    print("DB init OK (engine:", "Postgres" if is_postgres() else "SQLite", ")")
+    print("DB init OK (engine:", "Postgres" if PG else "SQLite", ")")
 except Exception as e:
     print("ERROR: init_db failed:", e)
     traceback.print_exc()
 
+if PARTICIONES_INTERVALO > 0:
+    threading.Thread(target=_hilo_particiones, name="particiones", daemon=True).start()
+
+if REPORTES_INTERVALO > 0:
+    threading.Thread(target=_hilo_reportes, name="reportes", daemon=True).start()
+
+if COLUMNAR_ENABLED:
+    if columnar.np is None:
+        print("WARN: COLUMNAR_CACHE=1 sin numpy instalado; agregados por SQL")
+        COLUMNAR_ENABLED = False
+    else:
+        threading.Thread(target=cargar_columnar, name="columnar-carga", daemon=True).start()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,184 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+COMPRESSIBLE = (".js", ".css", ".html", ".svg", ".json", ".webmanifest", ".txt", ".map")
+MIN_COMPRESS = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("text/javascript", ".js")
+
+
+# ---------- Manifest de assets ----------
+class Asset:
+    """Un archivo servible: cuerpo y variantes comprimidas compartidas por hash de contenido."""
+
+    __slots__ = ("key", "path", "digest", "mimetype", "variants", "fingerprinted")
+
+    def __init__(self, key, path, digest, mimetype, variants):
+        self.key = key
+        self.path = path
+        self.digest = digest
+        self.mimetype = mimetype
+        self.variants = variants        # {"identity"|"br"|"gzip": bytes}
+        stem, ext = os.path.splitext(key)
+        self.fingerprinted = f"{stem}.{digest}{ext}"
+
+    def etag(self, encoding):
+        return self.digest if encoding == "identity" else f"{self.digest}-{encoding}"
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def elegir_encoding(accept_encoding, variants):
+    """Accept-Encoding -> 'br', 'gzip' o 'identity' (respeta q=0)."""
+    aceptadas = {}
+    for parte in (accept_encoding or "").split(","):
+        nombre, _, params = parte.strip().partition(";")
+        q = 1.0
+        m = re.search(r"q=([0-9.]+)", params)
+        if m:
+            try:
+                q = float(m.group(1))
+            except ValueError:
+                q = 0.0
+        if nombre:
+            aceptadas[nombre.lower()] = q
+    for enc in ("br", "gzip"):
+        q = aceptadas.get(enc, aceptadas.get("*", 0.0))
+        if enc in variants and q > 0:
+            return enc
+    return "identity"
+
+
+class AssetManifest:
+    """
+    Se construye una vez al arrancar:
+    - `dirs`: {prefijo: [directorios]}; el primer directorio que tenga el archivo gana
+      (mismo orden que el antiguo fallback Encuestas -> reportes).
+    - Huella de contenido (sha256, 12 hex) para URLs /prefijo/nombre.<hash>.ext inmutables.
+    - Variantes gzip/brotli precalculadas para texto.
+    - Archivos idénticos (p. ej. las imágenes repetidas en Encuestas/ y reportes/)
+      comparten un único blob en memoria.
+    - CSS y HTML se reescriben para apuntar a las URLs con huella.
+    """
+
+    def __init__(self, dirs, pages=()):
+        self._blobs = {}           # digest -> variants
+        self.assets = {}           # "js/script.js" -> Asset
+        self._by_fingerprint = {}  # "js/script.<hash>.js" -> Asset
+        self.pages = {}            # ruta de archivo -> Asset
+        self.duplicates = 0
+        self.bytes_saved = 0
+        # Primero lo que otros archivos referencian (imágenes), luego CSS y JS
+        orden = sorted(dirs.items(), key=lambda kv: {"assets": 0, "css": 1}.get(kv[0], 2))
+        for prefix, candidates in orden:
+            for root in candidates:
+                if not os.path.isdir(root):
+                    continue
+                for dirpath, _, files in os.walk(root):
+                    for name in sorted(files):
+                        full = os.path.join(dirpath, name)
+                        key = prefix + "/" + os.path.relpath(full, root).replace(os.sep, "/")
+                        if key in self.assets:
+                            self._contar_duplicado(full)
+                            continue
+                        self._add(key, full)
+        for path in pages:
+            if os.path.isfile(path):
+                self.pages[path] = self._build(os.path.basename(path), path, self._reescribir_html)
+
+    def _contar_duplicado(self, full):
+        with open(full, "rb") as f:
+            data = f.read()
+        if _digest(data) in self._blobs:
+            self.duplicates += 1
+            self.bytes_saved += len(data)
+
+    def _add(self, key, full):
+        transform = self._reescribir_css if key.endswith(".css") else None
+        asset = self._build(key, full, transform)
+        self.assets[key] = asset
+        self._by_fingerprint[asset.fingerprinted] = asset
+
+    def _build(self, key, full, transform=None):
+        with open(full, "rb") as f:
+            data = f.read()
+        if transform:
+            data = transform(key, data)
+        digest = _digest(data)
+        variants = self._blobs.get(digest)
+        if variants is None:
+            variants = {"identity": data}
+            if key.endswith(COMPRESSIBLE) and len(data) >= MIN_COMPRESS:
+                gz = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(gz) < len(data):
+                    variants["gzip"] = gz
+                if brotli is not None:
+                    br = brotli.compress(data, quality=11)
+                    if len(br) < len(data):
+                        variants["br"] = br
+            self._blobs[digest] = variants
+        mimetype = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        return Asset(key, full, digest, mimetype, variants)
+
+    # --- reescritura de referencias ---
+    def _url(self, key):
+        asset = self.assets.get(key)
+        return asset.fingerprinted if asset else None
+
+    def _reescribir_css(self, key, data):
+        base = key.rsplit("/", 1)[0]
+
+        def sub(m):
+            ref = m.group(2)
+            if re.match(r"^(?:[a-z]+:|/|#)", ref):
+                return m.group(0)
+            resolved = os.path.normpath(os.path.join(base, ref.split("?")[0])).replace(os.sep, "/")
+            url = self._url(resolved)
+            if not url:
+                return m.group(0)
+            rel = os.path.relpath(url, base).replace(os.sep, "/")
+            return f"url({m.group(1)}{rel}{m.group(1)})"
+        text = data.decode("utf-8")
+        return re.sub(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)", sub, text).encode("utf-8")
+
+    def _reescribir_html(self, key, data):
+        def sub(m):
+            url = self._url(m.group(3))
+            return m.group(1) + m.group(2) + url + m.group(2) if url else m.group(0)
+        text = data.decode("utf-8")
+        pattern = r"""((?:href|src)=)(["'])((?:css|js|assets)/[^"'?#]+)(?:\?[^"'#]*)?\2"""
+        return re.sub(pattern, sub, text).encode("utf-8")
+
+    # --- consulta ---
+    def lookup(self, key):
+        """(Asset, inmutable) para 'js/x.js' o 'js/x.<hash>.js'; None si no existe."""
+        asset = self._by_fingerprint.get(key)
+        if asset is not None:
+            return asset, True
+        asset = self.assets.get(key)
+        return (asset, False) if asset is not None else None
+
+    def stats(self):
+        return {
+            "assets": len(self.assets),
+            "pages": len(self.pages),
+            "blobs": len(self._blobs),
+            "duplicates": self.duplicates,
+            "bytes_saved": self.bytes_saved,
+            "bytes": sum(len(v["identity"]) for v in self._blobs.values()),
+            "brotli": brotli is not None,
+        }
+
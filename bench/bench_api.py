@@ -0,0 +1,313 @@
+"""
+Benchmark de la API contra SQLite: latencias p50/p95/p99, req/s y filas/s.
+
+Escenarios:
+    listar_pagina  GET /api/respuestas?limit=50 (ventana de 7 días, keyset)
+    listar_dia     GET /api/respuestas de un día completo
+    resumen        GET /api/resumen de 30 días
+    post           POST /api/respuestas
+
+Drivers:
+    client  Flask test client en proceso (sin red; mide app + BD)
+    http    servidor WSGI con hilos en 127.0.0.1 (o --url de un gunicorn ya levantado)
+            y C hilos cliente con http.client
+
+La caché de respuestas se desactiva salvo --cache, para medir el camino a la BD; el
+control de admisión de la ingesta, salvo --admission (sus 429/503 cuentan como errores).
+
+Uso:
+    python bench/bench_api.py --rows 1000000 --driver http --concurrency 8 --save bench/baselines/local.json
+    python bench/bench_api.py --db /tmp/bench.db --compare bench/baselines/local.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+import http.client
+from urllib.parse import urlsplit, urlencode
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import datagen  # noqa: E402
+
+ESCENARIOS = ("listar_pagina", "listar_dia", "resumen", "post")
+
+
+# ---------- Peticiones ----------
+def peticion(escenario, rnd, dias):
+    """(método, ruta, body) para una petición del escenario; los días se eligen al azar."""
+    hoy = datetime.utcnow().date()
+    d = hoy - timedelta(days=rnd.randrange(max(dias - 30, 1)))
+    if escenario == "listar_pagina":
+        qs = {"limit": 50, "desde": (d - timedelta(days=6)).isoformat(), "hasta": d.isoformat()}
+        return "GET", "/api/respuestas?" + urlencode(qs), None
+    if escenario == "listar_dia":
+        return "GET", "/api/respuestas?" + urlencode({"desde": d.isoformat(), "hasta": d.isoformat()}), None
+    if escenario == "resumen":
+        qs = {"desde": (d - timedelta(days=29)).isoformat(), "hasta": d.isoformat()}
+        return "GET", "/api/resumen?" + urlencode(qs), None
+    tipo = rnd.choice(("comedor", "transporte"))
+    body = {
+        "calificacion": rnd.choice(("Excelente", "Bueno", "Regular", "Malo")),
+        "motivo": rnd.choice(datagen.MOTIVOS[tipo]["pos"]),
+        "sede": rnd.choice(datagen.SEDES),
+        "dispositivo_id": rnd.choice(datagen.dispositivos(tipo)),
+        "tipo": tipo,
+        "submission_id": f"bench-{rnd.getrandbits(64):016x}",
+    }
+    return "POST", "/api/respuestas", body
+
+
+def filas_de(escenario, status, payload):
+    if status >= 300:
+        return 0
+    if escenario == "post":
+        return 1
+    return len(payload) if isinstance(payload, list) else 0
+
+
+# ---------- Drivers ----------
+class ClientDriver:
+    def __init__(self, app):
+        self.app = app
+
+    def sesion(self):
+        client = self.app.test_client()
+
+        def enviar(metodo, ruta, body):
+            r = client.open(ruta, method=metodo, json=body)
+            return r.status_code, r.get_json(silent=True)
+        return enviar
+
+
+class HttpDriver:
+    def __init__(self, url):
+        u = urlsplit(url)
+        self.host, self.port = u.hostname, u.port or 80
+
+    def sesion(self):
+        estado = {"con": None}
+
+        def enviar(metodo, ruta, body):
+            for intento in (0, 1):
+                if estado["con"] is None:
+                    estado["con"] = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                con = estado["con"]
+                try:
+                    data = json.dumps(body).encode() if body is not None else None
+                    con.request(metodo, ruta, body=data,
+                                headers={"Content-Type": "application/json"} if data else {})
+                    r = con.getresponse()
+                    raw = r.read()
+                    if r.getheader("Connection", "").lower() == "close" or r.version == 10:
+                        con.close()
+                        estado["con"] = None
+                    return r.status, json.loads(raw) if raw else None
+                except (http.client.HTTPException, ConnectionError):
+                    con.close()
+                    estado["con"] = None
+                    if intento:
+                        raise
+        return enviar
+
+
+def servidor_local(app):
+    """Servidor WSGI con hilos (werkzeug) en un puerto libre; devuelve (url, stop)."""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class Handler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    srv = make_server("127.0.0.1", 0, app, threaded=True, request_handler=Handler)
+    th = threading.Thread(target=srv.serve_forever, daemon=True)
+    th.start()
+    return f"http://127.0.0.1:{srv.server_port}", srv.shutdown
+
+
+# ---------- Medición ----------
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+def correr(driver, escenario, requests, concurrency, dias, seed, warmup):
+    por_hilo = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    lat, filas, errores = [], [0], [0]
+    lock = threading.Lock()
+
+    def worker(i, n):
+        rnd = random.Random(seed * 1000 + i)
+        enviar = driver.sesion()
+        for _ in range(warmup):
+            enviar(*peticion(escenario, rnd, dias))
+        mias, f, e = [], 0, 0
+        barrera.wait()
+        for _ in range(n):
+            metodo, ruta, body = peticion(escenario, rnd, dias)
+            t0 = time.perf_counter()
+            try:
+                status, payload = enviar(metodo, ruta, body)
+            except Exception:
+                e += 1
+                continue
+            mias.append(time.perf_counter() - t0)
+            if status >= 300:
+                e += 1
+            f += filas_de(escenario, status, payload)
+        with lock:
+            lat.extend(mias)
+            filas[0] += f
+            errores[0] += e
+
+    barrera = threading.Barrier(concurrency + 1)
+    hilos = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(por_hilo)]
+    for h in hilos:
+        h.start()
+    barrera.wait()
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.join()
+    total = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "n": len(lat),
+        "errores": errores[0],
+        "seg": round(total, 3),
+        "p50_ms": round(percentil(lat, 50) * 1000, 2),
+        "p95_ms": round(percentil(lat, 95) * 1000, 2),
+        "p99_ms": round(percentil(lat, 99) * 1000, 2),
+        "req_s": round(len(lat) / total, 1),
+        "rows_s": round(filas[0] / total, 1),
+    }
+
+
+def comparar(actual, base, tolerancia):
+    """Imprime la comparación y devuelve True si algún escenario empeoró más de la tolerancia."""
+    peor = False
+    print(f"\nComparación con {base['meta'].get('fecha')} (tolerancia {tolerancia:.0%})")
+    for k in ("driver", "concurrency", "cache", "filas_bd", "cpus"):
+        if base["meta"].get(k) != actual["meta"].get(k):
+            print(f"  aviso: {k} distinto ({base['meta'].get(k)} vs {actual['meta'].get(k)}), no es comparable 1:1")
+    for esc, r in actual["resultados"].items():
+        b = base["resultados"].get(esc)
+        if not b:
+            continue
+        dp95 = (r["p95_ms"] - b["p95_ms"]) / b["p95_ms"] if b["p95_ms"] else 0.0
+        dreq = (r["req_s"] - b["req_s"]) / b["req_s"] if b["req_s"] else 0.0
+        regresion = dp95 > tolerancia or dreq < -tolerancia
+        peor |= regresion
+        print(f"  {esc:<14} p95 {b['p95_ms']:>8.2f} -> {r['p95_ms']:>8.2f} ms ({dp95:+.0%})   "
+              f"req/s {b['req_s']:>8.1f} -> {r['req_s']:>8.1f} ({dreq:+.0%})"
+              f"{'   REGRESIÓN' if regresion else ''}")
+    return peor
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None, help="SQLite existente (p. ej. de datagen.py)")
+    ap.add_argument("--rows", type=int, default=200_000, help="filas a generar si no hay --db")
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--driver", choices=("client", "http"), default="client")
+    ap.add_argument("--url", default=None, help="con --driver http: servidor ya levantado")
+    ap.add_argument("--scenarios", default=",".join(ESCENARIOS))
+    ap.add_argument("--requests", type=int, default=500, help="peticiones por escenario")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--warmup", type=int, default=5, help="peticiones de calentamiento por hilo")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--cache", action="store_true", help="deja activa la caché de respuestas")
+    ap.add_argument("--admission", action="store_true", help="deja activo el control de admisión de POST")
+    ap.add_argument("--save", default=None, help="guarda el resultado como JSON")
+    ap.add_argument("--compare", default=None, help="JSON de referencia")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    a = ap.parse_args()
+
+    escenarios = [e.strip() for e in a.scenarios.split(",") if e.strip()]
+    invalidos = [e for e in escenarios if e not in ESCENARIOS]
+    if invalidos:
+        ap.error("escenarios invalidos: " + ", ".join(invalidos))
+
+    if not a.cache:
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+    if not a.admission:
+        os.environ["INGESTA_MAX_ACTIVAS"] = "0"
+    path = a.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_api_"), "bench.db")
+        seg = datagen.generar(path, a.rows, a.months, a.seed)
+        print(f"Generadas {a.rows} filas en {seg:.1f}s -> {path}")
+    os.environ["SQLITE_PATH"] = path
+    os.environ.pop("DATABASE_URL", None)
+    sys.path.insert(0, ROOT)
+    import app
+
+    con = sqlite3.connect(path)
+    filas_bd = con.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+    primero = con.execute("SELECT min(dia) FROM respuestas").fetchone()[0]
+    con.close()
+    dias = max((datetime.utcnow().date() - datetime.fromisoformat(primero).date()).days, 31) if primero else 31
+
+    stop = None
+    if a.driver == "client":
+        driver = ClientDriver(app.app)
+    else:
+        url = a.url
+        if url is None:
+            url, stop = servidor_local(app.app)
+        driver = HttpDriver(url)
+
+    resultado = {
+        "meta": {
+            "fecha": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "maquina": platform.machine(),
+            "cpus": os.cpu_count(),
+            "filas_bd": filas_bd,
+            "driver": a.driver if not a.url else f"http {a.url}",
+            "concurrency": a.concurrency,
+            "requests": a.requests,
+            "cache": a.cache,
+            "admission": a.admission,
+        },
+        "resultados": {},
+    }
+    print(f"{filas_bd} filas, driver={a.driver}, concurrencia={a.concurrency}, {a.requests} peticiones/escenario")
+    print(f"{'escenario':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'filas/s':>11}{'err':>5}")
+    try:
+        for esc in escenarios:
+            r = correr(driver, esc, a.requests, a.concurrency, dias, a.seed, a.warmup)
+            resultado["resultados"][esc] = r
+            print(f"{esc:<16}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                  f"{r['req_s']:>9.1f}{r['rows_s']:>11.0f}{r['errores']:>5}")
+    finally:
+        if stop:
+            stop()
+
+    if a.save:
+        os.makedirs(os.path.dirname(os.path.abspath(a.save)), exist_ok=True)
+        with open(a.save, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nGuardado en {a.save}")
+    if a.compare:
+        with open(a.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultado, base, a.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark de ingesta SQLite: commit por petición vs cola de group commit.
+
+Levanta app.py contra una base temporal y lanza N hilos que insertan respuestas
+una a una (como los POST de los kioscos), primero con el camino actual
+(pool + commit por petición) y luego con GroupCommitWriter.
+
+Uso:
+    python bench/bench_group_commit.py --threads 16 --per-thread 500
+    python bench/bench_group_commit.py --synchronous FULL
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fila(app, i):
+    row, _ = app.validar_respuesta(
+        {"calificacion": "Bueno", "motivo": "Sabor", "tipo": "comedor",
+         "dispositivo_id": "tablet-comedor-01", "submission_id": f"bench-{i}"},
+        app.now_iso(),
+    )
+    return row
+
+
+def correr(app, escribir, threads, per_thread, offset):
+    errores = []
+    lat = []
+    lock = threading.Lock()
+
+    def worker(t):
+        mias = []
+        for k in range(per_thread):
+            row = fila(app, offset + t * per_thread + k)
+            t0 = time.perf_counter()
+            try:
+                escribir([row])
+            except Exception as e:
+                with lock:
+                    errores.append(repr(e))
+                continue
+            mias.append(time.perf_counter() - t0)
+        with lock:
+            lat.extend(mias)
+
+    hilos = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    total = time.perf_counter() - t0
+    lat.sort()
+    pct = lambda p: lat[min(len(lat) - 1, int(len(lat) * p))] * 1000 if lat else 0.0
+    return {"filas": len(lat), "seg": total, "filas_s": len(lat) / total,
+            "p50_ms": pct(0.50), "p99_ms": pct(0.99), "errores": len(errores),
+            "primer_error": errores[0] if errores else None}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--per-thread", type=int, default=500)
+    ap.add_argument("--max-batch", type=int, default=200)
+    ap.add_argument("--max-delay", type=float, default=0.0)
+    ap.add_argument("--synchronous", default="NORMAL", choices=("OFF", "NORMAL", "FULL"))
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_gc_")
+    os.environ["SQLITE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.pop("GROUP_COMMIT", None)
+    sys.path.insert(0, ROOT)
+    import app
+
+    # Mismo PRAGMA synchronous para ambos caminos
+    connect_base = app.connect_sqlite
+
+    def connect():
+        con = connect_base()
+        con.execute(f"PRAGMA synchronous={args.synchronous};")
+        return con
+    app.connect_sqlite = connect
+
+    n = args.threads * args.per_thread
+    print(f"{args.threads} hilos x {args.per_thread} inserts, synchronous={args.synchronous}")
+
+    directo = correr(app, app.escribir_respuestas, args.threads, args.per_thread, 0)
+
+    writer = app.GroupCommitWriter(connect, app.insert_respuestas,
+                                   max_batch=args.max_batch, max_delay=args.max_delay,
+                                   al_confirmar=app.confirmar_escritura)
+    agrupado = correr(app, lambda rows: writer.write(rows, timeout=30), args.threads, args.per_thread, n)
+    writer.close()
+    st = writer.stats()
+
+    print(f"{'modo':<22}{'filas/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errores':>9}")
+    for nombre, r in (("commit por peticion", directo), ("group commit", agrupado)):
+        print(f"{nombre:<22}{r['filas_s']:>10.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errores']:>9}")
+        if r["primer_error"]:
+            print("   ", r["primer_error"])
+    print(f"group commit: {st['commits']} commits, {st['rows'] / max(st['commits'], 1):.1f} filas/commit "
+          f"(máx {st['max_batch_rows']})")
+
+
+if __name__ == "__main__":
+    main()
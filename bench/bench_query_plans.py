@@ -0,0 +1,138 @@
+"""
+Benchmark de planes de consulta: filtros con substr() vs rangos sobre created_at/dia.
+
+Crea una tabla SQLite sintética con el esquema original (sin columna `dia`),
+mide las consultas de /api/respuestas y /api/resumen tal como eran, luego
+aplica init_db() (migración) y mide el SQL que arman hoy esos endpoints y el
+GET completo (test_client, sin caché de respuestas ni caché columnar).
+
+Uso:
+    python bench/bench_query_plans.py --rows 1000000
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA_ORIGINAL = """
+CREATE TABLE respuestas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    sede TEXT,
+    dispositivo_id TEXT,
+    calificacion TEXT NOT NULL,
+    motivo TEXT NOT NULL,
+    meta TEXT,
+    tipo TEXT
+);
+CREATE INDEX idx_respuestas_created_at ON respuestas(created_at);
+CREATE INDEX idx_respuestas_tipo       ON respuestas(tipo);
+CREATE INDEX idx_respuestas_calif      ON respuestas(calificacion);
+"""
+
+CALIFS = ["Excelente", "Bueno", "Regular", "Malo"]
+MOTIVOS = ["Sabor", "Variedad", "Atención", "Retraso", "Sobrecupo", "Otro"]
+
+
+def generar(path, rows, dias):
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA_ORIGINAL)
+    t0 = datetime.utcnow() - timedelta(days=dias)
+    span = dias * 86400
+    rnd = random.Random(42)
+
+    def filas():
+        for i in range(rows):
+            ts = (t0 + timedelta(seconds=span * i // rows)).replace(microsecond=0).isoformat() + "Z"
+            tipo = rnd.choice(("comedor", "transporte"))
+            yield (ts, rnd.choice(("Saltillo", "Ramos")), f"tablet-{tipo}-0{rnd.randint(1, 4)}",
+                   rnd.choice(CALIFS), rnd.choice(MOTIVOS), "{}", tipo)
+
+    con.executemany(
+        "INSERT INTO respuestas (created_at, sede, dispositivo_id, calificacion, motivo, meta, tipo) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", filas())
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+def medir(con, nombre, sql, params, repeticiones=3):
+    plan = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    mejor = None
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        n = len(con.execute(sql, params).fetchall())
+        dt = time.perf_counter() - t
+        mejor = dt if mejor is None else min(mejor, dt)
+    print(f"\n[{nombre}] filas={n} mejor={mejor * 1000:.1f} ms")
+    for linea in plan:
+        print("   ", linea)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--window", type=int, default=7, help="días consultados (los más recientes)")
+    ap.add_argument("--db", default=None, help="ruta del SQLite sintético (por defecto, temporal)")
+    a = ap.parse_args()
+
+    path = a.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    if os.path.exists(path):
+        os.remove(path)
+    t = time.perf_counter()
+    generar(path, a.rows, a.days)
+    print(f"Generadas {a.rows} filas en {time.perf_counter() - t:.1f}s -> {path}")
+
+    hoy = datetime.utcnow().date()
+    desde, hasta = (hoy - timedelta(days=a.window)).isoformat(), hoy.isoformat()
+
+    print("\n=== ANTES (substr(created_at,1,10)) ===")
+    con = sqlite3.connect(path)
+    medir(con, "listar", "SELECT * FROM respuestas WHERE 1=1 AND substr(created_at,1,10) >= ? "
+          "AND substr(created_at,1,10) <= ? ORDER BY created_at DESC", (desde, hasta))
+    medir(con, "resumen", "SELECT substr(created_at,1,10) AS dia, tipo, calificacion, COUNT(*) AS n "
+          "FROM respuestas WHERE 1=1 AND substr(created_at,1,10) >= ? AND substr(created_at,1,10) <= ? "
+          "GROUP BY dia, tipo, calificacion ORDER BY dia", (desde, hasta))
+    con.close()
+
+    # Migración real de app.py (columna dia + índices) sobre la misma base
+    os.environ["SQLITE_PATH"] = path
+    os.environ.pop("DATABASE_URL", None)
+    os.environ["CACHE_TTL"] = "0"
+    os.environ["COLUMNAR_CACHE"] = "0"
+    sys.path.insert(0, ROOT)
+    t = time.perf_counter()
+    import app
+    print(f"\ninit_db (migración) {time.perf_counter() - t:.1f}s")
+
+    args = {"desde": desde, "hasta": hasta}
+    print("\n=== DESPUÉS (rangos semiabiertos / columna dia) ===")
+    con = sqlite3.connect(path)
+    con.execute("ANALYZE")
+    where, params = app.filtros_respuestas(args)
+    medir(con, "listar", f"SELECT {', '.join(app.RESPUESTA_COLS)} FROM respuestas WHERE 1=1{where} "
+          "ORDER BY created_at DESC, id DESC", params)
+    where, params = app.filtros_respuestas(args, por_dia=True)
+    medir(con, "resumen", app.sql_resumen(where), params)
+    con.close()
+
+    client = app.app.test_client()
+    for ruta in ("/api/respuestas", "/api/resumen"):
+        mejor = None
+        for _ in range(3):
+            t = time.perf_counter()
+            r = client.get(ruta, query_string=args)
+            dt = time.perf_counter() - t
+            mejor = dt if mejor is None else min(mejor, dt)
+        print(f"\n[GET {ruta}] status={r.status_code} bytes={len(r.data)} mejor={mejor * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
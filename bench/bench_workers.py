@@ -0,0 +1,148 @@
+"""
+Benchmark de lectura con varios workers de gunicorn: req/s por número de workers.
+
+Levanta `gunicorn -w N -k gthread` contra la misma base SQLite para cada N de
+--workers y mide los escenarios de lectura de bench_api.py (driver http, C hilos
+cliente con keep-alive). La caché de respuestas se desactiva salvo --cache. Al
+final imprime la escala de req/s respecto del primer N.
+
+Con SQLite las lecturas no se bloquean entre procesos (WAL), así que el techo es
+la CPU: en una máquina de 1 núcleo más workers no suman req/s.
+
+Uso:
+    python bench/bench_workers.py --db /tmp/bench.db --workers 1,2,4 --concurrency 16
+    python bench/bench_workers.py --rows 200000 --scenarios listar_pagina,resumen --save bench/baselines/workers.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+import http.client
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import datagen  # noqa: E402
+from bench_api import HttpDriver, correr  # noqa: E402
+
+LECTURAS = ("listar_pagina", "listar_dia", "resumen")
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar(path, workers, threads, cache, log):
+    """gunicorn con `workers` procesos; devuelve (proceso, url) cuando ya responde."""
+    port = puerto_libre()
+    env = dict(os.environ, SQLITE_PATH=path, PARTICIONES_INTERVALO="0", PYTHONPATH=ROOT)
+    env.pop("DATABASE_URL", None)
+    if not cache:
+        env["CACHE_MAX_ENTRIES"] = "0"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+         "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=ROOT, env=env, stdout=log, stderr=log,
+    )
+    fin = time.monotonic() + 60
+    while time.monotonic() < fin:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó con código {proc.returncode}")
+        try:
+            con = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            con.request("GET", "/")
+            con.getresponse().read()
+            con.close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn no respondió en 60 s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=None, help="SQLite existente (p. ej. de datagen.py)")
+    ap.add_argument("--rows", type=int, default=200_000, help="filas a generar si no hay --db")
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--threads", type=int, default=8, help="hilos gthread por worker")
+    ap.add_argument("--scenarios", default=",".join(LECTURAS))
+    ap.add_argument("--requests", type=int, default=1000, help="peticiones por escenario")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--warmup", type=int, default=5, help="peticiones de calentamiento por hilo")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--cache", action="store_true", help="deja activa la caché de respuestas")
+    ap.add_argument("--save", default=None, help="guarda el resultado como JSON")
+    a = ap.parse_args()
+
+    escenarios = [e.strip() for e in a.scenarios.split(",") if e.strip()]
+    invalidos = [e for e in escenarios if e not in LECTURAS]
+    if invalidos:
+        ap.error("escenarios invalidos (solo lecturas): " + ", ".join(invalidos))
+    workers = [int(w) for w in a.workers.split(",") if w.strip()]
+
+    path = a.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_workers_"), "bench.db")
+        seg = datagen.generar(path, a.rows, a.months, a.seed)
+        print(f"Generadas {a.rows} filas en {seg:.1f}s -> {path}")
+    con = sqlite3.connect(path)
+    filas_bd = con.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+    primero = con.execute("SELECT min(dia) FROM respuestas").fetchone()[0]
+    con.close()
+    dias = max((datetime.utcnow().date() - datetime.fromisoformat(primero).date()).days, 31) if primero else 31
+
+    resultado = {
+        "meta": {
+            "fecha": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "maquina": platform.machine(),
+            "cpus": os.cpu_count(),
+            "filas_bd": filas_bd,
+            "threads": a.threads,
+            "concurrency": a.concurrency,
+            "requests": a.requests,
+            "cache": a.cache,
+        },
+        "resultados": {},
+    }
+    print(f"{filas_bd} filas, {os.cpu_count()} CPUs, concurrencia={a.concurrency}, {a.requests} peticiones/escenario")
+    print(f"{'workers':>7}  {'escenario':<16}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}{'escala':>8}{'err':>5}")
+    log = open(os.path.join(tempfile.gettempdir(), "bench_workers.log"), "a")
+    base = {}
+    for n in workers:
+        proc, url = levantar(path, n, a.threads, a.cache, log)
+        try:
+            driver = HttpDriver(url)
+            por_esc = resultado["resultados"][str(n)] = {}
+            for esc in escenarios:
+                r = correr(driver, esc, a.requests, a.concurrency, dias, a.seed, a.warmup)
+                base.setdefault(esc, r["req_s"])
+                r["escala"] = round(r["req_s"] / base[esc], 2) if base[esc] else None
+                por_esc[esc] = r
+                print(f"{n:>7}  {esc:<16}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['req_s']:>9.1f}"
+                      f"{r['escala']:>7.2f}x{r['errores']:>5}")
+        finally:
+            proc.terminate()
+            proc.wait(30)
+
+    if a.save:
+        os.makedirs(os.path.dirname(os.path.abspath(a.save)), exist_ok=True)
+        with open(a.save, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nGuardado en {a.save}")
+
+
+if __name__ == "__main__":
+    main()
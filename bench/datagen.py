@@ -0,0 +1,127 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+
+Crea (o amplía) una base SQLite con el esquema actual de app.py (init_db) y la
+llena con respuestas repartidas por tipo, sede, dispositivo, motivo y meses, con
+horas concentradas en los turnos y ~5% de "Otro" con empleado/comentario.
+Mismo --seed -> mismos datos.
+
+Uso:
+    python bench/datagen.py --rows 2000000 --months 12 --db /tmp/bench.db
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEDES = ("Saltillo", "Ramos Arizpe", "Derramadero")
+CALIFS = (("Excelente", 35), ("Bueno", 40), ("Regular", 17), ("Malo", 8))
+MOTIVOS = {
+    "comedor": {
+        "pos": ("Sabor", "Variedad", "Atención", "Ambiente", "Otro"),
+        "neg": ("Mal sabor", "Poca variedad", "Comida fría", "Cruda", "Tardanza en servir", "Otro"),
+    },
+    "transporte": {
+        "pos": ("Puntualidad", "Confort", "Amabilidad", "Seguridad", "Limpieza", "Otro"),
+        "neg": ("Retraso", "Conducción brusca", "Suciedad", "Sobrecupo", "Ruta incorrecta", "Otro"),
+    },
+}
+COMENTARIOS = ("la comida estaba fria", "el camion llego tarde", "muy buen servicio",
+               "falto variedad en el menu", "chofer amable", "mucho ruido en el comedor")
+# Horas locales (UTC-6) con más tráfico: comidas de cada turno y entradas/salidas
+HORAS_PICO = (6, 7, 13, 14, 15, 19, 22, 23)
+CHUNK = 50_000
+
+
+def dispositivos(tipo):
+    return [f"tablet-{tipo}-{s[:3].lower()}-{i:02d}" for s in SEDES for i in range(1, 4)]
+
+
+def filas(rows, months, seed):
+    rnd = random.Random(seed)
+    fin = datetime.utcnow().replace(microsecond=0)
+    inicio = fin - timedelta(days=30 * months)
+    span = int((fin - inicio).total_seconds())
+    califs = [c for c, _ in CALIFS]
+    pesos = [w for _, w in CALIFS]
+    disp = {t: dispositivos(t) for t in MOTIVOS}
+    for i in range(rows):
+        # Orden cronológico (como en producción) con hora ajustada hacia los picos
+        ts = inicio + timedelta(seconds=span * i // rows)
+        if rnd.random() < 0.7:
+            hora_utc = (rnd.choice(HORAS_PICO) + 6) % 24
+            ts = ts.replace(hour=hora_utc, minute=rnd.randrange(60))
+        tipo = "comedor" if rnd.random() < 0.6 else "transporte"
+        d = rnd.choice(disp[tipo])
+        sede = SEDES[[s[:3].lower() for s in SEDES].index(d.split("-")[2])]
+        calif = rnd.choices(califs, pesos)[0]
+        motivo = rnd.choice(MOTIVOS[tipo]["pos" if calif in ("Excelente", "Bueno") else "neg"])
+        empleado = comentario = ""
+        meta = {}
+        if motivo == "Otro":
+            empleado = str(rnd.randint(10000, 99999))
+            comentario = rnd.choice(COMENTARIOS)
+            meta = {"otro": {"empleado": empleado, "comentario": comentario}}
+        created_at = ts.isoformat() + "Z"
+        yield (created_at, created_at[:10], sede, d, calif, motivo, json.dumps(meta), tipo,
+               None, empleado, comentario)
+
+
+def generar(path, rows, months=12, seed=42):
+    """Crea el esquema con init_db() y añade `rows` filas. Devuelve segundos empleados."""
+    os.environ["SQLITE_PATH"] = path
+    os.environ.pop("DATABASE_URL", None)
+    sys.path.insert(0, ROOT)
+    import app
+
+    app.init_db()
+    cols = ", ".join(app.DATOS_COLS)
+    marks = ", ".join("?" for _ in app.DATOS_COLS)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=OFF")
+    t0 = time.perf_counter()
+
+    def insertar(lote):
+        # Texto -> claves de dimensión (respuestas es una vista sobre respuestas_datos)
+        lote = app.filas_datos(con, [dict(zip(app.INSERT_COLS, f)) for f in lote])
+        con.executemany(f"INSERT INTO respuestas_datos ({cols}) VALUES ({marks})", lote)
+
+    lote = []
+    for fila in filas(rows, months, seed):
+        lote.append(fila)
+        if len(lote) >= CHUNK:
+            insertar(lote)
+            con.commit()
+            lote.clear()
+    if lote:
+        insertar(lote)
+    # El rollup se mantiene en insert_respuestas; aquí se inserta en crudo y se reconstruye
+    app.rebuild_rollup(con)
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", default=None, help="ruta del SQLite (por defecto, temporal)")
+    a = ap.parse_args()
+    path = a.db or os.path.join(tempfile.mkdtemp(prefix="bench_"), "bench.db")
+    seg = generar(path, a.rows, a.months, a.seed)
+    print(f"{a.rows} filas en {seg:.1f}s ({a.rows / seg:.0f} filas/s) -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import threading
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# Orden de las columnas (y de las filas que recibe ColumnStore.agregar).
+# sede/dispositivo/motivo/tipo: claves de dimensión (0 = NULL);
+# calificacion: índice en CALIFICACIONES (len = otra).
+COLUMNAS = (("id", "int64"), ("epoch", "int64"), ("sede", "uint16"), ("dispositivo", "uint16"),
+            ("motivo", "uint16"), ("tipo", "uint8"), ("calificacion", "int8"))
+# contar(): hasta este número de combinaciones posibles se cuenta con bincount
+CONTAR_DENSO_MAX = 1 << 22
+BYTES_FILA = sum(np.dtype(t).itemsize for _, t in COLUMNAS) if np is not None else 0
+
+
+# ---------- Caché columnar ----------
+class ColumnStore:
+    """
+    Respuestas en arreglos numpy por columna (≈24 bytes por fila), para filtrar y
+    contar sin ir a la BD. Crece por duplicación hasta `max_bytes`; al pasarse se
+    libera y queda "desbordada" (las consultas vuelven a SQL).
+    - hw: todos los ids <= hw ya están cargados; los ids mayores ya vistos se
+      guardan aparte para no duplicarlos al sincronizar.
+    - snapshot(): vistas [:n] consistentes; agregar() nunca modifica filas ya visibles.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.estado = "vacia"      # vacia | cargando | lista | desbordada | error
+        self.motivo = None
+        self.hw = 0
+        self.sincronizado = 0.0    # time.monotonic() de la última sincronización
+        self.version = None        # versión de datos de la última sincronización
+        self.generacion = 0        # generación de datos con la que se cargó
+        self._cols = {}
+        self._n = 0
+        self._recientes = set()
+        self._lock = threading.Lock()
+
+    def iniciar_carga(self):
+        with self._lock:
+            self.estado, self.motivo = "cargando", None
+            self._cols, self._n, self.hw, self._recientes = {}, 0, 0, set()
+
+    def terminar_carga(self):
+        with self._lock:
+            if self.estado == "cargando":
+                self.estado = "lista"
+
+    def fallar(self, estado, motivo):
+        with self._lock:
+            self.estado, self.motivo = estado, motivo
+            self._cols, self._n, self._recientes = {}, 0, set()
+
+    def agregar(self, filas, corte=None):
+        """
+        filas: matriz int64 (n, len(COLUMNAS)). Descarta ids ya cargados.
+        Con `corte` (epoch) avanza hw hasta el mayor id con epoch <= corte
+        (filas asentadas: ningún id menor puede aparecer después).
+        """
+        if len(filas) == 0:
+            return 0
+        with self._lock:
+            if self.estado not in ("cargando", "lista"):
+                return 0
+            ids, epochs = filas[:, 0], filas[:, 1]
+            nuevas = ids > self.hw
+            if self._recientes:
+                nuevas &= ~np.isin(ids, np.fromiter(self._recientes, np.int64))
+            filas = filas[nuevas]
+            k = len(filas)
+            if k:
+                for j, (nombre, tipo) in enumerate(COLUMNAS):
+                    info = np.iinfo(tipo)
+                    if filas[:, j].min() < info.min or filas[:, j].max() > info.max:
+                        self._desbordar(f"{nombre} fuera de rango de {tipo}")
+                        return 0
+                if not self._reservar(self._n + k):
+                    return 0
+                for j, (nombre, _) in enumerate(COLUMNAS):
+                    self._cols[nombre][self._n:self._n + k] = filas[:, j]
+                self._recientes.update(filas[:, 0].tolist())
+                self._n += k
+            if corte is not None:
+                asentadas = ids[epochs <= corte]
+                if asentadas.size and asentadas.max() > self.hw:
+                    self.hw = int(asentadas.max())
+                    self._recientes = {i for i in self._recientes if i > self.hw}
+            return k
+
+    def _reservar(self, n):
+        cap = len(self._cols["id"]) if self._cols else 0
+        if n <= cap:
+            return True
+        nueva = max(n, cap * 2, 1024)
+        if nueva * BYTES_FILA > self.max_bytes:
+            nueva = self.max_bytes // BYTES_FILA
+            if nueva < n:
+                self._desbordar(f"más de {self.max_bytes // (1024 * 1024)} MB")
+                return False
+        cols = {}
+        for nombre, tipo in COLUMNAS:
+            arr = np.zeros(nueva, dtype=tipo)
+            if cap:
+                arr[:self._n] = self._cols[nombre][:self._n]
+            cols[nombre] = arr
+        # Los snapshots previos siguen apuntando a los arreglos viejos (válidos)
+        self._cols = cols
+        return True
+
+    def _desbordar(self, motivo):
+        self.estado, self.motivo = "desbordada", motivo
+        self._cols, self._n, self._recientes = {}, 0, set()
+
+    def snapshot(self):
+        with self._lock:
+            if self.estado != "lista":
+                return None
+            return {nombre: arr[:self._n] for nombre, arr in self._cols.items()}
+
+    def stats(self):
+        with self._lock:
+            cap = len(self._cols["id"]) if self._cols else 0
+            return {"estado": self.estado, "motivo": self.motivo, "filas": self._n, "hw": self.hw,
+                    "bytes": cap * BYTES_FILA, "max_bytes": self.max_bytes}
+
+
+# ---------- Filtros y conteos vectorizados ----------
+def mascara(snap, desde=None, hasta=None, tipos=None, sedes=None, dispositivos=None):
+    """Filas con desde <= epoch <= hasta y códigos en las listas dadas (None = sin filtro)."""
+    m = np.ones(len(snap["id"]), dtype=bool)
+    if desde is not None:
+        m &= snap["epoch"] >= desde
+    if hasta is not None:
+        m &= snap["epoch"] <= hasta
+    for col, codigos in (("tipo", tipos), ("sede", sedes), ("dispositivo", dispositivos)):
+        if codigos is not None:
+            m &= np.isin(snap[col], np.asarray(codigos, dtype=np.int64))
+    return m
+
+
+def hora_local(epoch, tz):
+    """
+    epoch UTC -> (día local en días desde 1970, minuto del día local). El offset se
+    calcula una vez por hora UTC del rango, no por fila.
+    """
+    if len(epoch) == 0:
+        return epoch.copy(), epoch.copy()
+    horas = epoch // 3600
+    h0, h1 = int(horas.min()), int(horas.max())
+    offsets = np.fromiter(
+        (tz.utcoffset(datetime.fromtimestamp(h * 3600, timezone.utc)).total_seconds() for h in range(h0, h1 + 1)),
+        dtype=np.int64, count=h1 - h0 + 1,
+    )
+    local = epoch + offsets[horas - h0]
+    return local // 86400, (local % 86400) // 60
+
+
+def minutos_en(predicado):
+    """Tabla booleana de los 1440 minutos del día (para filtrar turnos con un índice)."""
+    return np.fromiter((predicado(m) for m in range(1440)), dtype=bool, count=1440)
+
+
+def contar(*claves):
+    """
+    GROUP BY vectorizado sobre arreglos de códigos enteros >= 0 (misma longitud).
+    Devuelve [(código1, código2, ..., n)] solo de las combinaciones presentes.
+    """
+    if not len(claves[0]):
+        return []
+    claves = [c.astype(np.int64) for c in claves]
+    tamanos = [int(c.max()) + 1 for c in claves]
+    plano = np.ravel_multi_index(claves, tamanos)
+    if np.prod(tamanos, dtype=np.float64) <= CONTAR_DENSO_MAX:
+        conteos = np.bincount(plano)
+        presentes = np.flatnonzero(conteos)
+        conteos = conteos[presentes]
+    else:
+        presentes, conteos = np.unique(plano, return_counts=True)
+    combos = np.unravel_index(presentes, tamanos)
+    return list(zip(*(c.tolist() for c in combos), conteos.tolist()))
@@ -0,0 +1,211 @@
+import os
+import time
+import threading
+
+
+# ---------- Pools de conexiones ----------
+class PoolTimeout(RuntimeError):
+    """No hubo conexión libre dentro del tiempo de espera."""
+
+
+class SQLitePool:
+    """
+    Una conexión SQLite por hilo (gthread reutiliza sus hilos).
+    Los PRAGMAs se ejecutan una sola vez al abrir cada conexión.
+    """
+
+    def __init__(self, connect, healthcheck_idle=60.0):
+        self._connect = connect
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._healthcheck_idle = healthcheck_idle
+        self._stats = {"created": 0, "checkouts": 0, "recycled": 0, "healthcheck_failed": 0}
+        self._open = 0
+
+    def _new(self):
+        con = self._connect()
+        with self._lock:
+            self._stats["created"] += 1
+            self._open += 1
+        return con
+
+    def _discard(self, con):
+        try:
+            con.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats["recycled"] += 1
+            self._open -= 1
+        self._local.con = None
+
+    def getconn(self):
+        con = getattr(self._local, "con", None)
+        if con is not None and time.monotonic() - self._local.last_used > self._healthcheck_idle:
+            try:
+                con.execute("SELECT 1").fetchone()
+            except Exception:
+                with self._lock:
+                    self._stats["healthcheck_failed"] += 1
+                self._discard(con)
+                con = None
+        if con is None:
+            con = self._local.con = self._new()
+            self._local.last_used = time.monotonic()
+        with self._lock:
+            self._stats["checkouts"] += 1
+        return con
+
+    def putconn(self, con, broken=False):
+        if broken:
+            self._discard(con)
+            return
+        try:
+            if con.in_transaction:
+                con.rollback()
+        except Exception:
+            self._discard(con)
+            return
+        self._local.last_used = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {"kind": "sqlite-per-thread", "open": self._open, **self._stats}
+
+
+class PostgresPool:
+    """
+    Pool acotado para psycopg2: [minconn, maxconn] conexiones.
+    - Checkout espera hasta `timeout` segundos si el pool está lleno.
+    - Health check (SELECT 1) si la conexión estuvo ociosa más de `healthcheck_idle`.
+    - Conexiones rotas o con error de conexión se descartan y se reemplazan.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=5, timeout=10.0, healthcheck_idle=30.0):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError("rango de pool inválido")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._healthcheck_idle = healthcheck_idle
+        self._cond = threading.Condition()
+        self._idle = []        # [(con, last_used)]
+        self._in_use = 0
+        self._size = 0
+        self._stats = {
+            "created": 0, "checkouts": 0, "waits": 0, "timeouts": 0,
+            "recycled": 0, "healthcheck_failed": 0,
+        }
+        for _ in range(minconn):
+            try:
+                self._idle.append((self._new(), time.monotonic()))
+            except Exception:
+                break
+
+    def _new(self):
+        con = self._connect()
+        self._size += 1
+        self._stats["created"] += 1
+        return con
+
+    def _close(self, con):
+        try:
+            con.close()
+        except Exception:
+            pass
+        self._size -= 1
+        self._stats["recycled"] += 1
+
+    def _healthy(self, con, last_used):
+        if con.closed:
+            return False
+        if time.monotonic() - last_used <= self._healthcheck_idle:
+            return True
+        try:
+            with con.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            con.rollback()
+            return True
+        except Exception:
+            self._stats["healthcheck_failed"] += 1
+            return False
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                while self._idle:
+                    con, last_used = self._idle.pop()
+                    if self._healthy(con, last_used):
+                        self._in_use += 1
+                        self._stats["checkouts"] += 1
+                        return con
+                    self._close(con)
+                if self._size < self.maxconn:
+                    # Reserva el cupo y conecta fuera del lock (handshake TLS lento)
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"sin conexiones libres tras {self.timeout}s")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+        try:
+            con = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+            self._stats["checkouts"] += 1
+            self._in_use += 1
+        return con
+
+    def putconn(self, con, broken=False):
+        if not broken and not con.closed:
+            try:
+                con.rollback()
+                con.autocommit = False
+            except Exception:
+                broken = True
+        with self._cond:
+            self._in_use -= 1
+            if broken or con.closed:
+                self._close(con)
+            else:
+                self._idle.append((con, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                con, _ = self._idle.pop()
+                self._close(con)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "kind": "postgres-bounded",
+                "min": self.minconn, "max": self.maxconn,
+                "size": self._size, "in_use": self._in_use, "idle": len(self._idle),
+                **self._stats,
+            }
+
+
+def env_int(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def env_float(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
@@ -0,0 +1,48 @@
+import threading
+
+
+# ---------- Diccionario de dimensiones ----------
+class Diccionario:
+    """
+    Caché en proceso valor -> id de las tablas de dimensión (sede, dispositivo,
+    calificación, motivo, tipo). Solo guarda ids ya confirmados en la BD, así que
+    sobrevive a un rollback y se puede compartir entre hilos y workers (tras fork).
+    None no se busca: es NULL en la columna id_*.
+    """
+
+    def __init__(self):
+        self._ids = {}     # columna -> {valor: id}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def buscar(self, columna, valores):
+        """-> ({valor: id} de lo conocido, set de valores que faltan)."""
+        conocidos = self._ids.get(columna, {})
+        ids, faltan = {}, set()
+        for v in valores:
+            if v is None:
+                ids[v] = None
+            elif v in conocidos:
+                ids[v] = conocidos[v]
+            else:
+                faltan.add(v)
+        with self._lock:
+            self._stats["hits"] += len(ids)
+            self._stats["misses"] += len(faltan)
+        return ids, faltan
+
+    def agregar(self, columna, ids):
+        """Registra pares valor -> id confirmados (commit hecho)."""
+        with self._lock:
+            actual = dict(self._ids.get(columna, {}))
+            actual.update((v, i) for v, i in ids.items() if v is not None and i is not None)
+            # Se reemplaza el dict completo: los lectores no toman el lock
+            self._ids[columna] = actual
+
+    def valores(self, columna):
+        """{id: valor} de lo conocido (traducción inversa)."""
+        return {i: v for v, i in self._ids.get(columna, {}).items()}
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, **{f"valores_{c}": len(v) for c, v in self._ids.items()}}
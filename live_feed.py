@@ -0,0 +1,105 @@
+import threading
+from collections import deque
+
+
+# ---------- Difusión en vivo (SSE) ----------
+class FeedFull(RuntimeError):
+    """Se alcanzó el máximo de suscriptores del proceso."""
+
+
+class Subscriber:
+    """
+    Buffer acotado de un cliente. Si se llena (consumidor lento) se marca como
+    descartado: el stream se cierra y el navegador reconecta con Last-Event-ID.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self.events = deque()
+        self.dropped = False
+        self.cond = threading.Condition()
+
+    def offer(self, events):
+        with self.cond:
+            if self.dropped:
+                return False
+            if len(self.events) + len(events) > self.maxlen:
+                self.dropped = True
+                self.events.clear()
+            else:
+                self.events.extend(events)
+            self.cond.notify()
+            return not self.dropped
+
+    def wait(self, timeout):
+        """Eventos pendientes ([] si venció el timeout) o None si fue descartado."""
+        with self.cond:
+            if not self.events and not self.dropped:
+                self.cond.wait(timeout)
+            if self.dropped:
+                return None
+            out = list(self.events)
+            self.events.clear()
+            return out
+
+
+class Broadcaster:
+    """
+    Fan-out en memoria, uno por worker: publish() copia los eventos al buffer de
+    cada suscriptor sin tocar la BD. Un mismo evento puede llegar dos veces (lo
+    escribió este worker y además se leyó de la BD al seguir a los demás): se
+    recuerdan los últimos `recordar` ids y los repetidos se descartan.
+    """
+
+    def __init__(self, max_subscribers=50, buffer=256, recordar=10000):
+        self.max_subscribers = max_subscribers
+        self.buffer = buffer
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._ids = deque(maxlen=recordar)
+        self._vistos = set()
+        self._stats = {"published": 0, "duplicates": 0, "subscribed": 0, "dropped": 0, "rejected": 0}
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                self._stats["rejected"] += 1
+                raise FeedFull(f"maximo {self.max_subscribers} suscriptores")
+            sub = Subscriber(self.buffer)
+            self._subs.add(sub)
+            self._stats["subscribed"] += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def suscriptores(self):
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, events):
+        with self._lock:
+            nuevos = [e for e in events if e["id"] not in self._vistos]
+            self._stats["duplicates"] += len(events) - len(nuevos)
+            for e in nuevos:
+                if len(self._ids) == self._ids.maxlen:
+                    self._vistos.discard(self._ids[0])
+                self._ids.append(e["id"])
+                self._vistos.add(e["id"])
+            self._stats["published"] += len(nuevos)
+            subs = list(self._subs)
+        events = nuevos
+        if not events:
+            return
+        for sub in subs:
+            if not sub.offer(events):
+                with self._lock:
+                    if sub in self._subs:
+                        self._subs.discard(sub)
+                        self._stats["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subs), "max_subscribers": self.max_subscribers,
+                    "buffer": self.buffer, **self._stats}
@@ -0,0 +1,158 @@
+import re
+import time
+import threading
+from collections import deque
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+# ---------- Métricas (formato texto de Prometheus) ----------
+class Counter:
+    def __init__(self, name, help_, labels=()):
+        self.name, self.help, self.labels = name, help_, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        out += [f"{self.name}{_labels(self.labels, k)} {_num(v)}" for k, v in items]
+        return out
+
+
+class Histogram:
+    def __init__(self, name, help_, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # labels -> [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                v = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+                    break
+            v[-2] += value
+            v[-1] += 1
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        names = self.labels + ("le",)
+        for k, v in items:
+            acc = 0
+            for b, n in zip(self.buckets, v):
+                acc += n
+                out.append(f"{self.name}_bucket{_labels(names, k + (_num(b),))} {acc}")
+            out.append(f"{self.name}_bucket{_labels(names, k + ('+Inf',))} {v[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labels, k)} {_num(round(v[-2], 6))}")
+            out.append(f"{self.name}_count{_labels(self.labels, k)} {v[-1]}")
+        return out
+
+
+class SlowQueryLog:
+    """Últimas consultas lentas: SQL normalizado y forma de los argumentos (tipos, sin valores)."""
+
+    def __init__(self, threshold_ms=200.0, maxlen=100):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shape(args):
+        return [type(a).__name__ for a in (args or ())]
+
+    def record(self, route, op, sql, args, seconds, rows=None):
+        ms = seconds * 1000
+        if ms < self.threshold_ms:
+            return False
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "route": route,
+            "op": op,
+            "ms": round(ms, 1),
+            "rows": rows,
+            "sql": re.sub(r"\s+", " ", sql).strip()[:500],
+            "args": self.shape(args),
+        }
+        with self._lock:
+            self._entries.append(entry)
+        return True
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+
+class Metrics:
+    """
+    Registro del proceso. Las métricas de BD se etiquetan con la ruta de la petición
+    en curso (o "-" fuera de una petición). Los gauges (y contadores de otros módulos)
+    se leen al renderizar.
+    """
+
+    def __init__(self, slow_query_ms=200.0):
+        self.requests = Histogram("http_request_duration_seconds", "Latencia por ruta",
+                                  ("route", "method", "status"))
+        self.response_bytes = Counter("http_response_bytes_total", "Bytes de respuesta (no streaming)",
+                                      ("route", "method"))
+        self.db = Histogram("db_operation_duration_seconds",
+                            "Tiempo de BD por operación (connect, checkout, query, stream, write)",
+                            ("route", "op"))
+        self.rows = Counter("db_rows_returned_total", "Filas leídas de la BD", ("route",))
+        self.slow = Counter("db_slow_queries_total", "Consultas sobre el umbral de lentitud", ("route", "op"))
+        self.slow_log = SlowQueryLog(slow_query_ms)
+        self._gauges = []
+
+    def gauges(self, fn):
+        """fn() -> [(nombre, ayuda, valor[, tipo])] con tipo "gauge" (default) o "counter"; se evalúa en cada render."""
+        self._gauges.append(fn)
+        return fn
+
+    def observe_db(self, route, op, seconds, sql=None, args=None, rows=None):
+        self.db.observe(seconds, route, op)
+        if rows:
+            self.rows.inc(route, value=rows)
+        if sql is not None and self.slow_log.record(route, op, sql, args, seconds, rows):
+            self.slow.inc(route, op)
+            return True
+        return False
+
+    def render(self):
+        out = []
+        for m in (self.requests, self.response_bytes, self.db, self.rows, self.slow):
+            out += m.render()
+        for fn in self._gauges:
+            try:
+                valores = fn()
+            except Exception:
+                continue
+            for name, help_, value, *tipo in valores:
+                out += [f"# HELP {name} {help_}", f"# TYPE {name} {tipo[0] if tipo else 'gauge'}", f"{name} {_num(value)}"]
+        return "\n".join(out) + "\n"
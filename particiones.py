@@ -0,0 +1,61 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+
+MES_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+# ---------- Meses (claves de partición 'YYYY-MM', en UTC como created_at) ----------
+def mes_de(valor):
+    """'YYYY-MM-DD...' -> 'YYYY-MM'."""
+    return valor[:7]
+
+
+def sumar(mes, n):
+    """Mes desplazado n meses (n negativo hacia atrás)."""
+    total = int(mes[:4]) * 12 + int(mes[5:7]) - 1 + n
+    return f"{total // 12:04d}-{total % 12 + 1:02d}"
+
+
+def inicio(mes):
+    """Límite inferior del mes comparable con created_at y dia ('YYYY-MM-01')."""
+    return mes + "-01"
+
+
+def tabla(mes):
+    return "respuestas_datos_" + mes.replace("-", "_")
+
+
+# ---------- Archivo comprimido de meses cerrados ----------
+def escribir_archivo(path, filas):
+    """
+    Escribe dicts como NDJSON gzip en `path` (vía archivo temporal + fsync + rename,
+    así un archivo a medias nunca queda con el nombre final).
+    Devuelve (filas, bytes, sha256 del archivo comprimido).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    n = 0
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as gz:
+            for fila in filas:
+                gz.write((json.dumps(fila, ensure_ascii=False) + "\n").encode("utf-8"))
+                n += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return n, os.path.getsize(path), h.hexdigest()
+
+
+def leer_archivo(path):
+    """Genera los dicts de un archivo NDJSON gzip sin descomprimirlo entero."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                yield json.loads(linea)
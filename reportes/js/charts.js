@@ -19,10 +19,21 @@ function localDateKeyFromISO(isoUtc, timeZone) {
 
 // ==================== Gráficas existentes ====================
 export function renderCharts(dataFiltered){
-  // --- Ratings ---
   const counts = {Excelente:0, Bueno:0, Regular:0, Malo:0};
   for (const r of dataFiltered){ if(counts[r.calificacion]!=null) counts[r.calificacion]++; }
 
+  const byDay = {};
+  for (const r of dataFiltered){
+    const d = (r.created_at||"").slice(0,10);
+    byDay[d] = byDay[d] || {Excelente:0,Bueno:0,Regular:0,Malo:0};
+    byDay[d][r.calificacion] = (byDay[d][r.calificacion]||0) + 1;
+  }
+  renderRatingsChart(counts);
+  renderDailyChart(Object.keys(byDay).sort(), byDay);
+}
+
+// --- Ratings --- counts = {Excelente, Bueno, Regular, Malo}
+export function renderRatingsChart(counts){
   const ratingsCanvas = document.getElementById("chartRatings");
   const old1 = Chart.getChart(ratingsCanvas);
   if (old1) old1.destroy();
@@ -59,15 +70,10 @@ export function renderCharts(dataFiltered){
       }
     }
   });
+}
 
-  // --- Daily stacked ---
-  const byDay = {};
-  for (const r of dataFiltered){
-    const d = (r.created_at||"").slice(0,10);
-    byDay[d] = byDay[d] || {Excelente:0,Bueno:0,Regular:0,Malo:0};
-    byDay[d][r.calificacion] = (byDay[d][r.calificacion]||0) + 1;
-  }
-  const days = Object.keys(byDay).sort();
+// --- Daily stacked --- days ordenados, byDay = { 'YYYY-MM-DD': {Excelente:n, ...} }
+export function renderDailyChart(days, byDay){
   const dsEx = days.map(d=>byDay[d].Excelente||0);
   const dsBu = days.map(d=>byDay[d].Bueno||0);
   const dsRe = days.map(d=>byDay[d].Regular||0);
@@ -113,9 +119,6 @@ export function renderCharts(dataFiltered){
 
 // ==================== NUEVO: Tendencia por día (LOCAL) ====================
 export function renderTrendDailyLocal(dataFiltered, timeZone){
-  const califs = ["Excelente","Bueno","Regular","Malo"];
-  const color = { Excelente:"#27ae60", Bueno:"#2d9cdb", Regular:"#f2c94c", Malo:"#eb5757" };
-
   // Agrupar por día LOCAL
   const byLocalDay = {}; // { 'YYYY-MM-DD': {Excelente:n, ...} }
   for (const r of dataFiltered){
@@ -126,7 +129,12 @@ export function renderTrendDailyLocal(dataFiltered, timeZone){
       byLocalDay[key][r.calificacion]++;
     }
   }
-  const days = Object.keys(byLocalDay).sort();
+  renderTrendChart(Object.keys(byLocalDay).sort(), byLocalDay);
+}
+
+export function renderTrendChart(days, byLocalDay){
+  const califs = ["Excelente","Bueno","Regular","Malo"];
+  const color = { Excelente:"#27ae60", Bueno:"#2d9cdb", Regular:"#f2c94c", Malo:"#eb5757" };
 
   const datasets = califs.map(c => ({
     label: c,
@@ -194,7 +202,11 @@ export function renderComparativaSatisfaccion(dataFiltered){
   }
   function normalizeTipo(v){ const s=(""+v).toLowerCase(); if (s.includes("trans")) return "transporte"; if (s.includes("comedor")) return "comedor"; return s; }
 
-  const c = tipos.map(t => satCounts(t));
+  renderComparativaChart(tipos.map(t => satCounts(t)));
+}
+
+// c = [{pos, neg} comedor, {pos, neg} transporte]
+export function renderComparativaChart(c){
   const labels = ["Comedor","Transporte"];
   const dataPos = [c[0].pos, c[1].pos];
   const dataNeg = [c[0].neg, c[1].neg];
@@ -246,9 +258,13 @@ export function renderTopMotivosNegativos(dataFiltered){
     }
   }
   const top = Object.entries(freq)
-    .sort((a,b)=> b[1]-a[1])
+    .sort((a,b)=> b[1]-a[1] || (a[0] < b[0] ? -1 : a[0] > b[0] ? 1 : 0))
     .slice(0,5);
+  renderTopNegChart(top);
+}
 
+// top = [[motivo, n], ...] ya ordenado
+export function renderTopNegChart(top){
   const labels = top.map(([m]) => m);
   const values = top.map(([,n]) => n);
 
@@ -1,6 +1,7 @@
 // PR/reportes/js/reportes.js
 import { getInputValues, fmt, downloadCSV, inferTipo, formatLocal, localDayStart, localDayEnd, TIME_ZONE, SHIFT_DEFS, isDateInShiftLocal } from "./utils.js";
-import { renderCharts, renderComparativaSatisfaccion, renderTopMotivosNegativos, renderTrendDailyLocal } from "./charts.js";
+import { renderCharts, renderComparativaSatisfaccion, renderTopMotivosNegativos, renderTrendDailyLocal,
+         renderRatingsChart, renderDailyChart, renderTrendChart, renderComparativaChart, renderTopNegChart } from "./charts.js";
 
 const cfg = window.APP_CONFIG;
 const FILTER_KEY = "reportes_filters_v3";
@@ -71,32 +72,98 @@ function persistFilters(){
 }
 
 // ==== auto refresh controlado ====
+// Con EventSource se escucha /api/stream: las filas nuevas llegan empujadas y se fusionan
+// en dataAll sin consultar la BD. Sin soporte (o si el endpoint no existe) se hace polling.
+let live = null;
+let liveRender = null;
 function setAutoTimer(enabled){
   if (timer){ clearInterval(timer); timer = null; }
-  if (enabled){ timer = setInterval(fetchData, cfg.autoRefreshMs); }
+  if (live){ live.close(); live = null; }
+  if (!enabled) return;
+  if (window.EventSource){ openLive(); return; }
+  timer = setInterval(fetchData, cfg.autoRefreshMs);
+}
+
+function openLive(){
+  const { api } = getInputValues();
+  const qs = new URLSearchParams();
+  if (rowsKey && highWater != null) qs.set("last_id", highWater);
+  const es = live = new EventSource(`${api}/api/stream${qs.toString() ? `?${qs.toString()}` : ""}`);
+  es.addEventListener("respuesta", (ev) => {
+    // Con filtros de texto el evento no se puede evaluar aquí: se pide el delta filtrado
+    if (!usesServerPaging() && rowsLoaded && rowsKey && !hasTextFilters()){
+      const r = JSON.parse(ev.data);
+      dataAll = [r].concat(dataAll.filter(x => x.id !== r.id));
+    }
+    // Ráfagas de envíos (colas offline) -> un solo render
+    clearTimeout(liveRender);
+    liveRender = setTimeout(() => usesServerPaging() || hasTextFilters() ? fetchData() : applyFilters(), 500);
+  });
+  es.addEventListener("error", () => {
+    // CLOSED: el servidor rechazó el stream (404/503); se vuelve al polling
+    if (es.readyState === EventSource.CLOSED && live === es){
+      live = null;
+      timer = setInterval(fetchData, cfg.autoRefreshMs);
+    }
+  });
 }
 
 // ==== fetch ====
-async function fetchData(){
-  const { api, tipo, desde: dStr, hasta: hStr } = getInputValues();
+// cache:"no-cache" revalida con If-None-Match: si no hay datos nuevos el servidor responde 304 sin cuerpo.
+// Las filas solo se descargan si hay filtro de turno (el único que el servidor no pagina);
+// sede/dispositivo/texto/empleado/comentario se mandan al servidor también en ese caso.
+// Tras la carga completa, los refrescos piden solo filas nuevas (since=X-High-Water) y se fusionan.
+let rowsLoaded = false;
+let rowsKey = null;     // api + filtros de servidor con los que se cargó dataAll
+let highWater = null;   // since de la siguiente petición delta
+async function fetchData(opts = {}){
+  if (usesServerPaging()){
+    dataAll = [];
+    rowsLoaded = false;
+    rowsKey = null;
+    applyFilters();
+    return;
+  }
+  const { api } = getInputValues();
+  const qs = serverQuery();
+  const key = `${api}?${qs.toString()}`;
+  const delta = !opts.full && rowsLoaded && rowsKey === key && highWater != null;
   estado.textContent = "Cargando...";
   try{
-    const qs = new URLSearchParams();
-    if (tipo) qs.set("tipo", tipo);
-    if (dStr) qs.set("desde", dStr);
-    if (hStr) qs.set("hasta", hStr);
-
-    const url = `${api}/api/respuestas${qs.toString() ? `?${qs.toString()}` : ""}`;
-    const res = await fetch(url, { cache: "no-store" });
-    if(!res.ok) throw new Error(res.status);
-    dataAll = await res.json();
-
+    if (delta){
+      await fetchDelta(api, qs);
+    }else{
+      const url = `${api}/api/respuestas${qs.toString() ? `?${qs.toString()}` : ""}`;
+      const res = await fetch(url, { cache: "no-cache" });
+      if(!res.ok) throw new Error(res.status);
+      dataAll = await res.json();
+      highWater = res.headers.get("X-High-Water");
+      rowsKey = key;
+    }
     estado.textContent = "OK";
-    applyFilters();
   }catch(e){
     estado.textContent = "Error: " + e.message;
-    dataAll = [];
-    applyFilters();
+    // rowsKey se conserva para no reintentar en bucle desde applyFilters
+    if (!delta){ dataAll = []; rowsKey = key; highWater = null; }
+  }
+  rowsLoaded = true;
+  applyFilters();
+}
+
+async function fetchDelta(api, qs){
+  for (;;){
+    const dq = new URLSearchParams(qs);
+    dq.set("since", highWater);
+    const res = await fetch(`${api}/api/respuestas?${dq.toString()}`, { cache: "no-cache" });
+    if (!res.ok) throw new Error(res.status);
+    const nuevos = await res.json();   // id ascendente
+    if (nuevos.length){
+      const ids = new Set(nuevos.map(r => r.id));
+      dataAll = nuevos.reverse().concat(dataAll.filter(r => !ids.has(r.id)));
+    }
+    const prev = highWater;
+    highWater = res.headers.get("X-High-Water") || highWater;
+    if (res.headers.get("X-More") !== "1" || highWater === prev) break;
   }
 }
 
@@ -108,8 +175,15 @@ function safeMeta(r){
   }catch{return {};}
 }
 
+function rowsQueryKey(){
+  const { api } = getInputValues();
+  return `${api}?${serverQuery().toString()}`;
+}
+
+// Tipo, fechas y turno se aplican aquí; los filtros de texto ya vienen aplicados por el servidor.
 function applyFilters(){
-  const { tipo, desde: dStr, hasta: hStr, turno, sede, disp, texto, empleado, metaTexto } = getInputValues();
+  if (!usesServerPaging() && (!rowsLoaded || rowsKey !== rowsQueryKey())){ fetchData(); return; }
+  const { tipo, desde: dStr, hasta: hStr, turno } = getInputValues();
 
   const d0 = localDayStart(dStr);
   const d1 = localDayEnd(hStr);
@@ -130,28 +204,42 @@ function applyFilters(){
       const rt = inferTipo(r);
       if (rt !== tipo) return false;
     }
-    if (sede && (r.sede||"").toLowerCase().indexOf(sede) === -1) return false;
-    if (disp && (r.dispositivo_id||"").toLowerCase().indexOf(disp) === -1) return false;
-
-    const meta = safeMeta(r);
-    const empVal = String(meta?.otro?.empleado ?? "").toLowerCase();
-    const comVal = String(meta?.otro?.comentario ?? "").toLowerCase();
-
-    // Filtro general de texto (ahora incluye comentario)
-    if (texto){
-      const blob = `${r.calificacion||""} ${r.motivo||""} ${empVal} ${comVal}`.toLowerCase();
-      if (blob.indexOf(texto) === -1) return false;
-    }
-
-    // Filtros NUEVOS
-    if (empleado && empVal.indexOf(empleado) === -1) return false;
-    if (metaTexto && comVal.indexOf(metaTexto) === -1) return false;
-
     return true;
   });
 
   page = 1;
-  renderAll();
+  pageCursors = [null];
+  fetchServerAggregates().then(renderAll);
+}
+
+// ==== agregados en servidor (día local / turno) ====
+// KPIs y gráficas salen de /api/agregados y /api/kpis (unos cientos de bytes) en lugar de
+// recorrer dataFiltered; si fallan se calculan con las filas cargadas.
+let agg = null;
+let kpis = null;
+let aggSeq = 0;
+
+async function fetchServerAggregates(){
+  const { api, tipo, desde: dStr, hasta: hStr, turno } = getInputValues();
+  const seq = ++aggSeq;
+  const qs = new URLSearchParams({ tz: TIME_ZONE });
+  if (tipo) qs.set("tipo", tipo);
+  if (dStr) qs.set("desde", dStr);
+  if (hStr) qs.set("hasta", hStr);
+  if (turno) qs.set("turno", turno);
+  setTextFilters(qs);
+  try{
+    const [ra, rk] = await Promise.all([
+      fetch(`${api}/api/agregados?${qs.toString()}`, { cache: "no-cache" }),
+      fetch(`${api}/api/kpis?${qs.toString()}`, { cache: "no-cache" }),
+    ]);
+    if (!ra.ok) throw new Error(ra.status);
+    if (!rk.ok) throw new Error(rk.status);
+    const [a, k] = await Promise.all([ra.json(), rk.json()]);
+    if (seq === aggSeq){ agg = a; kpis = k; estado.textContent = "OK"; }
+  }catch(e){
+    if (seq === aggSeq){ agg = null; kpis = null; estado.textContent = "Error: " + e.message; }
+  }
 }
 
 function renderAll(){
@@ -159,24 +247,42 @@ function renderAll(){
 
   const c1 = Chart.getChart("chartRatings"); if (c1) c1.destroy();
   const c2 = Chart.getChart("chartDaily");   if (c2) c2.destroy();
-  renderCharts(dataFiltered);
-
-  // ⬇️ Tendencia por día LOCAL
   const ct = Chart.getChart("tendenciaChart"); if (ct) ct.destroy();
-  renderTrendDailyLocal(dataFiltered, TIME_ZONE);
-
   const c3 = Chart.getChart("chartCompare"); if (c3) c3.destroy();
   const c4 = Chart.getChart("chartTopNeg");  if (c4) c4.destroy();
-  if (document.getElementById("chartCompare"))  renderComparativaSatisfaccion(dataFiltered);
-  if (document.getElementById("chartTopNeg"))   renderTopMotivosNegativos(dataFiltered);
+
+  if (agg && kpis){
+    const days = agg.dias.map(d => d.dia);
+    const byDay = Object.fromEntries(agg.dias.map(d => [d.dia, d]));
+    renderRatingsChart(agg.total);
+    renderDailyChart(days, byDay);
+    renderTrendChart(days, byDay);
+    if (document.getElementById("chartCompare"))
+      renderComparativaChart(["comedor","transporte"].map(t => kpis.tipos[t] || { pos:0, neg:0 }));
+    if (document.getElementById("chartTopNeg"))
+      renderTopNegChart(kpis.top_motivos_negativos.map(x => [x.motivo, x.n]));
+  }else{
+    renderCharts(dataFiltered);
+    // ⬇️ Tendencia por día LOCAL
+    renderTrendDailyLocal(dataFiltered, TIME_ZONE);
+    if (document.getElementById("chartCompare"))  renderComparativaSatisfaccion(dataFiltered);
+    if (document.getElementById("chartTopNeg"))   renderTopMotivosNegativos(dataFiltered);
+  }
 
   renderTable();
 }
 
 function renderKPIs(){
-  const n = dataFiltered.length;
-  kpiTotal.textContent = fmt(n);
   kpiRango.textContent = `${desde.value || "—"} a ${hasta.value || "—"}`;
+  if (kpis){
+    kpiTotal.textContent = fmt(kpis.total.n);
+    kpiSat.textContent = kpis.pct_satisfechos + "%";
+    kpiNoSat.textContent = kpis.pct_no_satisfechos + "%";
+    kpiMotivo.textContent = kpis.top_motivo?.motivo ?? "—";
+    return;
+  }
+
+  kpiTotal.textContent = fmt(dataFiltered.length);
 
   const counts = {Excelente:0, Bueno:0, Regular:0, Malo:0};
   const motivos = {};
@@ -193,29 +299,18 @@ function renderKPIs(){
 
   let topMotivo = "—", topCount = 0;
   for (const [m, c] of Object.entries(motivos)){
-    if (c > topCount){ topCount = c; topMotivo = m; }
+    // Empate: el motivo menor, igual que /api/kpis
+    if (c > topCount || (c === topCount && m < topMotivo)){ topCount = c; topMotivo = m; }
   }
   kpiMotivo.textContent = topMotivo;
 }
 
-function renderTable(){
-  const total = dataFiltered.length;
-  const perPage = cfg.perPage;
-  const pages = Math.max(1, Math.ceil(total / perPage));
-  page = Math.min(page, pages);
-  const start = (page-1)*perPage;
-  const end = Math.min(start + perPage, total);
-
-  lblRangoTabla.textContent = total ? `${start+1}–${end}` : "0–0";
-  lblTotalTabla.textContent = fmt(total);
-  lblPagina.textContent = `Página ${page} / ${pages}`;
-
-  tbody.innerHTML = dataFiltered.slice(start, end).map(r => {
-    const tipo = inferTipo(r);
-    const meta = safeMeta(r);
-    const emp = meta?.otro?.empleado ?? "";
-    const com = meta?.otro?.comentario ?? "";
-    return `
+function rowHtml(r){
+  const tipo = inferTipo(r);
+  const meta = safeMeta(r);
+  const emp = meta?.otro?.empleado ?? "";
+  const com = meta?.otro?.comentario ?? "";
+  return `
       <tr>
         <td>${formatLocal(r.created_at)}</td>
         <td>${r.calificacion ?? ""}</td>
@@ -227,25 +322,170 @@ function renderTable(){
         <td>${com ? com.replace(/</g,"&lt;") : "-"}</td>
       </tr>
     `;
-  }).join("");
+}
 
+function renderRows(rows, start, total, pages){
+  const end = start + rows.length;
+  lblRangoTabla.textContent = total ? `${start+1}–${end}` : "0–0";
+  lblTotalTabla.textContent = fmt(total);
+  lblPagina.textContent = `Página ${page} / ${pages}`;
+  tbody.innerHTML = rows.map(rowHtml).join("");
   btnPrev.disabled = page<=1;
   btnNext.disabled = page>=pages;
 }
 
+// ==== tabla paginada en servidor (limit + cursor keyset) ====
+// Si solo hay filtros que el servidor entiende (tipo/fechas), la tabla pide una página a la vez.
+const TABLE_FIELDS = "created_at,calificacion,motivo,dispositivo_id,sede,tipo,meta";
+let pageCursors = [null];   // cursor de inicio de cada página ya visitada
+let serverTotal = 0;
+let pageSeq = 0;
+
+function usesServerPaging(){
+  return !getInputValues().turno;
+}
+
+function hasTextFilters(){
+  const { sede, disp, texto, empleado, metaTexto } = getInputValues();
+  return !!(sede || disp || texto || empleado || metaTexto);
+}
+
+// Filtros de texto -> parámetros de la API (sede/dispositivo: subcadena; empleado: prefijo;
+// q/comentario: palabras completas o prefijos, sin acentos ni mayúsculas)
+function setTextFilters(qs){
+  const { sede, disp, texto, empleado, metaTexto } = getInputValues();
+  if (sede) qs.set("sede", sede);
+  if (disp) qs.set("dispositivo", disp);
+  if (empleado) qs.set("empleado", empleado);
+  if (texto) qs.set("q", texto);
+  if (metaTexto) qs.set("comentario", metaTexto);
+  return qs;
+}
+
+function serverQuery(){
+  const { tipo, desde: dStr, hasta: hStr } = getInputValues();
+  const qs = new URLSearchParams();
+  if (tipo) qs.set("tipo", tipo);
+  if (dStr) qs.set("desde", localDayStart(dStr).toISOString());
+  if (hStr) qs.set("hasta", localDayEnd(hStr).toISOString());
+  return setTextFilters(qs);
+}
+
+async function loadServerPage(){
+  const { api } = getInputValues();
+  const seq = ++pageSeq;
+  const qs = serverQuery();
+  qs.set("limit", cfg.perPage);
+  qs.set("fields", TABLE_FIELDS);
+  const cursor = pageCursors[page-1];
+  if (cursor){ qs.set("cursor", cursor); qs.set("count", "0"); }
+  try{
+    const res = await fetch(`${api}/api/respuestas?${qs.toString()}`, { cache: "no-cache" });
+    if (!res.ok) throw new Error(res.status);
+    const rows = await res.json();
+    if (seq !== pageSeq) return; // llegó una página más nueva
+    if (res.headers.has("X-Total-Count")) serverTotal = parseInt(res.headers.get("X-Total-Count"), 10) || 0;
+    pageCursors[page] = res.headers.get("X-Next-Cursor") || null;
+    const pages = Math.max(1, Math.ceil(serverTotal / cfg.perPage));
+    renderRows(rows, (page-1)*cfg.perPage, serverTotal, pages);
+    if (!pageCursors[page]) btnNext.disabled = true;
+  }catch(e){
+    if (seq !== pageSeq) return;
+    estado.textContent = "Error: " + e.message;
+  }
+}
+
+// CSV: si el servidor puede aplicar los filtros, se descarga en streaming desde /api/respuestas/export
+function exportCSV(){
+  if (!usesServerPaging()){ downloadCSV(dataFiltered); return; }
+  const { api } = getInputValues();
+  const qs = serverQuery();
+  qs.set("format", "csv");
+  const a = document.createElement("a");
+  a.href = `${api}/api/respuestas/export?${qs.toString()}`;
+  a.download = "reporte_encuesta.csv";
+  a.click();
+}
+
+// PDF: reportes semanales/mensuales que el servidor genera al cerrar cada periodo
+// (/api/reportes/snapshots). Solo cubren tipo + semana/mes completos: el botón se habilita
+// cuando desde/hasta coinciden exactamente con un periodo generado y no hay filtros de
+// turno, sede, dispositivo o texto; si no, su title lista los periodos disponibles.
+let snapshots = [];
+
+async function loadSnapshots(){
+  const { api } = getInputValues();
+  try{
+    const res = await fetch(`${api}/api/reportes/snapshots`, { cache: "no-cache" });
+    snapshots = res.ok ? (await res.json()).snapshots : [];
+  }catch(e){
+    snapshots = [];
+  }
+  updatePDFButton();
+}
+
+function pdfStatus(){
+  const { tipo, desde: dStr, hasta: hStr, turno } = getInputValues();
+  const alcance = tipo || "todos";
+  const delAlcance = snapshots.filter(s => s.alcance === alcance);
+  const disponibles = delAlcance.length
+    ? "Disponibles: " + delAlcance.slice(0, 8).map(s => `${s.periodo} (${s.desde} a ${s.hasta})`).join(", ")
+    : "Aún no hay reportes PDF generados";
+  if (turno || hasTextFilters()){
+    return { snap: null, motivo: `El PDF no aplica filtros de turno, sede, dispositivo ni texto. ${disponibles}` };
+  }
+  const snap = delAlcance.find(s => s.desde === dStr && s.hasta === hStr) || null;
+  return { snap, motivo: snap ? "" : `No hay PDF para ${dStr} a ${hStr}. ${disponibles}` };
+}
+
+function updatePDFButton(){
+  if (!btnExportPDF) return;
+  const { snap, motivo } = pdfStatus();
+  btnExportPDF.disabled = !snap;
+  btnExportPDF.title = snap
+    ? `PDF ${snap.clase === "semana" ? "semanal" : "mensual"} ${snap.periodo} (${snap.desde} a ${snap.hasta})`
+    : motivo;
+}
+
+function exportPDF(){
+  const { api } = getInputValues();
+  const { snap, motivo } = pdfStatus();
+  if (!snap){ estado.textContent = motivo; updatePDFButton(); return; }
+  const a = document.createElement("a");
+  a.href = `${api}${snap.urls.pdf}`;
+  a.download = `reporte-${snap.alcance}-${snap.periodo}.pdf`;
+  a.click();
+  estado.textContent = `PDF ${snap.clase === "semana" ? "semanal" : "mensual"} ${snap.periodo} (${snap.desde} a ${snap.hasta})`;
+}
+
+function renderTable(){
+  if (usesServerPaging()){ loadServerPage(); return; }
+
+  const total = dataFiltered.length;
+  const perPage = cfg.perPage;
+  const pages = Math.max(1, Math.ceil(total / perPage));
+  page = Math.min(page, pages);
+  const start = (page-1)*perPage;
+  renderRows(dataFiltered.slice(start, start + perPage), start, total, pages);
+}
+
 // ==== eventos ====
-btnCargar.addEventListener("click", () => { persistFilters(); fetchData(); });
-btnCSV.addEventListener("click", () => downloadCSV(dataFiltered));
-btnExportPDF?.addEventListener("click", () => {
-  // (tu exportación PDF si la tienes implementada)
-});
+btnCargar.addEventListener("click", () => { persistFilters(); fetchData({ full: true }); loadSnapshots(); });
+btnCSV.addEventListener("click", exportCSV);
+btnExportPDF?.addEventListener("click", exportPDF);
 
 [apiInput, fTipo, desde, hasta, fTurno, fSede, fDisp, fTexto, fEmpleado, fMeta].forEach(el => {
-  el?.addEventListener("change", () => { persistFilters(); applyFilters(); });
+  el?.addEventListener("change", () => { persistFilters(); applyFilters(); updatePDFButton(); });
+});
+apiInput.addEventListener("change", () => { if (live) setAutoTimer(true); loadSnapshots(); });
+// Los filtros de texto consultan al servidor: se espera a que se deje de teclear
+let typing = null;
+[fTexto, fEmpleado, fMeta].forEach(el => {
+  el?.addEventListener("keyup", () => {
+    clearTimeout(typing);
+    typing = setTimeout(() => { persistFilters(); applyFilters(); updatePDFButton(); }, 300);
+  });
 });
-fTexto?.addEventListener("keyup", () => { persistFilters(); applyFilters(); });
-fEmpleado?.addEventListener("keyup", () => { persistFilters(); applyFilters(); });
-fMeta?.addEventListener("keyup", () => { persistFilters(); applyFilters(); });
 
 btnPrev.addEventListener("click", ()=>{ page=Math.max(1,page-1); renderTable(); });
 btnNext.addEventListener("click", ()=>{ page=page+1; renderTable(); });
@@ -258,7 +498,7 @@ auto.addEventListener("change", ()=>{
 // ==== init ====
 (function init(){
   restoreFilters();
-  applyFilters();
-  fetchData();
-  setAutoTimer(auto.checked);
+  loadSnapshots();
+  // El stream se abre tras la primera carga para reanudar desde su high-water
+  fetchData().then(() => setAutoTimer(auto.checked));
 })();
@@ -127,7 +127,7 @@ export function dateToMinutesLocal(d) {
   return d.getHours() * 60 + d.getMinutes();
 }
 
-// Definiciones exactas de turnos
+// Definiciones exactas de turnos (mantener en sincronía con turnos.py en el servidor)
 export const SHIFT_DEFS = {
   T1:    { label: "1° Turno", startMin: toMinutes("6:00 AM"),  endMin: toMinutes("2:00 PM"),  overnight: false },
   T2:    { label: "2° Turno", startMin: toMinutes("2:00 PM"),  endMin: toMinutes("11:00 PM"), overnight: false },
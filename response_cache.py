@@ -0,0 +1,153 @@
+import os
+import mmap
+import time
+import uuid
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# ---------- Versión de datos ----------
+class DataVersion:
+    """
+    Contador de escrituras del proceso. Las respuestas cacheadas guardan la
+    versión con la que se calcularon; cualquier INSERT la incrementa.
+    El boot_id evita repetir versiones tras un reinicio.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def bump(self, reinicio=False):
+        with self._lock:
+            self._n += 1
+
+    def current(self):
+        return f"{self.boot_id}.{self._n}"
+
+    def generacion(self):
+        return 0
+
+
+class SharedDataVersion:
+    """
+    La misma versión, compartida por todos los workers del host en un archivo
+    mapeado en memoria (mmap): el INSERT de un worker invalida la caché de los
+    demás, y leerla no hace llamadas al sistema. Contenido (little endian):
+    id de 8 bytes del archivo, contador de escrituras y generación. La generación
+    sube con cambios que no son altas (filas archivadas): las cachés que solo
+    crecen, como la columnar, se recargan. bump() suma bajo flock.
+    """
+
+    _FORMATO = struct.Struct("<8sQQ")
+
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size < self._FORMATO.size:
+                os.ftruncate(fd, 0)
+                os.write(fd, self._FORMATO.pack(uuid.uuid4().hex[:8].encode(), 0, 0))
+                os.fsync(fd)
+            self._mm = mmap.mmap(fd, self._FORMATO.size)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd, self._pid = fd, os.getpid()
+        self.boot_id = self._FORMATO.unpack_from(self._mm)[0].decode()
+        self._lock = threading.Lock()
+
+    def bump(self, reinicio=False):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Tras un fork el descriptor heredado comparte el flock con el padre
+                self._fd, self._pid = os.open(self.path, os.O_RDWR), os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                _, n, gen = self._FORMATO.unpack_from(self._mm)
+                struct.pack_into("<QQ", self._mm, 8, n + 1, gen + reinicio)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def current(self):
+        _, n, gen = self._FORMATO.unpack_from(self._mm)
+        return f"{self.boot_id}.{gen}.{n}"
+
+    def generacion(self):
+        return self._FORMATO.unpack_from(self._mm)[2]
+
+
+# ---------- Caché de respuestas ----------
+class ResponseCache:
+    """
+    LRU acotada por número de entradas y bytes totales, con TTL corto.
+    Entrada: (version, expira, etag, body, status, headers).
+    """
+
+    def __init__(self, max_entries=256, max_bytes=8 * 1024 * 1024, ttl=30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "skipped": 0}
+
+    @staticmethod
+    def etag_for(body):
+        return hashlib.sha1(body).hexdigest()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] != version or entry[1] < time.monotonic():
+                self._remove(key)
+                self._stats["stale"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key, version, body, status=200, headers=None):
+        size = len(body)
+        if size > self.max_bytes // 4:
+            with self._lock:
+                self._stats["skipped"] += 1
+            return None
+        entry = (version, time.monotonic() + self.ttl, self.etag_for(body), body, status, dict(headers or {}))
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = entry
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._data.pop(key)
+        self._bytes -= len(entry[3])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "ttl": self.ttl, **self._stats}
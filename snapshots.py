@@ -0,0 +1,307 @@
+import os
+import io
+import re
+import csv
+import json
+import zlib
+import hashlib
+import threading
+from datetime import date, timedelta
+
+import turnos
+
+PERIODO_RE = re.compile(r"^\d{4}-(W(0[1-9]|[1-4]\d|5[0-3])|0[1-9]|1[0-2])$")
+NOMBRE_RE = re.compile(r"^[A-Za-z0-9_-]+\.[0-9a-f]{12}\.(json|csv|pdf)$")
+ALCANCES = ("todos", "comedor", "transporte")
+FORMATOS = {"json": "application/json", "csv": "text/csv", "pdf": "application/pdf"}
+INDICE = "index.json"
+CALIFICACIONES = ("Excelente", "Bueno", "Regular", "Malo")
+
+
+# ---------- Periodos (días locales) ----------
+def periodo(pid):
+    """'YYYY-Www' (semana ISO, lunes a domingo) o 'YYYY-MM' -> (clase, desde, hasta) inclusivos."""
+    if not PERIODO_RE.match(pid or ""):
+        raise ValueError("periodo invalido (YYYY-Www o YYYY-MM)")
+    if "W" in pid:
+        desde = date.fromisocalendar(int(pid[:4]), int(pid[6:]), 1)
+        return "semana", desde, desde + timedelta(days=6)
+    desde = date(int(pid[:4]), int(pid[5:7]), 1)
+    siguiente = date(desde.year + desde.month // 12, desde.month % 12 + 1, 1)
+    return "mes", desde, siguiente - timedelta(days=1)
+
+
+def semana_de(d):
+    anio, semana, _ = d.isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+def mes_de(d):
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+def cerrados(hoy, semanas, meses):
+    """Las últimas `semanas` semanas y `meses` meses ya terminados antes de `hoy` (día local)."""
+    lunes = hoy - timedelta(days=hoy.weekday())
+    out = [semana_de(lunes - timedelta(weeks=i)) for i in range(1, semanas + 1)]
+    d = hoy.replace(day=1)
+    for _ in range(meses):
+        d = (d - timedelta(days=1)).replace(day=1)
+        out.append(mes_de(d))
+    return out
+
+
+# ---------- Contenido ----------
+def _n(v):
+    return f"{v:,}"
+
+
+def _pct_sat(c):
+    pos, neg = c["Excelente"] + c["Bueno"], c["Regular"] + c["Malo"]
+    return f"{round(pos * 100 / (pos + neg))}%" if pos + neg else "—"
+
+
+def json_reporte(datos):
+    return (json.dumps(datos, ensure_ascii=False, indent=1, sort_keys=True) + "\n").encode("utf-8")
+
+
+def csv_reporte(datos):
+    """Conteos por día local, tipo y sede (una fila por combinación con respuestas)."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(("dia", "tipo", "sede") + CALIFICACIONES + ("total",))
+    for f in datos["detalle"]:
+        w.writerow((f["dia"], f["tipo"], f["sede"]) + tuple(f[c] for c in CALIFICACIONES) + (f["n"],))
+    return buf.getvalue().encode("utf-8")
+
+
+def pdf_reporte(datos):
+    pdf = PDFSimple()
+    clase = "semanal" if datos["clase"] == "semana" else "mensual"
+    alcance = "todas las encuestas" if datos["alcance"] == "todos" else datos["alcance"]
+    k = datos["kpis"]
+    pdf.linea(f"Reporte {clase} {datos['periodo']} · {alcance}", 16, negrita=True)
+    pdf.linea(f"Del {datos['desde']} al {datos['hasta']} (días en {datos['tz']})", 10)
+    pdf.separacion()
+    pdf.linea(f"Respuestas: {_n(k['total']['n'])}    Satisfechos: {k['pct_satisfechos']}%    "
+              f"No satisfechos: {k['pct_no_satisfechos']}%", 11, negrita=True)
+    if k["top_motivo"]:
+        pdf.linea(f"Motivo más frecuente: {k['top_motivo']['motivo']} ({_n(k['top_motivo']['n'])})", 10)
+
+    encabezado = CALIFICACIONES + ("Total", "% sat.")
+    anchos = (150, 55, 55, 55, 55, 60, 55)
+
+    def seccion(titulo, primera, conteos):
+        pdf.separacion(12)
+        pdf.linea(titulo, 12, negrita=True)
+        pdf.tabla((primera,) + encabezado,
+                  [(nombre,) + tuple(_n(c[x]) for x in CALIFICACIONES) + (_n(c["n"]), _pct_sat(c))
+                   for nombre, c in conteos],
+                  anchos)
+
+    if datos["alcance"] == "todos":
+        seccion("Por tipo", "Tipo", sorted(datos["tipos"].items(), key=lambda kv: -kv[1]["n"]))
+    seccion("Por sede", "Sede", sorted(datos["sedes"].items(), key=lambda kv: -kv[1]["n"]))
+    seccion("Por turno", "Turno", [(turnos.SHIFT_DEFS[t]["label"], c) for t, c in datos["turnos"].items()])
+
+    pdf.separacion(12)
+    pdf.linea("Respuestas por día", 12, negrita=True)
+    pdf.barras([d["dia"] for d in datos["dias"]], [d["n"] for d in datos["dias"]])
+
+    if k["top_motivos_negativos"]:
+        pdf.separacion(12)
+        pdf.linea("Motivos de respuestas Regular y Malo", 12, negrita=True)
+        pdf.tabla(("Motivo", "Respuestas"), [(m["motivo"], _n(m["n"])) for m in k["top_motivos_negativos"]],
+                  (300, 80))
+    return pdf.bytes()
+
+
+RENDERERS = {"json": json_reporte, "csv": csv_reporte, "pdf": pdf_reporte}
+
+
+# ---------- PDF mínimo (sin dependencias) ----------
+# Anchos Helvetica (1/1000 de em) de lo que suele ir alineado a la derecha; el resto ≈ 556
+_ANCHOS = {" ": 278, ",": 278, ".": 278, "%": 889, "—": 1000, "-": 333}
+
+
+def _ancho(texto, tam):
+    return sum(_ANCHOS.get(c, 556) for c in texto) * tam / 1000
+
+
+def _literal(texto):
+    """Cadena PDF en WinAnsi (lo que no exista en cp1252 sale como '?')."""
+    crudo = str(texto).encode("cp1252", "replace").decode("latin-1")
+    return "(" + crudo.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+class PDFSimple:
+    """
+    PDF 1.4 en A4 con Helvetica: líneas de texto, tablas y barras horizontales, con
+    salto de página automático y número de página. No lleva fecha de creación: el
+    mismo contenido produce los mismos bytes (y la misma huella).
+    """
+    ANCHO, ALTO, MARGEN = 595, 842, 50
+    COLOR = "0 0.627 0.875 rg"   # #00a0df, como la UI de reportes
+
+    def __init__(self):
+        self._paginas = []
+        self._nueva_pagina()
+
+    def _nueva_pagina(self):
+        self._ops = []
+        self._paginas.append(self._ops)
+        self.y = self.ALTO - self.MARGEN
+
+    def _reservar(self, alto):
+        if self.y - alto < self.MARGEN:
+            self._nueva_pagina()
+        self.y -= alto
+
+    def _texto(self, x, y, texto, tam, negrita=False):
+        self._ops.append(f"BT /{'F2' if negrita else 'F1'} {tam} Tf {x:.1f} {y:.1f} Td {_literal(texto)} Tj ET")
+
+    def linea(self, texto, tam=10, negrita=False):
+        self._reservar(tam + 5)
+        self._texto(self.MARGEN, self.y, texto, tam, negrita)
+
+    def separacion(self, alto=8):
+        self.y -= alto
+
+    def tabla(self, encabezados, filas, anchos, tam=9):
+        """Primera columna a la izquierda; las demás (números) alineadas a la derecha."""
+        def fila(celdas, negrita):
+            self._reservar(tam + 5)
+            x = self.MARGEN
+            for i, (celda, w) in enumerate(zip(celdas, anchos)):
+                celda = str(celda)
+                self._texto(x if i == 0 else x + w - _ancho(celda, tam), self.y, celda, tam, negrita)
+                x += w
+
+        fila(encabezados, True)
+        y = self.y - 3
+        self._ops.append(f"0.5 w {self.MARGEN} {y:.1f} m {self.MARGEN + sum(anchos)} {y:.1f} l S")
+        self.y -= 2
+        for f in filas:
+            fila(f, False)
+
+    def barras(self, etiquetas, valores, tam=8, ancho_etiqueta=70, ancho_barra=360):
+        """Una barra por valor, proporcional al máximo, con el valor a la derecha."""
+        maximo = max(valores, default=0) or 1
+        for etiqueta, v in zip(etiquetas, valores):
+            self._reservar(tam + 4)
+            self._texto(self.MARGEN, self.y, etiqueta, tam)
+            x, w = self.MARGEN + ancho_etiqueta, ancho_barra * v / maximo
+            self._ops.append(f"{self.COLOR} {x:.1f} {self.y - 1:.1f} {w:.1f} {tam:.1f} re f 0 g")
+            self._texto(x + w + 4, self.y, _n(v), tam)
+
+    def bytes(self):
+        objetos = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,   # /Pages, cuando se conozcan las páginas
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        ]
+        paginas = []
+        total = len(self._paginas)
+        for i, ops in enumerate(self._paginas, 1):
+            pie = f"Página {i} de {total}"
+            ops = ops + [f"0.4 g BT /F1 8 Tf {self.ANCHO - self.MARGEN - _ancho(pie, 8):.1f} "
+                         f"{self.MARGEN / 2:.1f} Td {_literal(pie)} Tj ET 0 g"]
+            contenido = zlib.compress("\n".join(ops).encode("latin-1"), 9)
+            objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(contenido)
+                           + contenido + b"\nendstream")
+            objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                           b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                           % (self.ANCHO, self.ALTO, len(objetos)))
+            paginas.append(len(objetos))
+        objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % p for p in paginas), len(paginas))
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for i, obj in enumerate(objetos, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+        out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+        return bytes(out)
+
+
+# ---------- Directorio de snapshots ----------
+def _escribir(path, data):
+    """Archivo temporal + fsync + rename: nunca queda uno a medias con el nombre final."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Snapshots:
+    """
+    Reportes precalculados en `directorio`: archivos <alcance>-<periodo>.<sha256[:12]>.<ext>
+    (el nombre cambia si cambia el contenido, así que se sirven como inmutables) y
+    index.json con una entrada por (periodo, alcance).
+    - guardar() se llama con el lock "reportes" tomado (un solo escritor entre workers).
+    - indice() relee index.json solo si cambió en disco (lo escribe otro worker).
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._cache = (None, [])
+        self._lock = threading.Lock()
+
+    def _path(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def indice(self):
+        try:
+            st = os.stat(self._path(INDICE))
+        except FileNotFoundError:
+            return []
+        firma = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if self._cache[0] != firma:
+                with open(self._path(INDICE), encoding="utf-8") as f:
+                    self._cache = (firma, json.load(f)["snapshots"])
+            return self._cache[1]
+
+    def buscar(self, pid, alcance):
+        return next((e for e in self.indice() if e["periodo"] == pid and e["alcance"] == alcance), None)
+
+    def guardar(self, entrada, datos):
+        """Escribe JSON, CSV y PDF de `datos` y reemplaza la entrada (periodo, alcance) del índice."""
+        os.makedirs(self.directorio, exist_ok=True)
+        archivos = {}
+        for ext, render in RENDERERS.items():
+            data = render(datos)
+            sha = hashlib.sha256(data).hexdigest()
+            nombre = f"{entrada['alcance']}-{entrada['periodo']}.{sha[:12]}.{ext}"
+            if not os.path.isfile(self._path(nombre)):
+                _escribir(self._path(nombre), data)
+            archivos[ext] = {"nombre": nombre, "sha256": sha, "bytes": len(data)}
+        entrada = {**entrada, "archivos": archivos}
+
+        anterior = self.buscar(entrada["periodo"], entrada["alcance"])
+        resto = [e for e in self.indice() if e is not anterior]
+        indice = sorted(resto + [entrada], key=lambda e: (e["desde"], e["clase"], e["alcance"]), reverse=True)
+        _escribir(self._path(INDICE), (json.dumps({"snapshots": indice}, ensure_ascii=False, indent=1) + "\n")
+                  .encode("utf-8"))
+        if anterior:
+            for a in anterior["archivos"].values():
+                if a["nombre"] not in (x["nombre"] for x in archivos.values()):
+                    try:
+                        os.remove(self._path(a["nombre"]))
+                    except FileNotFoundError:
+                        pass
+        return entrada
+
+    def ruta(self, nombre):
+        """Ruta de un archivo listado en el índice; None si el nombre no es de un snapshot."""
+        if not NOMBRE_RE.match(nombre):
+            return None
+        path = self._path(nombre)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,55 @@
+"""
+Pruebas del servidor con test_client() de Flask contra un SQLite temporal.
+Desde la raíz del repo: pytest (las E2E de kioscos viven en tests_e2e_py).
+"""
+import sys
+import sqlite3
+import importlib
+import pytest
+
+
+@pytest.fixture
+def cargar_app(tmp_path, monkeypatch):
+    """
+    Importa app.py de cero contra `db` (por defecto, una base nueva en tmp_path).
+    app inicializa esquema, pool y cachés al importarse, así que cada prueba recibe
+    su propio módulo; archivo, snapshots y versión de datos quedan junto a la base.
+    """
+    def cargar(db=None, **env):
+        monkeypatch.setenv("SQLITE_PATH", str(db or tmp_path / "encuesta.db"))
+        for var in ("DATABASE_URL", "GROUP_COMMIT", "COLUMNAR_CACHE", "PARTICIONES_INTERVALO",
+                    "REPORTES_INTERVALO", "RETENCION_MESES", "ARCHIVO_DIR", "REPORTES_DIR"):
+            monkeypatch.delenv(var, raising=False)
+        for k, v in env.items():
+            monkeypatch.setenv(k, str(v))
+        sys.modules.pop("app", None)
+        return importlib.import_module("app")
+    yield cargar
+    sys.modules.pop("app", None)
+
+
+@pytest.fixture
+def app_mod(cargar_app):
+    return cargar_app()
+
+
+@pytest.fixture
+def client(app_mod):
+    return app_mod.app.test_client()
+
+
+def respuesta(sid=None, calificacion="Bueno", motivo="Sabor", tipo="comedor", **extra):
+    """Payload válido de kiosco."""
+    data = {"calificacion": calificacion, "motivo": motivo, "tipo": tipo,
+            "sede": "Saltillo", "dispositivo_id": f"tablet-{tipo}-01", **extra}
+    if sid is not None:
+        data["submission_id"] = sid
+    return data
+
+
+def contar(db, sql, args=()):
+    con = sqlite3.connect(db)
+    try:
+        return con.execute(sql, args).fetchone()[0]
+    finally:
+        con.close()
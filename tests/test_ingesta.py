@@ -0,0 +1,52 @@
+from conftest import respuesta
+
+
+def test_submission_id_repetido_entre_peticiones(client):
+    r1 = client.post("/api/respuestas", json=respuesta("kiosco-1:0001"))
+    assert r1.status_code == 201
+    original = r1.get_json()
+
+    r2 = client.post("/api/respuestas", json=respuesta("kiosco-1:0001", calificacion="Malo"))
+    assert r2.status_code == 200
+    assert r2.get_json() == {**original, "duplicado": True}
+
+    # Idempotency-Key equivale a submission_id
+    r3 = client.post("/api/respuestas", json=respuesta(), headers={"Idempotency-Key": "kiosco-1:0001"})
+    assert r3.status_code == 200 and r3.get_json()["id"] == original["id"]
+
+    assert client.get("/api/respuestas?limit=10").headers["X-Total-Count"] == "1"
+
+
+def test_submission_id_repetido_en_el_lote(client):
+    previo = client.post("/api/respuestas", json=respuesta("b-0")).get_json()
+    r = client.post("/api/respuestas/batch", json={"items": [
+        respuesta("b-1"),
+        respuesta("b-1", calificacion="Malo"),
+        respuesta("b-0"),
+        respuesta(),
+        respuesta("b-2", calificacion="Pésimo"),
+    ]})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert (body["insertados"], body["duplicados"], body["errores"]) == (2, 2, 1)
+    items = body["items"]
+    assert items[0]["duplicado"] is False
+    assert items[1]["duplicado"] is True and items[1]["id"] == items[0]["id"]
+    assert items[2]["duplicado"] is True and items[2]["id"] == previo["id"]
+    assert items[3]["duplicado"] is False
+    assert items[4] == {"index": 4, "error": "calificacion invalida"}
+
+    # El lote completo reenviado (reintento del kiosco) no escribe nada
+    again = client.post("/api/respuestas/batch", json=[respuesta("b-1"), respuesta("b-0")]).get_json()
+    assert [i["id"] for i in again["items"]] == [items[0]["id"], previo["id"]]
+    assert again["insertados"] == 0
+    assert client.get("/api/respuestas?limit=10").headers["X-Total-Count"] == "3"
+
+
+def test_campo_no_texto_es_error_del_item(client):
+    r = client.post("/api/respuestas/batch", json=[respuesta("c-1"), respuesta("c-2", motivo=7)])
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["insertados"] == 1
+    assert body["items"][1] == {"index": 1, "error": "motivo invalido"}
+    assert client.post("/api/respuestas", json=respuesta(sede={"x": 1})).status_code == 400
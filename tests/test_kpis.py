@@ -0,0 +1,35 @@
+import time
+import pytest
+
+from conftest import respuesta
+
+# Empates a propósito: Sabor/Variedad 2 y 2 en total; Retraso/Sabor 1 y 1 entre los negativos
+FILAS = [("Bueno", "Variedad"), ("Malo", "Sabor"), ("Bueno", "Variedad"), ("Regular", "Retraso"),
+         ("Excelente", "Sabor"), ("Bueno", "Otro")]
+
+
+def test_empates_no_dependen_del_orden_de_entrada(app_mod):
+    grupos = [("comedor", c, m, 1) for c, m in FILAS]
+    a = app_mod.calcular_kpis(grupos)
+    b = app_mod.calcular_kpis(list(reversed(grupos)))
+    assert a == b
+    assert a["top_motivo"] == {"motivo": "Sabor", "n": 2}
+    assert a["top_motivos_negativos"] == [{"motivo": "Retraso", "n": 1}, {"motivo": "Sabor", "n": 1}]
+
+
+def test_kpis_iguales_por_sql_y_columnar(cargar_app, tmp_path):
+    pytest.importorskip("numpy")
+    db = tmp_path / "encuesta.db"
+    sql = cargar_app(db, COLUMNAR_CACHE=0)
+    client = sql.app.test_client()
+    client.post("/api/respuestas/batch", json=[respuesta(f"k-{i}", c, m) for i, (c, m) in enumerate(FILAS)])
+    por_sql = client.get("/api/kpis").get_json()
+
+    col = cargar_app(db, COLUMNAR_CACHE=1)
+    for _ in range(100):
+        if col.COLUMNAR.estado == "lista":
+            break
+        time.sleep(0.05)
+    assert col.COLUMNAR.estado == "lista"
+    assert col.columnar_snapshot() is not None
+    assert col.app.test_client().get("/api/kpis").get_json() == por_sql
@@ -0,0 +1,67 @@
+import shutil
+import sqlite3
+import pathlib
+
+from conftest import respuesta, contar
+
+BASE_ORIGINAL = pathlib.Path(__file__).resolve().parent.parent / "encuesta.db"
+COLS = ("id", "created_at", "sede", "dispositivo_id", "calificacion", "motivo", "tipo")
+
+
+def _copia_original(tmp_path):
+    # Base con el esquema de antes de las migraciones (tabla respuestas de texto)
+    db = tmp_path / "encuesta.db"
+    shutil.copy(BASE_ORIGINAL, db)
+    return db
+
+
+def _filas(db, tabla="respuestas"):
+    con = sqlite3.connect(db)
+    try:
+        return con.execute(f"SELECT {', '.join(COLS)} FROM {tabla} ORDER BY id").fetchall()
+    finally:
+        con.close()
+
+
+def test_migracion_conserva_filas_y_secuencia(tmp_path, cargar_app):
+    db = _copia_original(tmp_path)
+    antes = _filas(db)
+    secuencia = contar(db, "SELECT seq FROM sqlite_sequence WHERE name = 'respuestas'")
+    assert antes and contar(db, "SELECT count(*) FROM sqlite_master WHERE name = 'schema_version'") == 0
+
+    app = cargar_app(db)
+    assert contar(db, "SELECT max(version) FROM schema_version") == app.ESQUEMA_VERSION
+    # respuestas es ahora una vista sobre respuestas_datos + dimensiones
+    assert contar(db, "SELECT count(*) FROM sqlite_master WHERE name = 'respuestas' AND type = 'view'") == 1
+    assert _filas(db) == antes
+
+    client = app.app.test_client()
+    assert client.get("/api/respuestas?limit=1").headers["X-Total-Count"] == str(len(antes))
+    assert sum(r["n"] for r in client.get("/api/resumen").get_json()) == len(antes)
+
+    nuevo = client.post("/api/respuestas", json=respuesta("post-migracion")).get_json()
+    assert nuevo["id"] == secuencia + 1
+
+
+def test_ids_siguen_la_secuencia_aunque_falten_filas(tmp_path, cargar_app):
+    db = _copia_original(tmp_path)
+    con = sqlite3.connect(db)
+    ultimo = con.execute("SELECT max(id) FROM respuestas").fetchone()[0]
+    con.execute("DELETE FROM respuestas WHERE id = ?", (ultimo,))
+    con.commit()
+    con.close()
+
+    app = cargar_app(db)
+    nuevo = app.app.test_client().post("/api/respuestas", json=respuesta()).get_json()
+    # AUTOINCREMENT: el id borrado no se reutiliza
+    assert nuevo["id"] == ultimo + 1
+
+
+def test_migracion_es_idempotente(tmp_path, cargar_app):
+    db = _copia_original(tmp_path)
+    cargar_app(db)
+    antes = _filas(db)
+    versiones = contar(db, "SELECT count(*) FROM schema_version")
+    app = cargar_app(db)
+    assert _filas(db) == antes
+    assert contar(db, "SELECT count(*) FROM schema_version") == versiones == len(app.MIGRACIONES)
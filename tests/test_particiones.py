@@ -0,0 +1,86 @@
+import json
+import gzip
+
+from conftest import respuesta, contar
+
+MES = "2025-01"
+
+
+def _totales(client):
+    lista = client.get("/api/respuestas?limit=1").headers["X-Total-Count"]
+    resumen = sum(r["n"] for r in client.get("/api/resumen").get_json())
+    return int(lista), resumen
+
+
+def _preparar(app, client):
+    """6 respuestas: 4 movidas a MES (ya cerrado) y 2 del mes actual."""
+    out = client.post("/api/respuestas/batch", json=[
+        respuesta(f"p-{i}", calificacion=("Bueno", "Malo")[i % 2]) for i in range(6)
+    ]).get_json()
+    viejas = {f"p-{i}": out["items"][i]["id"] for i in range(4)}
+    with app.db_conn() as con:
+        con.execute(f"UPDATE respuestas_datos SET created_at = '{MES}-15T12:00:00Z', dia = '{MES}-15' "
+                    f"WHERE submission_id IN ({', '.join('?' for _ in viejas)})", list(viejas))
+        app.rebuild_rollup(con)
+        con.commit()
+    app.DATA_VERSION.bump()
+    return viejas
+
+
+def test_sellar_y_archivar_conserva_totales_y_duplicados(app_mod, client):
+    app = app_mod
+    viejas = _preparar(app, client)
+    assert _totales(client) == (6, 6)
+
+    con = app.get_db()
+    try:
+        assert app.sellar_mes_sqlite(con, MES) == 4
+    finally:
+        con.close()
+    db = app.sqlite_path()
+    assert contar(db, "SELECT count(*) FROM respuestas_datos") == 2
+    assert contar(db, "SELECT count(*) FROM respuestas_datos_2025_01") == 4
+    assert _totales(client) == (6, 6)
+    # Sellado: el submission_id se busca también en la tabla del mes
+    r = client.post("/api/respuestas", json=respuesta("p-0"))
+    assert r.status_code == 200 and r.get_json()["id"] == viejas["p-0"]
+
+    con = app.get_db()
+    try:
+        assert app.archivar_mes(con, MES, app.ARCHIVO_DIR) == 4
+    finally:
+        con.close()
+    app.DATA_VERSION.bump(reinicio=True)   # como mantener_particiones
+    assert contar(db, "SELECT count(*) FROM sqlite_master WHERE name = 'respuestas_datos_2025_01'") == 0
+    assert _totales(client) == (2, 2)
+    assert client.get(f"/api/respuestas?limit=1&desde={MES}-01&hasta={MES}-31").headers["X-Total-Count"] == "0"
+
+    r = client.get(f"/api/archivo/{MES}", headers={"Accept-Encoding": "identity"})
+    archivadas = [json.loads(l) for l in r.get_data(as_text=True).splitlines()]
+    assert sorted(f["id"] for f in archivadas) == sorted(viejas.values())
+    with gzip.open(app.fetch_all("SELECT archivo FROM particiones WHERE mes = ?", [MES])[0]["archivo"], "rt") as f:
+        assert len(f.read().splitlines()) == 4
+
+    # Reenvíos de lo archivado siguen siendo duplicados con el id original
+    r = client.post("/api/respuestas", json=respuesta("p-1"))
+    assert r.status_code == 200
+    assert r.get_json() == {"id": viejas["p-1"], "created_at": f"{MES}-15T12:00:00Z", "tipo": "comedor",
+                            "duplicado": True}
+    lote = client.post("/api/respuestas/batch", json=[respuesta("p-2"), respuesta("p-3"), respuesta("p-9")]).get_json()
+    assert [i["id"] for i in lote["items"][:2]] == [viejas["p-2"], viejas["p-3"]]
+    assert (lote["insertados"], lote["duplicados"]) == (1, 2)
+    assert _totales(client) == (3, 3)
+
+
+def test_mantenimiento_con_retencion(cargar_app):
+    app = cargar_app(RETENCION_MESES=1)
+    client = app.app.test_client()
+    viejas = _preparar(app, client)
+    hecho = app.mantener_particiones()
+    assert hecho == {"selladas": {MES: 4}, "archivadas": {MES: 4}}
+    assert _totales(client) == (2, 2)
+    assert client.get("/api/particiones").status_code == 200
+    r = client.post("/api/respuestas", json=respuesta("p-3"))
+    assert r.status_code == 200 and r.get_json()["id"] == viejas["p-3"]
+    # Segunda pasada: nada pendiente
+    assert app.mantener_particiones() == {"selladas": {}, "archivadas": {}}
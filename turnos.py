@@ -0,0 +1,56 @@
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Misma zona y turnos que reportes/js/utils.js (TIME_ZONE, SHIFT_DEFS)
+TIME_ZONE = "America/Mexico_City"
+
+
+def to_minutes(hhmm_ap):
+    """'HH:MM AM/PM' -> minutos desde 00:00."""
+    s = hhmm_ap.strip().upper()
+    ampm = s[-2:] if s.endswith(("AM", "PM")) else None
+    core = s[:-2].strip() if ampm else s
+    h_str, _, m_str = core.partition(":")
+    h, m = int(h_str), int(m_str or 0)
+    if ampm == "AM" and h == 12:
+        h = 0
+    elif ampm == "PM" and h != 12:
+        h += 12
+    return h * 60 + m
+
+
+SHIFT_DEFS = {
+    "T1":    {"label": "1° Turno", "start": to_minutes("6:00 AM"),  "end": to_minutes("2:00 PM"),  "overnight": False},
+    "T2":    {"label": "2° Turno", "start": to_minutes("2:00 PM"),  "end": to_minutes("11:00 PM"), "overnight": False},
+    "T3":    {"label": "3° Turno", "start": to_minutes("11:00 PM"), "end": to_minutes("6:00 AM"),  "overnight": True},
+    "MIXTO": {"label": "Mixto",    "start": to_minutes("8:24 AM"),  "end": to_minutes("6:00 PM"),  "overnight": False},
+    "4X3":   {"label": "4X3",      "start": to_minutes("6:00 AM"),  "end": to_minutes("6:00 PM"),  "overnight": False},
+}
+
+
+def is_minute_in_shift(minute, d):
+    """[inicio, fin) para no duplicar en fronteras; los nocturnos cruzan medianoche."""
+    if not d["overnight"]:
+        return d["start"] <= minute < d["end"]
+    return minute >= d["start"] or minute < d["end"]
+
+
+def zona(nombre):
+    try:
+        return ZoneInfo(nombre or TIME_ZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"zona horaria invalida: {nombre}")
+
+
+def parse_utc(created_at):
+    """created_at ('YYYY-MM-DDTHH:MM[:SS]Z') -> datetime UTC con tzinfo."""
+    dt = datetime.fromisoformat(created_at.rstrip("Z"))
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def local_day_range_utc(dia, tz):
+    """Día local -> (inicio, fin) en UTC como [inicio, fin)."""
+    d = date.fromisoformat(dia)
+    start = datetime.combine(d, time(0), tzinfo=tz).astimezone(timezone.utc)
+    end = datetime.combine(d + timedelta(days=1), time(0), tzinfo=tz).astimezone(timezone.utc)
+    return start, end
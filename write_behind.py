@@ -0,0 +1,283 @@
+import os
+import time
+import queue
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_STOP = object()
+
+
+# ---------- Coordinación de escritores entre procesos (SQLite) ----------
+def es_ocupado(e):
+    """SQLITE_BUSY / SQLITE_LOCKED: otro proceso tiene el lock de escritura."""
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+
+def reintentar(fn, intentos=5, base=0.05, tope=1.0):
+    """
+    fn() reintentado si la BD está ocupada, con backoff exponencial y jitter
+    (base, 2*base, ... hasta `tope` s, cada espera al azar entre la mitad y el total).
+    fn debe ser una transacción completa: el reintento la repite desde el principio.
+    """
+    for intento in range(intentos):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if not es_ocupado(e) or intento == intentos - 1:
+                raise
+            espera = min(tope, base * 2 ** intento)
+            time.sleep(random.uniform(espera / 2, espera))
+
+
+class WriterLease:
+    """
+    Turno de escritura único entre todos los workers: flock sobre `path` más un lock
+    entre los hilos del proceso. Cada transacción de escritura lo toma y lo suelta;
+    los demás escritores esperan aquí con backoff (hasta `timeout` s, luego
+    TimeoutError) en vez de pelear por el lock de SQLite y agotar su busy_timeout.
+    El archivo guarda el pid del último dueño (diagnóstico).
+    Sin fcntl (Windows) solo coordina los hilos del proceso.
+    """
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._hilos = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "contended": 0, "timeouts": 0, "wait_seconds": 0.0}
+
+    def _descriptor(self):
+        # Tras un fork el descriptor heredado comparte el lock con el padre: se reabre
+        if self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def _fallo(self, t0):
+        with self._lock:
+            self._stats["timeouts"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - t0
+        raise TimeoutError(f"turno de escritura ocupado más de {self.timeout:g}s")
+
+    @contextmanager
+    def hold(self):
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+        if not self._hilos.acquire(timeout=self.timeout):
+            self._fallo(t0)
+        try:
+            fd = self._descriptor() if fcntl is not None else None
+            espera, hubo_espera = 0.001, False
+            while fd is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    hubo_espera = True
+                    restante = deadline - time.monotonic()
+                    if restante <= 0:
+                        self._fallo(t0)
+                    time.sleep(min(restante, random.uniform(espera / 2, espera)))
+                    espera = min(espera * 2, 0.05)
+            with self._lock:
+                self._stats["acquired"] += 1
+                self._stats["contended"] += hubo_espera
+                self._stats["wait_seconds"] += time.monotonic() - t0
+            try:
+                if fd is not None:
+                    os.pwrite(fd, f"{os.getpid():<10}".encode(), 0)
+                yield
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            self._hilos.release()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "wait_seconds": round(self._stats["wait_seconds"], 3)}
+
+
+# ---------- Group commit (SQLite) ----------
+class WriterClosed(RuntimeError):
+    """La cola de escritura ya no acepta filas (apagado en curso)."""
+
+
+class GroupCommitWriter:
+    """
+    Un único hilo escritor con su propia conexión. Las peticiones encolan sus filas
+    y esperan un Future; el hilo junta lo pendiente (hasta `max_batch` filas) y lo
+    escribe con `write(con, rows)` en una sola transacción: un commit por lote en
+    lugar de uno por envío, sin pelear por el lock de escritura. Con max_delay=0 el
+    lote es lo que se acumuló durante el commit anterior; max_delay > 0 espera ese
+    tiempo extra a que lleguen más filas.
+    Si el lote falla se reintenta envío por envío para aislar al culpable.
+    Con varios workers, cada commit toma `lease` (WriterLease) y se repite con
+    backoff si aun así la BD está ocupada (p. ej. un checkpoint o el mantenimiento).
+    `al_confirmar(rows, res)` corre en el hilo escritor tras cada commit, aunque quien
+    encoló ya no espere (timeout): lo que depende de que la fila exista va ahí.
+    """
+
+    def __init__(self, connect, write, max_batch=200, max_delay=0.0, max_pending=5000, lease=None,
+                 al_confirmar=None):
+        self._connect = connect
+        self._write = write
+        self._al_confirmar = al_confirmar
+        self._lease = lease
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._q = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._con = None
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "rows": 0, "batches": 0, "commits": 0,
+                       "max_batch_rows": 0, "errors": 0, "fallbacks": 0}
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows, timeout=None):
+        """Encola las filas de un envío; el Future resuelve con lo que devuelva write()."""
+        fut = Future()
+        with self._lock:
+            if self._closed:
+                raise WriterClosed("cola de escritura cerrada")
+            self._stats["submitted"] += 1
+        try:
+            self._q.put((rows, fut), timeout=timeout)
+        except queue.Full:
+            raise TimeoutError("cola de escritura llena")
+        return fut
+
+    def write(self, rows, timeout=None):
+        """
+        submit() + espera del resultado. Si vence el timeout el envío sigue en cola y
+        se escribirá igual (con su al_confirmar); el reintento del kiosco es
+        idempotente por submission_id.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fut = self.submit(rows, timeout=timeout)
+        try:
+            return fut.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            raise TimeoutError("escritura sin confirmar")
+
+    def close(self, timeout=10.0):
+        """Deja de aceptar filas, escribe lo pendiente y detiene el hilo."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._q.put(_STOP)
+        self._thread.join(timeout)
+
+    # --- hilo escritor ---
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is _STOP:
+                break
+            batch, n, stop = [item], len(item[0]), False
+            deadline = time.monotonic() + self.max_delay
+            while n < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                n += len(item[0])
+            self._flush(batch)
+            if stop:
+                break
+        # Envíos que se colaron tras el cierre
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._fail(item[1], WriterClosed("cola de escritura cerrada"))
+        if self._con is not None:
+            try:
+                self._con.close()
+            except Exception:
+                pass
+
+    def _commit(self, rows):
+        res = reintentar(lambda: self._commit_una_vez(rows))
+        if self._al_confirmar is not None:
+            try:
+                self._al_confirmar(rows, res)
+            except Exception as e:
+                # Ya está confirmado: un fallo aquí no debe convertirse en error del envío
+                print("WARN: al_confirmar falló:", repr(e))
+        return res
+
+    def _commit_una_vez(self, rows):
+        if self._con is None:
+            self._con = self._connect()
+        try:
+            with self._lease.hold() if self._lease is not None else nullcontext():
+                res = self._write(self._con, rows)
+                self._con.commit()
+        except Exception:
+            try:
+                self._con.rollback()
+            except Exception:
+                # Conexión inservible: se abre otra en el siguiente lote
+                try:
+                    self._con.close()
+                except Exception:
+                    pass
+                self._con = None
+            raise
+        with self._lock:
+            self._stats["commits"] += 1
+            self._stats["rows"] += len(rows)
+            self._stats["max_batch_rows"] = max(self._stats["max_batch_rows"], len(rows))
+        return res
+
+    def _flush(self, batch):
+        with self._lock:
+            self._stats["batches"] += 1
+        try:
+            res = self._commit([r for rs, _ in batch for r in rs])
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0][1], e)
+                return
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            for rs, fut in batch:
+                try:
+                    fut.set_result(self._commit(rs))
+                except Exception as e1:
+                    self._fail(fut, e1)
+            return
+        i = 0
+        for rs, fut in batch:
+            fut.set_result(res[i:i + len(rs)])
+            i += len(rs)
+
+    def _fail(self, fut, e):
+        with self._lock:
+            self._stats["errors"] += 1
+        fut.set_exception(e)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._q.qsize(), "max_batch": self.max_batch,
+                    "max_delay": self.max_delay, "closed": self._closed, **self._stats}